@@ -0,0 +1,372 @@
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cluster_config as config
+
+# Everything here runs against functions.fake_aws: no credentials and no network are needed.
+# Fake credentials only keep botocore from looking for a real profile.
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_results.json')
+
+# Each suite starts from an empty fake account; its runs share that account in order
+SUITES = {
+    'scripts': ['vpc/cold', 'vpc/no-op', 'eks/cold', 'eks/no-op'],
+    'build': ['build/cold', 'build/no-op'],
+    'per-az': ['vpc-per-az/cold', 'vpc-per-az/no-op'],
+    'teardown': ['build/cold', 'teardown/cold', 'teardown/no-op'],
+    'resume': ['resume/cold', 'resume/no-op'],
+    'upgrade': ['build/cold', 'upgrade/in-place', 'upgrade-failure/in-place', 'addon-failure/in-place'],
+}
+
+# Seconds an updated cluster, node group or add-on still reads ACTIVE in the upgrade suite, and the
+# (unscaled) update times it runs with so that two upgrades stay short
+UPGRADE_STATUS_LAG = 0.3
+UPGRADE_READY_DELAYS = {'eks_cluster_update': 300, 'eks_nodegroup_version_update': 120}
+
+# Seconds of wall time any scenario may gain before the relative tolerance applies: sub-second
+# scenarios swing by about this much between runs of an unchanged tree
+WALL_TIME_NOISE = 0.3
+
+# Build journal per fake account for the resume suite, removed when the benchmark exits
+_journals = {}
+
+
+def _expect(fake, kind, count):
+    """The scripts report most failures by printing, so check the fake account for the result instead."""
+    found = len(fake.regions.get(config.region_name, {}).get(kind, {}))
+    if found < count:
+        raise RuntimeError(f"expected {count} {kind}, found {found}")
+
+
+def _addon_configurations(fake):
+    """The cluster's add-ons in the fake account: add-on name -> configuration values."""
+    from functions.addons import addon_configuration
+    return {addon['addonName']: addon_configuration(addon)
+            for addon in fake.regions[config.region_name].get('addons', {}).values()
+            if addon['clusterName'] == config.cluster_name}
+
+
+def _run_vpc(fake):
+    import create_vpc_private_public_subnets
+    create_vpc_private_public_subnets.apply(config)
+    _expect(fake, 'subnets', len(config.public_subnets) + len(config.private_subnets))
+    _expect(fake, 'nat_gateways', 1)
+
+
+def _run_vpc_per_az(fake):
+    import create_vpc_private_public_subnets
+    mode, config.nat_gateway_mode = config.nat_gateway_mode, 'per_az'
+    try:
+        create_vpc_private_public_subnets.apply(config)
+    finally:
+        config.nat_gateway_mode = mode
+    _expect(fake, 'nat_gateways', len(config.private_subnets))
+
+
+def _run_eks(fake):
+    import public_eks
+    if not public_eks.apply():
+        raise RuntimeError("public_eks.apply() reported a failed step")
+    _expect(fake, 'clusters', 1)
+    _expect(fake, 'nodegroups', len(config.nodegroup_specs([], None)))
+
+
+def _run_build(fake):
+    from build_cluster import build_steps
+    from functions.build_graph import run_steps
+    report = run_steps(build_steps())
+    if report['failed'] or report['skipped']:
+        raise RuntimeError(f"build failed: {report['failed'] or report['skipped']}")
+
+
+def _run_resume(fake):
+    from build_cluster import build_steps
+    from functions.build_graph import run_steps
+    from functions.journal import Journal
+    if id(fake) not in _journals:
+        journal_dir = tempfile.mkdtemp(prefix='benchmark-journal-')
+        atexit.register(shutil.rmtree, journal_dir, True)
+        _journals[id(fake)] = os.path.join(journal_dir, 'build_journal.jsonl')
+    report = run_steps(build_steps(), journal=Journal(_journals[id(fake)]))
+    if report['failed'] or report['skipped']:
+        raise RuntimeError(f"build failed: {report['failed'] or report['skipped']}")
+
+
+@contextlib.contextmanager
+def _upgraded_settings(fake):
+    """
+    The cluster's Kubernetes version plus one minor, another node count and another setting
+    in every add-on, with the fake's status flip lagging.
+    """
+    major, minor = fake.regions[config.region_name]['clusters'][config.cluster_name]['version'].split('.')
+    saved = (config.kubernetes_version, config.scaling_config, config.addons)
+    config.kubernetes_version = f"{major}.{int(minor) + 1}"
+    config.scaling_config = dict(config.scaling_config, desiredSize=config.scaling_config['desiredSize'] + 1)
+    config.addons = {name: dict(configuration, upgradedTo=config.kubernetes_version)
+                     for name, configuration in config.addons.items()}
+    fake.status_lag = UPGRADE_STATUS_LAG
+    fake.ready_delays.update(UPGRADE_READY_DELAYS)
+    try:
+        yield config.kubernetes_version
+    finally:
+        config.kubernetes_version, config.scaling_config, config.addons = saved
+        fake.status_lag = 0.0
+        fake.failed_updates.clear()
+
+
+def _run_upgrade(fake):
+    from build_cluster import build_steps
+    from functions.build_graph import run_steps
+    from functions.addons import addon_specs
+    with _upgraded_settings(fake) as version:
+        report = run_steps(build_steps())
+        addons = _addon_configurations(fake)
+        if addons != addon_specs(config):
+            raise RuntimeError(f"expected the add-ons configured as {addon_specs(config)}, found {addons}")
+    if report['failed'] or report['skipped']:
+        raise RuntimeError(f"upgrade failed: {report['failed'] or report['skipped']}")
+    versions = {nodegroup['version'] for nodegroup in fake.regions[config.region_name]['nodegroups'].values()}
+    if fake.regions[config.region_name]['clusters'][config.cluster_name]['version'] != version or versions != {version}:
+        raise RuntimeError(f"expected Kubernetes {version} everywhere, found node groups on {sorted(versions)}")
+
+
+def _run_upgrade_failure(fake):
+    """A cluster upgrade EKS reports Failed must fail the build, not pass because the cluster stays ACTIVE."""
+    from build_cluster import build_steps
+    from functions.build_graph import run_steps
+    fake.failed_updates.add('VersionUpdate')
+    cluster = fake.regions[config.region_name]['clusters'][config.cluster_name]
+    before = cluster['version']
+    with _upgraded_settings(fake):
+        report = run_steps(build_steps())
+    if 'cluster' not in report['failed']:
+        raise RuntimeError(f"the failed upgrade was reported as success (failed steps: {sorted(report['failed'])})")
+    if cluster['version'] != before:
+        raise RuntimeError(f"expected the failed upgrade to leave Kubernetes {before}, found {cluster['version']}")
+
+
+def _run_addon_failure(fake):
+    """An add-on update EKS reports Failed must fail the build, not pass because the add-on stays ACTIVE."""
+    from build_cluster import build_steps
+    from functions.build_graph import run_steps
+    fake.failed_updates.add('AddonUpdate')
+    before = _addon_configurations(fake)
+    with _upgraded_settings(fake):
+        report = run_steps(build_steps())
+    if 'addons' not in report['failed']:
+        raise RuntimeError(f"the failed add-on update was reported as success "
+                           f"(failed steps: {sorted(report['failed'])})")
+    after = _addon_configurations(fake)
+    if after != before:
+        raise RuntimeError(f"expected the failed update to leave the add-ons as {before}, found {after}")
+
+
+def _run_teardown(fake):
+    from destroy_cluster import teardown_steps
+    from functions.build_graph import run_steps
+    from functions.teardown import discover
+    report = run_steps(teardown_steps(config, discover(config)))
+    if report['failed'] or report['skipped']:
+        raise RuntimeError(f"teardown failed: {report['failed'] or report['skipped']}")
+    left = {kind: len(resources) for region in fake.regions.values() for kind, resources in region.items()
+            if kind not in ('nat_gateways', 'vpc_peering_connections', 'updates') and resources}
+    if left:
+        raise RuntimeError(f"left behind: {left}")
+
+
+RUNNERS = {'vpc': _run_vpc, 'vpc-per-az': _run_vpc_per_az, 'eks': _run_eks, 'build': _run_build,
+           'teardown': _run_teardown, 'resume': _run_resume, 'upgrade': _run_upgrade,
+           'upgrade-failure': _run_upgrade_failure, 'addon-failure': _run_addon_failure}
+
+
+def _fresh_process(fake):
+    """Drop every per-process cache, as if the script were started again, and point boto3 at the fake."""
+    from functions.clients import get_session, reset_clients
+    from functions.helper import get_account_number
+    from functions.resolver import invalidate
+    from functions.snapshot import drop_snapshot
+    from functions.throttle import reset_throttle
+
+    reset_clients()
+    invalidate()
+    drop_snapshot()
+    reset_throttle()
+    get_account_number.cache_clear()
+    fake.install(get_session())
+    fake.reset_stats()
+
+
+@contextlib.contextmanager
+def _scaled_waiters(time_scale):
+    """Shrink every waiter profile's timings by the same factor as the fake's ready delays."""
+    from functions.waiters import PROFILES
+    saved = {resource_type: dict(profile) for resource_type, profile in PROFILES.items()}
+    for profile in PROFILES.values():
+        for key in ('expected', 'min_delay', 'max_delay', 'timeout'):
+            profile[key] = profile[key] * time_scale
+    try:
+        yield
+    finally:
+        for resource_type, profile in saved.items():
+            PROFILES[resource_type].update(profile)
+
+
+def run_benchmarks(suites=None, time_scale=0.01, latency=None, rate_limits=None, consistency_delay=0.0,
+                   verbose=False):
+    """
+    Run the benchmark suites against a fresh FakeAws each.
+
+    :param suites: Names of SUITES to run (default: all).
+    :param time_scale: Factor applied to resource ready delays and waiter timings.
+    :param latency: Simulated seconds per operation name or prefix (see fake_aws.DEFAULT_LATENCY).
+    :param rate_limits: Server-side limits as service -> (requests per second, burst).
+    :param consistency_delay: Seconds a created resource stays invisible to describe calls.
+    :param verbose: Show the scripts' own output instead of swallowing it.
+    :return: Dictionary of scenario name -> wall_seconds, total_calls, mutating_calls,
+             throttled, peak_concurrency, calls and error.
+    """
+    from functions.fake_aws import FakeAws
+
+    results = {}
+    with _scaled_waiters(time_scale):
+        for suite in suites or SUITES:
+            fake = FakeAws(latency=latency, time_scale=time_scale, rate_limits=rate_limits,
+                           consistency_delay=consistency_delay)
+            for scenario in SUITES[suite]:
+                _fresh_process(fake)
+                output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+                error = None
+                started = time.monotonic()
+                try:
+                    with output:
+                        RUNNERS[scenario.split('/')[0]](fake)
+                except Exception as e:
+                    error = str(e)
+                wall_seconds = time.monotonic() - started
+                results[scenario] = dict(fake.stats(), wall_seconds=round(wall_seconds, 3), error=error)
+                marker = '❌' if error else '✅'
+                print(f"[{marker}] {scenario}: {wall_seconds:.2f}s, {results[scenario]['total_calls']} call(s), "
+                      f"{results[scenario]['mutating_calls']} mutating, peak concurrency "
+                      f"{results[scenario]['peak_concurrency']}" + (f" ({error})" if error else ''))
+    return results
+
+
+def median_results(runs):
+    """
+    Reduce several run_benchmarks() outputs to one: per scenario, the run with the median wall time.
+
+    :param runs: List of run_benchmarks() outputs.
+    :return: Dictionary of scenario name -> result, as run_benchmarks() returns it.
+    """
+    merged = {}
+    for scenario in runs[0]:
+        ordered = sorted((run[scenario] for run in runs if scenario in run), key=lambda result: result['wall_seconds'])
+        merged[scenario] = ordered[len(ordered) // 2]
+    return merged
+
+
+def compare(results, baseline, tolerance=0.25, noise=WALL_TIME_NOISE):
+    """
+    Compare benchmark results against stored ones.
+
+    Call counts are deterministic, so any increase is a regression; wall time may grow
+    by the tolerance, and always by the noise floor, before it counts.
+
+    :param results: Output of run_benchmarks() or median_results().
+    :param baseline: Stored results (the 'scenarios' entry of the results file).
+    :param tolerance: Allowed relative wall-time increase.
+    :param noise: Allowed absolute wall-time increase in seconds, for scenarios too short for the tolerance.
+    :return: List of regression messages.
+    """
+    regressions = []
+    for scenario, result in results.items():
+        stored = baseline.get(scenario)
+        if not stored:
+            continue
+        if result['error'] and not stored.get('error'):
+            regressions.append(f"{scenario}: now fails with {result['error']}")
+        for key in ('total_calls', 'mutating_calls'):
+            if result[key] > stored[key]:
+                regressions.append(f"{scenario}: {key} {stored[key]} -> {result[key]}")
+        if result['wall_seconds'] > max(stored['wall_seconds'] * (1 + tolerance), stored['wall_seconds'] + noise):
+            regressions.append(f"{scenario}: wall time {stored['wall_seconds']:.2f}s -> {result['wall_seconds']:.2f}s")
+        for operation, count in result['calls'].items():
+            if count > stored['calls'].get(operation, 0):
+                regressions.append(f"{scenario}: {operation} {stored['calls'].get(operation, 0)} -> {count}")
+    return regressions
+
+
+def _pairs(values, parse):
+    parsed = {}
+    for value in values or []:
+        name, _, setting = value.partition('=')
+        parsed[name] = parse(setting)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VPC, EKS and graph builds against a local fake AWS.")
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), help="Suite to run (default: all).")
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help="Factor applied to NAT gateway / cluster / node group ready times and waiter timings.")
+    parser.add_argument('--latency', action='append', metavar='OPERATION=SECONDS',
+                        help="Simulated latency for an operation or name prefix, e.g. Describe=0.1.")
+    parser.add_argument('--throttle', action='append', metavar='SERVICE=RATE:BURST',
+                        help="Server-side rate limit, e.g. ec2=5:10.")
+    parser.add_argument('--consistency-delay', type=float, default=0.0,
+                        help="Seconds a created resource stays invisible to describe calls.")
+    parser.add_argument('--results', default=RESULTS_FILE, help="Stored results to compare against.")
+    parser.add_argument('--save', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative wall-time increase.")
+    parser.add_argument('--noise', type=float, default=WALL_TIME_NOISE,
+                        help=f"Allowed absolute wall-time increase in seconds (default: {WALL_TIME_NOISE}).")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Run everything this many times and keep each scenario's median run; "
+                             "use 5 or so with --save.")
+    parser.add_argument('--verbose', action='store_true', help="Show the build scripts' own output.")
+    args = parser.parse_args()
+
+    settings = {
+        'time_scale': args.time_scale,
+        'latency': _pairs(args.latency, float),
+        'rate_limits': _pairs(args.throttle, lambda setting: tuple(float(part) for part in setting.split(':'))),
+        'consistency_delay': args.consistency_delay,
+    }
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    results = median_results([run_benchmarks(args.suite, verbose=args.verbose, **settings)
+                              for _ in range(args.repeat)])
+
+    if args.save:
+        with open(args.results, 'w') as results_file:
+            json.dump({'settings': settings, 'scenarios': results}, results_file, indent=2, sort_keys=True)
+        print(f"[ℹ️] Stored results in {args.results}.")
+        return 0
+
+    if not os.path.exists(args.results):
+        print(f"[⚠️] No stored results at {args.results}; run with --save to create them.")
+        return 0
+    with open(args.results) as results_file:
+        stored = json.load(results_file)
+    if stored.get('settings') != json.loads(json.dumps(settings)):
+        print("[⚠️] Stored results were taken with different settings; wall times are not comparable.")
+    regressions = compare(results, stored['scenarios'], args.tolerance, args.noise)
+    for regression in regressions:
+        print(f"[❌] Regression: {regression}")
+    if not regressions:
+        print("[✅] No regressions against the stored results.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+import argparse
+import os
+
+import cluster_config as config
+from create_vpc_private_public_subnets import (
+    create_vpc, create_subnets, get_existing_internet_gateway, create_and_attach_internet_gateway,
+    name_default_route_table, get_or_create_route_table, associate_private_subnets_to_route_table,
+    create_default_route, create_nat_gateway_and_update_routes, create_nat_gateways_per_az, managed_route_table_names,
+    az_route_table_name, retag_vpc_resources
+)
+from functions import trace
+from functions.addons import NODE_ADDONS, addon_configuration, addon_specs, configure_addons
+from functions.build_graph import Step, run_steps
+from functions.cidr_plan import apply_cidr_plan
+from functions.clients import client_stats, get_client
+from functions.create_control_plane import reconcile_eks_cluster
+from functions.create_nodegroup import reconcile_eks_nodegroups
+from functions.create_role_with_policies import create_iam_role
+from functions.journal import Journal
+from functions.snapshot import find_route_table_snapshot, get_snapshot, load_vpc_snapshot
+from functions.tagging import common_tags
+from functions.throttle import throttle_stats
+
+# Default journal of completed steps (see --journal); destroy_cluster.py resets it
+JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build_journal.jsonl')
+
+
+# Build phases reported by fleet runs, as phase -> step names
+PHASES = {
+    'iam': ['cluster_role', 'worker_role'],
+    'network': ['snapshot', 'vpc', 'public_subnets', 'private_subnets', 'internet_gateway', 'public_route_table',
+                'retag', 'private_route_table', 'public_route', 'private_associations', 'nat_gateway', 'nat_gateways'],
+    'control_plane': ['cluster', 'addons'],
+    'nodegroups': ['nodegroups', 'node_addons'],
+}
+
+
+def internet_gateway(settings, vpc_id):
+    """Reuse the VPC's Internet Gateway or create and attach one."""
+    return (get_existing_internet_gateway(vpc_id, settings.region_name)
+            or create_and_attach_internet_gateway(vpc_id, settings.owner, settings.vpc_name,
+                                                  region=settings.region_name, tags=common_tags(settings)))
+
+
+def snapshot(settings):
+    """
+    Plan the network layout if cidr_plan is set, then load the VPC snapshot that
+    every idempotency check in this run is answered from.
+    """
+    apply_cidr_plan(settings)
+    load_vpc_snapshot(
+        settings.vpc_name,
+        [f"public_subnet_{az}" for az in settings.public_subnets] + [f"private_subnet_{az}" for az in settings.private_subnets],
+        managed_route_table_names(settings),
+        region=settings.region_name
+    )
+
+
+def subnets_or_none(subnet_ids):
+    """Return the subnet mapping only if every subnet was created."""
+    return subnet_ids if subnet_ids and all(subnet_ids.values()) else None
+
+
+def associations_or_none(summary):
+    """Return the association summary only if every private subnet ended up associated."""
+    return summary if summary and not summary['failed'] else None
+
+
+def nat_gateways_per_az(settings, vpc_id, public_subnet_ids, private_subnet_ids):
+    """Set up every AZ's NAT Gateway and private route table; fail the step if any AZ failed."""
+    result = create_nat_gateways_per_az(vpc_id, public_subnet_ids, private_subnet_ids, settings.private_route_table_name,
+                                        settings.owner, region=settings.region_name, tags=common_tags(settings))
+    if result['failures']:
+        raise RuntimeError(', '.join(f"{az}: {error}" for az, error in result['failures'].items()))
+    return {az: egress['nat_gateway_id'] for az, egress in result['results'].items()}
+
+
+def private_egress_steps(settings):
+    """
+    Steps that give the private subnets their route to the internet.
+
+    Single mode: one private route table, the subnet associations and one NAT Gateway.
+    Per-AZ mode: one step that sets up a NAT Gateway and route table for every AZ at once.
+    """
+    region = settings.region_name
+    if settings.nat_gateway_mode == 'per_az':
+        return [
+            Step('nat_gateways',
+                 lambda vpc_id, public_subnet_ids, private_subnet_ids: nat_gateways_per_az(
+                     settings, vpc_id, public_subnet_ids, private_subnet_ids),
+                 inputs=['vpc_id', 'public_subnet_ids', 'private_subnet_ids'], outputs=['nat_gateway_ids'],
+                 fingerprint=lambda: [settings.private_route_table_name, settings.owner],
+                 verify=lambda vpc_id, nat_gateway_ids, private_subnet_ids, **_: set(nat_gateway_ids) == set(
+                     private_subnet_ids) and nat_gateway_routes(settings, vpc_id, [
+                         (get_snapshot(vpc_id, region).route_table_id(
+                             az_route_table_name(settings.private_route_table_name, az)), nat_gateway_id)
+                         for az, nat_gateway_id in nat_gateway_ids.items()])),
+        ]
+    return [
+        Step('private_route_table',
+             lambda vpc_id: get_or_create_route_table(vpc_id=vpc_id, route_table_name=settings.private_route_table_name,
+                                                      owner=settings.owner, region=region, tags=common_tags(settings)),
+             inputs=['vpc_id'], outputs=['private_route_table_id'],
+             fingerprint=lambda: [settings.private_route_table_name, settings.owner],
+             verify=lambda vpc_id, private_route_table_id: route_table_exists(
+                 settings, vpc_id, settings.private_route_table_name, private_route_table_id)),
+        Step('private_associations',
+             lambda vpc_id, private_route_table_id, private_subnet_ids: associations_or_none(
+                 associate_private_subnets_to_route_table(vpc_id=vpc_id, route_table_name=settings.private_route_table_name,
+                                                          region=region)),
+             inputs=['vpc_id', 'private_route_table_id', 'private_subnet_ids'], outputs=['private_associations'],
+             verify=lambda vpc_id, private_route_table_id, private_subnet_ids, **_: subnets_associated(
+                 settings, vpc_id, private_route_table_id, private_subnet_ids.values())),
+        Step('nat_gateway',
+             lambda vpc_id, public_subnet_ids, private_route_table_id: create_nat_gateway_and_update_routes(
+                 vpc_id=vpc_id, private_rtb_name=settings.private_route_table_name,
+                 public_subnet_id=public_subnet_ids[settings.nat_subnet_az], region=region, tags=common_tags(settings)),
+             inputs=['vpc_id', 'public_subnet_ids', 'private_route_table_id'], outputs=['nat_gateway_id'],
+             fingerprint=lambda: settings.nat_subnet_az,
+             verify=lambda vpc_id, private_route_table_id, nat_gateway_id, **_: nat_gateway_routes(
+                 settings, vpc_id, [(private_route_table_id, nat_gateway_id)])),
+    ]
+
+
+def cluster(settings, cluster_role_arn, public_subnet_ids):
+    """Create the EKS control plane, or upgrade it in place, and return its name once it is active."""
+    response = reconcile_eks_cluster(settings.cluster_name, cluster_role_arn, list(public_subnet_ids.values()),
+                                  settings.public_access_cidrs, settings.service_ipv4_cidr,
+                                  settings.kubernetes_version, settings.tags, region=settings.region_name)
+    return settings.cluster_name if response else None
+
+
+def cluster_addons(settings, node_addons):
+    """The configured add-ons that need nodes (node_addons=True) or can be applied before any node joins."""
+    return {name: configuration for name, configuration in addon_specs(settings).items()
+            if (name in NODE_ADDONS) == node_addons}
+
+
+def addons(settings, cluster_name, node_addons):
+    """Configure add-ons concurrently; fail the step if any of them failed, else return name -> version."""
+    result = configure_addons(cluster_name, cluster_addons(settings, node_addons), tags=settings.tags,
+                              region=settings.region_name)
+    if result['failures']:
+        raise RuntimeError(', '.join(f"{name}: {error}" for name, error in result['failures'].items()))
+    return {name: addon['addonVersion'] for name, addon in result['results'].items()}
+
+
+def nodegroups(settings, cluster_name, worker_role_arn, public_subnet_ids):
+    """Create or update every node group concurrently; fail the step if any of them failed."""
+    result = reconcile_eks_nodegroups(cluster_name,
+                                      settings.nodegroup_specs(list(public_subnet_ids.values()), worker_role_arn),
+                                      kubernetes_version=settings.kubernetes_version, region=settings.region_name)
+    if result['failures']:
+        raise RuntimeError(', '.join(f"{name}: {error}" for name, error in result['failures'].items()))
+    return result['results']
+
+
+# Journal checks: each confirms a journaled step's result still exists before the step is skipped.
+# Network checks read the VPC snapshot the 'snapshot' step loads (no extra calls); IAM and EKS
+# checks cost one get/describe call per resource.
+
+def vpc_exists(settings, vpc_id):
+    return get_snapshot(vpc_id, settings.region_name) is not None
+
+
+def subnets_exist(settings, vpc_id, subnet_ids, prefix):
+    snapshot = get_snapshot(vpc_id, settings.region_name)
+    return bool(snapshot) and all((snapshot.subnet(f"{prefix}_{az}") or {}).get('SubnetId') == subnet_id
+                                  for az, subnet_id in subnet_ids.items())
+
+
+def internet_gateway_attached(settings, vpc_id, internet_gateway_id):
+    snapshot = get_snapshot(vpc_id, settings.region_name)
+    return bool(snapshot) and snapshot.internet_gateway_id() == internet_gateway_id
+
+
+def route_table_exists(settings, vpc_id, route_table_name, route_table_id):
+    snapshot = get_snapshot(vpc_id, settings.region_name)
+    return bool(snapshot) and snapshot.route_table_id(route_table_name) == route_table_id
+
+
+def has_default_route(settings, route_table_id, **target):
+    snapshot = find_route_table_snapshot(route_table_id, settings.region_name)
+    return bool(snapshot) and snapshot.has_route(route_table_id, '0.0.0.0/0', **target)
+
+
+def subnets_associated(settings, vpc_id, route_table_id, subnet_ids):
+    snapshot = get_snapshot(vpc_id, settings.region_name)
+    associations = snapshot.subnet_associations() if snapshot else {}
+    return bool(snapshot) and all(associations.get(subnet_id, {}).get('RouteTableId') == route_table_id
+                                  for subnet_id in subnet_ids)
+
+
+def nat_gateway_routes(settings, vpc_id, routes):
+    """Check that every (route table ID, NAT gateway ID) pair routes through an available NAT gateway."""
+    snapshot = get_snapshot(vpc_id, settings.region_name)
+    return bool(snapshot) and all(
+        snapshot.nat_gateways.get(nat_gateway_id, {}).get('State') == 'available'
+        and snapshot.has_route(route_table_id, '0.0.0.0/0', NatGatewayId=nat_gateway_id)
+        for route_table_id, nat_gateway_id in routes)
+
+
+def role_exists(role_name, role_arn):
+    iam_client = get_client('iam', None)
+    try:
+        return iam_client.get_role(RoleName=role_name)['Role']['Arn'] == role_arn
+    except iam_client.exceptions.NoSuchEntityException:
+        return False
+
+
+def cluster_active(settings, cluster_name):
+    eks_client = get_client('eks', settings.region_name)
+    try:
+        return eks_client.describe_cluster(name=cluster_name)['cluster']['status'] == 'ACTIVE'
+    except eks_client.exceptions.ResourceNotFoundException:
+        return False
+
+
+def addons_configured(settings, cluster_name, addons):
+    eks_client = get_client('eks', settings.region_name)
+    try:
+        for addon_name, configuration in addons.items():
+            addon = eks_client.describe_addon(clusterName=cluster_name, addonName=addon_name)['addon']
+            if addon['status'] != 'ACTIVE' or addon_configuration(addon) != configuration:
+                return False
+    except eks_client.exceptions.ResourceNotFoundException:
+        return False
+    return True
+
+
+def nodegroups_active(settings, cluster_name, nodegroup_names):
+    eks_client = get_client('eks', settings.region_name)
+    try:
+        return all(eks_client.describe_nodegroup(clusterName=cluster_name, nodegroupName=name)['nodegroup']['status']
+                   == 'ACTIVE' for name in nodegroup_names)
+    except eks_client.exceptions.ResourceNotFoundException:
+        return False
+
+
+def phase_seconds(timings):
+    """
+    Turn run_steps() timings into wall-clock seconds per build phase.
+
+    :param timings: Step name -> (start, end) from a run_steps() report.
+    :return: Dictionary of phase -> seconds from its first step starting to its last step ending.
+    """
+    phases = {}
+    for phase, step_names in PHASES.items():
+        spans = [timings[name] for name in step_names if name in timings]
+        if spans:
+            phases[phase] = max(end for _, end in spans) - min(start for start, _ in spans)
+    return phases
+
+
+def build_steps(settings=config):
+    """
+    Declare the VPC + IAM + EKS build as a step graph.
+
+    :param settings: The cluster_config module, or a per-cluster copy of it (see fleet.cluster_settings()).
+    :return: List of Step objects for run_steps().
+    """
+    region = settings.region_name
+    return [
+        # IAM does not depend on the network, so both roles start immediately
+        Step('cluster_role',
+             lambda: create_iam_role(settings.control_plane_role_name, settings.control_plane_trust_policy,
+                                     settings.control_plane_policies, settings.control_plane_tags),
+             outputs=['cluster_role_arn'],
+             fingerprint=lambda: [settings.control_plane_role_name, settings.control_plane_trust_policy,
+                                  settings.control_plane_policies, settings.control_plane_tags],
+             verify=lambda cluster_role_arn: role_exists(settings.control_plane_role_name, cluster_role_arn)),
+        Step('worker_role',
+             lambda: create_iam_role(settings.worker_nodes_role_name, settings.worker_nodes_trust_policy,
+                                     settings.worker_nodes_policies, settings.worker_node_role_tags),
+             outputs=['worker_role_arn'],
+             fingerprint=lambda: [settings.worker_nodes_role_name, settings.worker_nodes_trust_policy,
+                                  settings.worker_nodes_policies, settings.worker_node_role_tags],
+             verify=lambda worker_role_arn: role_exists(settings.worker_nodes_role_name, worker_role_arn)),
+
+        # Not journaled (no outputs): it plans the layout and loads the snapshot the checks below read
+        Step('snapshot', lambda: snapshot(settings)),
+        Step('vpc', lambda: create_vpc(settings.cidr_block, settings.owner, settings.vpc_name, region,
+                                       tags=common_tags(settings)),
+             outputs=['vpc_id'], after=['snapshot'],
+             fingerprint=lambda: [settings.cidr_block, settings.owner, settings.vpc_name, region],
+             verify=lambda vpc_id: vpc_exists(settings, vpc_id)),
+        Step('public_subnets',
+             lambda vpc_id: subnets_or_none(create_subnets(vpc_id, settings.public_subnets, is_public=True, region=region,
+                                                           tags=common_tags(settings))),
+             inputs=['vpc_id'], outputs=['public_subnet_ids'], fingerprint=lambda: settings.public_subnets,
+             verify=lambda vpc_id, public_subnet_ids: subnets_exist(settings, vpc_id, public_subnet_ids, 'public_subnet')),
+        Step('private_subnets',
+             lambda vpc_id: subnets_or_none(create_subnets(vpc_id, settings.private_subnets, is_public=False, region=region,
+                                                           tags=common_tags(settings))),
+             inputs=['vpc_id'], outputs=['private_subnet_ids'], fingerprint=lambda: settings.private_subnets,
+             verify=lambda vpc_id, private_subnet_ids: subnets_exist(settings, vpc_id, private_subnet_ids, 'private_subnet')),
+        Step('internet_gateway', lambda vpc_id: internet_gateway(settings, vpc_id),
+             inputs=['vpc_id'], outputs=['internet_gateway_id'], fingerprint=lambda: [settings.owner, settings.vpc_name],
+             verify=lambda vpc_id, internet_gateway_id: internet_gateway_attached(settings, vpc_id, internet_gateway_id)),
+        Step('public_route_table',
+             lambda vpc_id: name_default_route_table(vpc_id, settings.public_route_table_name, settings.owner, region=region,
+                                                     tags=common_tags(settings)),
+             inputs=['vpc_id'], outputs=['public_route_table_id'],
+             fingerprint=lambda: [settings.public_route_table_name, settings.owner],
+             verify=lambda vpc_id, public_route_table_id: route_table_exists(
+                 settings, vpc_id, settings.public_route_table_name, public_route_table_id)),
+        # Resources that predate a change to common_tags get it in one batched call (none when all are tagged)
+        Step('retag', lambda vpc_id: retag_vpc_resources(vpc_id, common_tags(settings), region),
+             inputs=['vpc_id'], after=['public_route_table']),
+        Step('public_route',
+             lambda public_route_table_id, internet_gateway_id: create_default_route(
+                 public_route_table_id, internet_gateway_id, region=region),
+             inputs=['public_route_table_id', 'internet_gateway_id'], outputs=['public_route'],
+             verify=lambda public_route_table_id, internet_gateway_id, **_: has_default_route(
+                 settings, public_route_table_id, GatewayId=internet_gateway_id)),
+        *private_egress_steps(settings),
+
+        Step('cluster', lambda cluster_role_arn, public_subnet_ids: cluster(settings, cluster_role_arn, public_subnet_ids),
+             inputs=['cluster_role_arn', 'public_subnet_ids'], outputs=['cluster_name'], after=['public_route'],
+             fingerprint=lambda: [settings.cluster_name, settings.public_access_cidrs, settings.service_ipv4_cidr,
+                                  settings.kubernetes_version, settings.tags],
+             verify=lambda cluster_name, **_: cluster_active(settings, cluster_name)),
+        # vpc-cni and kube-proxy are configured before the nodes launch, so nodes come up with
+        # prefix delegation and IPVS from the start
+        Step('addons', lambda cluster_name: addons(settings, cluster_name, node_addons=False),
+             inputs=['cluster_name'], outputs=['addon_versions'],
+             fingerprint=lambda: cluster_addons(settings, node_addons=False),
+             verify=lambda cluster_name, **_: addons_configured(settings, cluster_name,
+                                                                cluster_addons(settings, node_addons=False))),
+        Step('nodegroups',
+             lambda cluster_name, worker_role_arn, public_subnet_ids: nodegroups(
+                 settings, cluster_name, worker_role_arn, public_subnet_ids),
+             inputs=['cluster_name', 'worker_role_arn', 'public_subnet_ids'], outputs=['nodegroups'],
+             after=['addons'],
+             fingerprint=lambda: [settings.nodegroup_specs([], None), settings.kubernetes_version],
+             verify=lambda cluster_name, nodegroups, **_: nodegroups_active(settings, cluster_name, list(nodegroups))),
+        Step('node_addons', lambda cluster_name: addons(settings, cluster_name, node_addons=True),
+             inputs=['cluster_name'], outputs=['node_addon_versions'], after=['nodegroups'],
+             fingerprint=lambda: cluster_addons(settings, node_addons=True),
+             verify=lambda cluster_name, **_: addons_configured(settings, cluster_name,
+                                                                cluster_addons(settings, node_addons=True))),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the VPC, IAM roles and EKS cluster as a dependency graph.")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of steps running at once.")
+    parser.add_argument('--trace', metavar='PATH', help="Record every API call, step and waiter and write a "
+                                                        "Chrome trace-event file (chrome://tracing, Perfetto).")
+    parser.add_argument('--trace-summary', metavar='PATH',
+                        help="Write per-operation call counts and p50/p99 latency as JSON.")
+    parser.add_argument('--journal', default=JOURNAL_FILE, metavar='PATH',
+                        help="Journal of completed steps; a re-run skips the verified ones (default: %(default)s).")
+    parser.add_argument('--no-journal', action='store_true', help="Run every step and record nothing.")
+    parser.add_argument('--restart', action='store_true', help="Forget the journaled steps and run every step.")
+    args = parser.parse_args()
+
+    if args.trace or args.trace_summary:
+        trace.enable()
+    journal = None if args.no_journal else Journal(args.journal)
+    if journal and args.restart:
+        journal.reset(None)
+    report = run_steps(build_steps(), max_workers=args.workers, journal=journal)
+    for name, error in report['failed'].items():
+        print(f"[❌] {name}: {error}")
+
+    stats = client_stats()
+    print(f"[ℹ️] Client registry built {stats['clients_created']} client(s), reused {stats['cache_hits']} time(s).")
+    for budget, counters in throttle_stats().items():
+        print(f"[ℹ️] {budget}: {counters['calls']} call(s), {counters['throttles']} throttle(s), "
+              f"{counters['retries']} retr(ies), {counters['token_wait_seconds']:.1f}s waiting for tokens")
+    trace.export(args.trace, args.trace_summary)
+    return 1 if report['failed'] or report['skipped'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
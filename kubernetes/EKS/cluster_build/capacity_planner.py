@@ -0,0 +1,64 @@
+import argparse
+import json
+
+import cluster_config as config
+from functions.capacity import CPU_PROFILES, plan_capacity
+
+# Only the local instance table is read: no AWS credentials or network access needed.
+
+
+def print_capacity_plan(capacity_plan, top=10):
+    """
+    Print the instance type ranking and the planned node groups.
+
+    :param capacity_plan: Dictionary returned by functions.capacity.plan_capacity().
+    :param top: Number of ranked instance types to show.
+    """
+    print(f"{'instance type':<14} {'nodes':>5} {'USD/hour':>9} {'vCPU/USD':>9}  bound by")
+    for row in capacity_plan['ranking'][:top]:
+        print(f"{row['instance_type']:<14} {row['nodes']:>5} {row['hourly_cost']:>9.4f} "
+              f"{row['vcpus_per_dollar']:>9.2f}  {row['bound_by']}")
+    for nodegroup in capacity_plan['nodegroups']:
+        scaling = nodegroup['scaling_config']
+        print(f"[✅] {nodegroup['capacity_type']} node group: {', '.join(nodegroup['instance_types'])} "
+              f"x {scaling['desiredSize']} (min {scaling['minSize']}, max {scaling['maxSize']})")
+    spot = any(nodegroup['capacity_type'] == 'SPOT' for nodegroup in capacity_plan['nodegroups'])
+    print(f"[ℹ️] Estimated cost: {capacity_plan['hourly_cost']:.4f} USD/hour "
+          f"({capacity_plan['hourly_cost'] * 730:.0f} USD/month{', Spot at a typical discount' if spot else ''}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank instance types by throughput per dollar for a workload and plan its node groups, offline.")
+    parser.add_argument('--vcpus', type=float, required=True, help="Total vCPUs the workload requests.")
+    parser.add_argument('--memory', type=float, required=True, help="Total memory (GiB) the workload requests.")
+    parser.add_argument('--pods', type=int, required=True, help="Number of pods.")
+    parser.add_argument('--profile', choices=CPU_PROFILES, default='sustained',
+                        help="'sustained' for steady CPU, 'burstable' for mostly idle with peaks (default: sustained).")
+    parser.add_argument('--spot-share', type=float, default=0.0, help="Fraction of the nodes to run on Spot, 0 to 1.")
+    parser.add_argument('--arch', choices=['x86_64', 'arm64'], default='x86_64', help="CPU architecture of the nodes.")
+    parser.add_argument('--diversity', type=int, default=4, help="Most instance types per node group.")
+    parser.add_argument('--min-nodes', type=int, default=2, help="Fewest nodes to run.")
+    parser.add_argument('--top', type=int, default=10, help="Ranked instance types to show.")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the node groups as JSON (create_eks_nodegroup arguments) instead of text.")
+    args = parser.parse_args()
+
+    try:
+        capacity_plan = plan_capacity(args.vcpus, args.memory, args.pods, cpu_profile=args.profile,
+                                      spot_share=args.spot_share, architecture=args.arch,
+                                      prefix_delegation=config.prefix_delegation, diversity=args.diversity,
+                                      min_nodes=args.min_nodes)
+    except ValueError as e:
+        print(f"[❌] {e}")
+        return 1
+    if args.json:
+        print(json.dumps({'nodegroups': capacity_plan['nodegroups'], 'hourly_cost': capacity_plan['hourly_cost']},
+                         indent=2))
+    else:
+        print_capacity_plan(capacity_plan, top=args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,161 @@
+# Desired VPC + IAM + EKS configuration shared by the build scripts.
+# This module only holds data; importing it makes no AWS calls.
+
+import sys
+
+owner       = "ikallam"
+region_name = "us-east-1"
+
+# Tags every VPC resource (subnets, gateways, route tables, Elastic IPs) and the cluster carry,
+# besides owner and the resource's own Name. Resources created before a tag was added here are
+# retagged on the next build in one batched create_tags call.
+common_tags = {"environment": "development"}
+
+# VPC configuration
+cidr_block  = "10.0.0.0/16"
+vpc_name    = f"{owner}-testing-vpc"
+
+# Public Subnets
+public_subnets = {
+    "us-east-1a": "10.0.1.0/24",
+    "us-east-1b": "10.0.2.0/24",
+    "us-east-1c": "10.0.3.0/24"
+}
+
+# Private Subnets
+private_subnets = {
+    "us-east-1a": "10.0.11.0/24",
+    "us-east-1b": "10.0.12.0/24",
+    "us-east-1c": "10.0.13.0/24"
+}
+
+public_route_table_name  = "public_rtb"
+private_route_table_name = "private_rtb"
+nat_subnet_az            = "us-east-1a"
+nat_subnet_name          = f"public_subnet_{nat_subnet_az}"
+# "single": one NAT gateway in nat_subnet_az behind private_rtb for every private subnet.
+# "per_az": one NAT gateway per AZ, each behind its own private_rtb_<az> route table.
+nat_gateway_mode         = "single"
+
+# Let functions.cidr_plan choose cidr_block, public_subnets and private_subnets (and the AZs)
+# instead of the hand-written values above, avoiding every VPC, subnet and peered CIDR in the
+# account. Example: {"supernet": "10.0.0.0/8", "vpc_prefix": 16, "az_count": 3,
+# "public_prefix": 24, "private_prefix": 20, "regions": ["us-east-1", "us-west-2"],
+# "profiles": [None, "prod"]}. Missing keys take functions.cidr_plan.PLAN_DEFAULTS.
+cidr_plan = None
+
+# IAM roles
+control_plane_trust_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Action": "sts:AssumeRole",
+                "Effect": "Allow",
+                "Principal": {
+                    "Service": "eks.amazonaws.com"
+                }
+            }
+        ]
+    }
+
+worker_nodes_trust_policy = {
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Action": "sts:AssumeRole",
+            "Effect": "Allow",
+            "Principal": {
+                "Service": "ec2.amazonaws.com"
+            }
+        }
+    ]
+}
+
+
+control_plane_role_name = "ikallam-cluster-role"
+control_plane_policies = ["arn:aws:iam::aws:policy/AmazonEKSClusterPolicy"]
+control_plane_tags = [{"Key": "owner", "Value": "ikallam"}]
+
+worker_nodes_role_name = "ikallam-worker-role"
+worker_nodes_policies = ["arn:aws:iam::aws:policy/AmazonEKSWorkerNodePolicy","arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly","arn:aws:iam::aws:policy/AmazonEKS_CNI_Policy"]
+worker_node_role_tags = [{"Key": "owner", "Value": "ikallam"}]
+
+# EKS cluster configuration
+cluster_name = "ikallam-public-cluster"
+cluster_subnet_names = [
+    "public_subnet_us-east-1a",
+    "public_subnet_us-east-1b",
+    "public_subnet_us-east-1c"
+]
+public_access_cidrs = ["0.0.0.0/0"]
+service_ipv4_cidr = "172.20.0.0/16"
+kubernetes_version = "1.28"
+tags = {**common_tags, "owner": owner, "Name": f"{cluster_name}"}
+
+
+system_nodegroup_name = "system-managed-workers-001"
+application_nodegroup_name = "application-managed-workers-001"
+scaling_config = { "minSize": 2, "maxSize": 5, "desiredSize": 2}
+instance_types = ["t3.medium"]
+ami_type = "AL2_x86_64"
+capacity_type = "ON_DEMAND"
+
+# Pod density. With prefix_delegation the vpc-cni add-on gives every interface slot a /28 prefix
+# instead of one address, and each node group gets a generated launch template whose max-pods is
+# computed for its smallest instance type from functions.pod_density.ENI_LIMITS (a t3.medium
+# holds 17 pods without it, 110 with it). max_pods overrides the computed value; with
+# prefix_delegation off and max_pods None, EKS keeps its default and no launch template is made.
+# Turning it on for an existing cluster reconfigures vpc-cni and rolls every node group onto the template.
+prefix_delegation = False
+max_pods = None
+
+# EKS add-ons installed or updated to these configuration values (each add-on's JSON schema,
+# see `aws eks describe-addon-configuration --addon-name <name> --addon-version <version>`).
+# kube-proxy in IPVS mode syncs rules in near-constant time instead of linear in the number of
+# services; CoreDNS scales with the cluster instead of staying at two replicas. vpc-cni settings
+# given here are merged with prefix delegation. All add-ons are applied concurrently once the
+# cluster is active; CoreDNS waits for the node groups, since it has nowhere to run before.
+addons = {
+    "kube-proxy": {"mode": "ipvs", "ipvs": {"scheduler": "rr"}},
+    "coredns": {"autoScaling": {"enabled": True, "minReplicas": 2, "maxReplicas": 10}},
+}
+update_config = {"maxUnavailable": 1}
+
+system_taints = [
+    {"key": "CriticalAddonsOnly", "value": "true", "effect": "NO_SCHEDULE"},
+    {"key": "CriticalAddonsOnly", "value": "true", "effect": "NO_EXECUTE"}
+]
+
+application_taints = []
+system_labels = {
+    "node.kubernetes.io/scope": "system"
+}
+application_labels = {
+    "node.kubernetes.io/scope": "application"
+}
+
+
+def nodegroup_specs(subnet_ids, node_role, settings=None):
+    """
+    Build the create_eks_nodegroups specs for the system and application node groups.
+
+    :param subnet_ids: List of subnet IDs for the node groups.
+    :param node_role: ARN of the IAM role for the node groups.
+    :param settings: Object carrying this module's attributes with per-cluster overrides
+                     (see fleet.cluster_settings()); defaults to this module.
+    :return: List of node group spec dictionaries.
+    :raises ValueError: If max_pods has to be computed for an instance type missing from the ENI table.
+    """
+    from functions.pod_density import nodegroup_max_pods
+
+    s = settings or sys.modules[__name__]
+    nodegroup_defaults = {
+        "scaling_config": s.scaling_config, "subnets": subnet_ids, "node_role": node_role, "instance_types": s.instance_types,
+        "ami_type": s.ami_type, "capacity_type": s.capacity_type, "update_config": s.update_config, "tags": s.tags,
+        "max_pods": s.max_pods or (nodegroup_max_pods(s.instance_types, True) if s.prefix_delegation else None)
+    }
+    return [
+        dict(nodegroup_defaults, nodegroup_name=s.system_nodegroup_name, taints=s.system_taints, labels=s.system_labels),
+        dict(nodegroup_defaults, nodegroup_name=s.application_nodegroup_name, taints=s.application_taints,
+             labels=s.application_labels)
+    ]
@@ -1,25 +1,34 @@
-import boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
+
+from functions.cidr_plan import apply_cidr_plan
+from functions.clients import get_client, client_stats
+from functions.resolver import (AmbiguousMatchError, find_unique, iter_resources, remember, remember_new_vpc,
+                                resolve_route_tables, resolve_subnets, resolve_vpcs)
+from functions.snapshot import find_route_table_snapshot, get_snapshot, load_vpc_snapshot
+from functions.tagging import common_tags, missing_tags, tag_list, tag_resources, tag_specifications
+from functions.waiters import wait_for_resources
 
 
 def get_vpc_by_name(ec2, vpc_name):
     """Check if a VPC with the given name already exists."""
     try:
-        response = ec2.describe_vpcs(
-            Filters=[
-                {'Name': 'tag:Name', 'Values': [vpc_name]}
-            ]
-        )
-        vpcs = response.get('Vpcs', [])
-        if vpcs:
-            return vpcs[0]['VpcId']  # Return the first matching VPC ID
+        vpc = resolve_vpcs(ec2, [vpc_name])[vpc_name]
+        if vpc:
+            return vpc['VpcId']
         return None
+    except AmbiguousMatchError:
+        # Never report an ambiguous name as missing: the caller would create yet another VPC
+        raise
     except Exception as e:
         print(f"[❌] Error while checking for existing VPC: {str(e)}")
         return None
-def create_vpc(cidr_block, owner, vpc_name, region='us-east-1'):
+def create_vpc(cidr_block, owner, vpc_name, region='us-east-1', tags=None):
     try:
         # Initialize the EC2 client with a specific region
+        ec2 = get_client('ec2', region)
+
         # Check if a VPC with the same name already exists
         existing_vpc_id = get_vpc_by_name(ec2, vpc_name)
         if existing_vpc_id:
@@ -29,19 +38,13 @@ def create_vpc(cidr_block, owner, vpc_name, region='us-east-1'):
         # Create the VPC
         response = ec2.create_vpc(
             CidrBlock=cidr_block,
-            TagSpecifications=[
-                {
-                    'ResourceType': 'vpc',
-                    'Tags': [
-                        {'Key': 'owner', 'Value': owner},
-                        {'Key': 'Name', 'Value': vpc_name}
-                    ]
-                }
-            ]
+            TagSpecifications=tag_specifications('vpc', dict(tags or {}, owner=owner), vpc_name)
         )
 
         # Extract the VPC ID
         vpc_id = response['Vpc']['VpcId']
+        remember(ec2, 'vpc', vpc_name, {'VpcId': vpc_id, 'CidrBlock': cidr_block})
+        remember_new_vpc(ec2, vpc_id)
         print(f"[✅] Successfully created VPC with ID: {vpc_id}")
         return vpc_id
 
@@ -52,30 +55,28 @@ def create_vpc(cidr_block, owner, vpc_name, region='us-east-1'):
     except Exception as e:
         print(f"[❌] Error: {str(e)}")
 
-def get_subnet_by_name(ec2, subnet_name):
-    """Check if a subnet with the given name already exists."""
+def get_subnet_by_name(ec2, subnet_name, vpc_id=None):
+    """Check if a subnet with the given name already exists (in the given VPC, if any)."""
     try:
-        response = ec2.describe_subnets(
-            Filters=[
-                {'Name': 'tag:Name', 'Values': [subnet_name]}
-            ]
-        )
-        subnets = response.get('Subnets', [])
-        if subnets:
-            return subnets[0]['SubnetId']  # Return the first matching Subnet ID
+        subnet = resolve_subnets(ec2, [subnet_name], vpc_id)[subnet_name]
+        if subnet:
+            return subnet['SubnetId']
         return None
+    except AmbiguousMatchError:
+        # Never report an ambiguous name as missing: the caller would create yet another subnet
+        raise
     except Exception as e:
         print(f"[❌] Error while checking for existing subnet: {str(e)}")
         return None
 
 
-def create_subnet(vpc_id, cidr_block, subnet_name, availability_zone, is_public, region='us-east-1'):
+def create_subnet(vpc_id, cidr_block, subnet_name, availability_zone, is_public, region='us-east-1', tags=None):
     try:
         # Initialize the EC2 client with a specific region
-        ec2 = boto3.client('ec2', region_name=region)
+        ec2 = get_client('ec2', region)
 
         # Check if a subnet with the same name already exists
-        existing_subnet_id = get_subnet_by_name(ec2, subnet_name)
+        existing_subnet_id = get_subnet_by_name(ec2, subnet_name, vpc_id)
         if existing_subnet_id:
             print(f"[⚠️] Subnet with name '{subnet_name}' already exists. Subnet ID: {existing_subnet_id}")
             return existing_subnet_id
@@ -85,19 +86,21 @@ def create_subnet(vpc_id, cidr_block, subnet_name, availability_zone, is_public,
             VpcId=vpc_id,
             CidrBlock=cidr_block,
             AvailabilityZone=availability_zone,
-            TagSpecifications=[
-                {
-                    'ResourceType': 'subnet',
-                    'Tags': [
-                        {'Key': 'Name', 'Value': subnet_name},
-                        {'Key': 'Type', 'Value': 'Public' if is_public else 'Private'}
-                    ]
-                }
-            ]
+            TagSpecifications=tag_specifications('subnet', dict(tags or {}, Type='Public' if is_public else 'Private'),
+                                                 subnet_name)
         )
 
         # Extract the Subnet ID
         subnet_id = response['Subnet']['SubnetId']
+        remember(ec2, 'subnet', subnet_name, {
+            'SubnetId': subnet_id,
+            'AvailabilityZone': availability_zone,
+            'CidrBlock': cidr_block,
+            'VpcId': vpc_id
+        }, vpc_id=vpc_id)
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot:
+            snapshot.record_subnet(subnet_name, response['Subnet'])
         print(f"[✅] Successfully created {'Public' if is_public else 'Private'} Subnet with ID: {subnet_id}")
         if is_public:
             ec2.modify_subnet_attribute(
@@ -114,32 +117,41 @@ def create_subnet(vpc_id, cidr_block, subnet_name, availability_zone, is_public,
     except Exception as e:
         print(f"[❌] Error: {str(e)}")
 
-def create_subnets(vpc_id, subnets, is_public, region='us-east-1'):
-    """Create multiple subnets based on the provided dictionary."""
+def create_subnets(vpc_id, subnets, is_public, region='us-east-1', tags=None):
+    """Create multiple subnets based on the provided dictionary and return their IDs keyed by AZ."""
+    subnet_names = {az: f"{'public' if is_public else 'private'}_subnet_{az}" for az in subnets}
+    try:
+        # One lookup for every AZ; create_subnet's own check is then served from the cache
+        resolve_subnets(get_client('ec2', region), list(subnet_names.values()), vpc_id)
+    except Exception as e:
+        print(f"[❌] Error while checking for existing subnets: {str(e)}")
+
+    subnet_ids = {}
     for az, cidr_block in subnets.items():
-        subnet_name = f"{'public' if is_public else 'private'}_subnet_{az}"
-        create_subnet(vpc_id, cidr_block, subnet_name, az, is_public, region)
+        subnet_ids[az] = create_subnet(vpc_id, cidr_block, subnet_names[az], az, is_public, region, tags=tags)
+    return subnet_ids
 
 
 def get_default_route_table(vpc_id, region='us-east-1'):
     """Retrieve the default route table for a given VPC."""
     try:
         # Initialize the EC2 client with a specific region
-        ec2 = boto3.client('ec2', region_name=region)
-
-        # Describe route tables filtered by the VPC ID
-        response = ec2.describe_route_tables(
-            Filters=[
-                {'Name': 'vpc-id', 'Values': [vpc_id]}
-            ]
-        )
-
-        # Iterate through the route tables to find the default one
-        for route_table in response.get('RouteTables', []):
-            for association in route_table.get('Associations', []):
-                if association.get('Main'):  # Check if it's the main route table
-                    print(f"[✅] Default Route Table ID: {route_table['RouteTableId']}")
-                    return route_table['RouteTableId']
+        ec2 = get_client('ec2', region)
+
+        # Use the run's VPC snapshot if one was loaded
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot and snapshot.default_route_table_id():
+            print(f"[✅] Default Route Table ID: {snapshot.default_route_table_id()}")
+            return snapshot.default_route_table_id()
+
+        # Let EC2 pick out the main route table instead of paging through every table in the VPC
+        route_table = find_unique(ec2, 'describe_route_tables', [
+            {'Name': 'vpc-id', 'Values': [vpc_id]},
+            {'Name': 'association.main', 'Values': ['true']}
+        ], 'route-table', 'RouteTableId')
+        if route_table:
+            print(f"[✅] Default Route Table ID: {route_table['RouteTableId']}")
+            return route_table['RouteTableId']
 
         print("[⚠️] No default route table found for the given VPC.")
         return None
@@ -159,16 +171,22 @@ def get_existing_internet_gateway(vpc_id, region):
     :param region: The AWS region.
     :return: The ID of the existing Internet Gateway, or None if not found.
     """
-    ec2 = boto3.client('ec2', region_name=region)
+    ec2 = get_client('ec2', region)
     try:
-        response = ec2.describe_internet_gateways(
-            Filters=[
-                {'Name': 'attachment.vpc-id', 'Values': [vpc_id]}
-            ]
-        )
-        igws = response.get('InternetGateways', [])
-        if igws:
-            igw_id = igws[0]['InternetGatewayId']
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot:
+            igw_id = snapshot.internet_gateway_id()
+            if igw_id:
+                print(f"[⚠️] Internet Gateway already exists with ID: {igw_id}")
+            else:
+                print("[ℹ️] No existing Internet Gateway found for this VPC.")
+            return igw_id
+
+        igw = find_unique(ec2, 'describe_internet_gateways', [
+            {'Name': 'attachment.vpc-id', 'Values': [vpc_id]}
+        ], 'internet-gateway', 'InternetGatewayId')
+        if igw:
+            igw_id = igw['InternetGatewayId']
             print(f"[⚠️] Internet Gateway already exists with ID: {igw_id}")
             return igw_id
         else:
@@ -177,30 +195,25 @@ def get_existing_internet_gateway(vpc_id, region):
     except Exception as e:
         print(f"[❌] Error checking Internet Gateway: {str(e)}")
         return None
-def create_and_attach_internet_gateway(vpc_id, region='us-east-1'):
+def create_and_attach_internet_gateway(vpc_id, owner, vpc_name, region='us-east-1', tags=None):
     """
-    Create an Internet Gateway and attach it to the specified VPC.
+    Create an Internet Gateway, tagged as it is created, and attach it to the specified VPC.
 
     :param vpc_id: The ID of the VPC to attach the Internet Gateway to.
+    :param owner: The owner tag value.
+    :param vpc_name: The Name tag value.
     :param region: The AWS region where the VPC exists.
+    :param tags: Common tags (see functions.tagging.common_tags()); owner and Name are added.
     :return: The ID of the created Internet Gateway.
     """
     try:
         # Initialize the EC2 client
-        ec2 = boto3.client('ec2', region_name=region)
-
-        # Create the Internet Gateway
-        igw_response = ec2.create_internet_gateway()
-
-        internet_gateway_id = igw_response['InternetGateway']['InternetGatewayId']
+        ec2 = get_client('ec2', region)
 
-        # Apply tags to the Internet Gateway
-        ec2.create_tags(
-            Resources=[internet_gateway_id],
-            Tags=[
-                {'Key': 'owner', 'Value': owner},
-                {'Key': 'Name', 'Value': vpc_name}
-            ]
+        # Create the Internet Gateway with its tags in the same call
+        igw_tags = tag_list(dict(tags or {}, owner=owner), vpc_name)
+        igw_response = ec2.create_internet_gateway(
+            TagSpecifications=[{'ResourceType': 'internet-gateway', 'Tags': igw_tags}]
         )
         igw_id = igw_response['InternetGateway']['InternetGatewayId']
         print(f"[✅] Internet Gateway created with ID: {igw_id}")
@@ -211,6 +224,9 @@ def create_and_attach_internet_gateway(vpc_id, region='us-east-1'):
             VpcId=vpc_id
         )
         print(f"[✅] Internet Gateway {igw_id} attached to VPC {vpc_id}")
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot:
+            snapshot.record_internet_gateway(igw_id, igw_tags)
 
         return igw_id
 
@@ -218,49 +234,41 @@ def create_and_attach_internet_gateway(vpc_id, region='us-east-1'):
         print(f"[❌] Error: {str(e)}")
         return None
 
-def get_or_create_route_table(vpc_id, route_table_name, owner, region='us-east-1'):
+def get_or_create_route_table(vpc_id, route_table_name, owner, region='us-east-1', tags=None):
     """
     Check if a route table with the specified name exists in the VPC.
-    If it doesn't exist, create and tag the route table.
+    If it doesn't exist, create it with its tags.
 
     :param vpc_id: The ID of the VPC.
     :param route_table_name: The name of the route table to check or create.
     :param owner: The owner tag value.
     :param region: The AWS region where the VPC exists.
+    :param tags: Common tags (see functions.tagging.common_tags()); owner and Name are added.
     :return: The ID of the existing or newly created route table.
     """
     try:
         # Initialize the EC2 client
-        ec2 = boto3.client('ec2', region_name=region)
+        ec2 = get_client('ec2', region)
 
-        # Describe route tables in the VPC
-        response = ec2.describe_route_tables(
-            Filters=[
-                {'Name': 'vpc-id', 'Values': [vpc_id]},
-                {'Name': 'tag:Name', 'Values': [route_table_name]}
-            ]
-        )
-
-        # Check if a route table with the specified name exists
-        if response['RouteTables']:
-            route_table_id = response['RouteTables'][0]['RouteTableId']
+        # Check if a route table with the specified name exists in the VPC
+        route_table = resolve_route_tables(ec2, [route_table_name], vpc_id)[route_table_name]
+        if route_table:
+            route_table_id = route_table['RouteTableId']
             print(f"[✅] Route Table with name '{route_table_name}' already exists: {route_table_id}")
             return route_table_id
 
-        # Create a new route table if it doesn't exist
-        route_table_response = ec2.create_route_table(VpcId=vpc_id)
-        route_table_id = route_table_response['RouteTable']['RouteTableId']
-        print(f"[✅] Created new Route Table with ID: {route_table_id}")
-
-        # Tag the new route table
-        ec2.create_tags(
-            Resources=[route_table_id],
-            Tags=[
-                {'Key': 'owner', 'Value': owner},
-                {'Key': 'Name', 'Value': route_table_name}
-            ]
+        # Create a new route table if it doesn't exist, named in the same call
+        route_table_tags = tag_list(dict(tags or {}, owner=owner), route_table_name)
+        route_table_response = ec2.create_route_table(
+            VpcId=vpc_id,
+            TagSpecifications=[{'ResourceType': 'route-table', 'Tags': route_table_tags}]
         )
-        print(f"[✅] Tagged Route Table {route_table_id} with Name: {route_table_name}")
+        route_table_id = route_table_response['RouteTable']['RouteTableId']
+        print(f"[✅] Created new Route Table with ID: {route_table_id} and Name: {route_table_name}")
+        remember(ec2, 'route-table', route_table_name, {'RouteTableId': route_table_id, 'VpcId': vpc_id}, vpc_id=vpc_id)
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot:
+            snapshot.record_route_table(dict(route_table_response['RouteTable'], Tags=route_table_tags))
 
         return route_table_id
 
@@ -268,193 +276,597 @@ def get_or_create_route_table(vpc_id, route_table_name, owner, region='us-east-1
         print(f"[❌] Error: {str(e)}")
         return None
 
-def associate_private_subnets_to_route_table(vpc_id, route_table_name, region='us-east-1'):
+def _associate_subnet(ec2, route_table_id, subnet_id, current_association_id):
+    """
+    Associate one subnet with a route table, replacing an explicit association to another table.
+
+    :return: Tuple of ('associated' or 'moved', new association ID).
+    """
+    if current_association_id:
+        response = ec2.replace_route_table_association(
+            AssociationId=current_association_id,
+            RouteTableId=route_table_id
+        )
+        return 'moved', response['NewAssociationId']
+    response = ec2.associate_route_table(
+        RouteTableId=route_table_id,
+        SubnetId=subnet_id
+    )
+    return 'associated', response['AssociationId']
+
+
+def associate_private_subnets_to_route_table(vpc_id, route_table_name, region='us-east-1', max_workers=8):
     """
     Associate all subnets with names containing 'private_subnet' in the VPC to the specified route table.
 
+    One VPC-wide pass over the route tables, indexed by subnet ID, decides which
+    subnets still need work; the remaining associations then run concurrently.
+    Several route tables named route_table_name are reported as an error.
+
     :param vpc_id: The ID of the VPC.
     :param route_table_name: The name of the route table to associate with private subnets.
     :param region: The AWS region where the VPC exists.
+    :param max_workers: Maximum number of association calls in flight.
+    :return: Dictionary with 'route_table_id' and the subnet IDs that were 'associated', 'moved'
+             from another route table, 'already_associated', or 'failed' (subnet ID -> error),
+             or None if the route table or subnets could not be found.
     """
     try:
         # Initialize the EC2 client
-        ec2 = boto3.client('ec2', region_name=region)
+        ec2 = get_client('ec2', region)
 
-        # Get the route table ID by name
-        route_table_response = ec2.describe_route_tables(
-            Filters=[
-                {'Name': 'vpc-id', 'Values': [vpc_id]},
-                {'Name': 'tag:Name', 'Values': [route_table_name]}
-            ]
-        )
-        if not route_table_response['RouteTables']:
+        # Stream every route table in the VPC once, or reuse the run's VPC snapshot;
+        # only the named tables and the subnet associations are kept
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot:
+            route_tables = snapshot.route_tables.values()
+        else:
+            route_tables = iter_resources(ec2, 'describe_route_tables', [{'Name': 'vpc-id', 'Values': [vpc_id]}])
+
+        named = []
+        subnet_associations = {}
+        for route_table in route_tables:
+            if any(tag['Key'] == 'Name' and tag['Value'] == route_table_name for tag in route_table.get('Tags', [])):
+                named.append(route_table['RouteTableId'])
+            for association in route_table.get('Associations', []):
+                if association.get('SubnetId'):
+                    subnet_associations[association['SubnetId']] = association
+
+        if len(named) > 1:
+            print(f"[❌] {AmbiguousMatchError('route-table', {route_table_name: named})}")
+            return
+        route_table_id = named[0] if named else None
+        if not route_table_id:
             print(f"[❌] Route table with name '{route_table_name}' not found.")
             return
-
-        route_table_id = route_table_response['RouteTables'][0]['RouteTableId']
         print(f"[✅] Found Route Table '{route_table_name}' with ID: {route_table_id}")
 
         # Get all subnets with names containing 'private_subnet'
-        subnets_response = ec2.describe_subnets(
-            Filters=[
+        if snapshot:
+            private_subnets = [subnet['SubnetId'] for name, subnet in snapshot.subnets.items() if 'private_subnet' in name]
+        else:
+            private_subnets = [subnet['SubnetId'] for subnet in iter_resources(ec2, 'describe_subnets', [
                 {'Name': 'vpc-id', 'Values': [vpc_id]},
                 {'Name': 'tag:Name', 'Values': ['*private_subnet*']}
-            ]
-        )
-
-        # Extract subnet IDs
-        private_subnets = [subnet['SubnetId'] for subnet in subnets_response['Subnets']]
+            ])]
         if not private_subnets:
             print(f"[❌] No subnets with names containing 'private_subnet' found in VPC {vpc_id}.")
             return
 
-        # Associate private subnets with the route table
+        summary = {'route_table_id': route_table_id, 'associated': [], 'moved': [], 'already_associated': [], 'failed': {}}
+        pending = {}
         for subnet_id in private_subnets:
-            # Check if the subnet is already associated with the route table
-            route_table_associations = ec2.describe_route_tables(
-                Filters=[
-                    {'Name': 'association.subnet-id', 'Values': [subnet_id]}
-                ]
-            )
-            
-            already_associated = False
-            for route_table in route_table_associations['RouteTables']:
-                for association in route_table.get('Associations', []):
-                    if association.get('RouteTableId') == route_table_id:
-                        already_associated = True
-                        break
-                if already_associated:
-                    break
-
-            if not already_associated:
-                # Associate the subnet if not already associated
-                ec2.associate_route_table(
-                    RouteTableId=route_table_id,
-                    SubnetId=subnet_id
-                )
-                print(f"[✅] Associated Subnet {subnet_id} with Route Table {route_table_id}")
-            else:
+            association = subnet_associations.get(subnet_id)
+            if association and association['RouteTableId'] == route_table_id:
                 print(f"[ℹ️] Subnet {subnet_id} is already associated with Route Table {route_table_id}")
+                summary['already_associated'].append(subnet_id)
+            else:
+                pending[subnet_id] = association['RouteTableAssociationId'] if association else None
+
+        # Associate the remaining private subnets concurrently
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+                futures = {
+                    subnet_id: pool.submit(_associate_subnet, ec2, route_table_id, subnet_id, association_id)
+                    for subnet_id, association_id in pending.items()
+                }
+            for subnet_id, future in futures.items():
+                try:
+                    outcome, association_id = future.result()
+                    summary[outcome].append(subnet_id)
+                    if snapshot:
+                        snapshot.record_association(route_table_id, subnet_id, association_id)
+                    print(f"[✅] Associated Subnet {subnet_id} with Route Table {route_table_id}")
+                except Exception as e:
+                    print(f"[❌] Error associating Subnet {subnet_id}: {e}")
+                    summary['failed'][subnet_id] = str(e)
+
+        return summary
 
     except Exception as e:
         print(f"[❌] An error occurred: {e}")
 
 
-def create_nat_gateway_and_update_routes(vpc_id, private_rtb_name, public_subnet_id, region='us-east-1'):
+def name_default_route_table(vpc_id, route_table_name, owner, region='us-east-1', tags=None):
+    """
+    Tag the VPC's default route table with a Name, skipping the call if it already has it.
+
+    EC2 creates the default route table with the VPC, so it is the one resource that
+    cannot be tagged on creation.
+
+    :param vpc_id: The ID of the VPC.
+    :param route_table_name: The Name tag value for the default route table.
+    :param owner: The owner tag value.
+    :param region: The AWS region.
+    :param tags: Common tags (see functions.tagging.common_tags()); owner and Name are added.
+    :return: The ID of the default route table, or None on error.
+    """
+    route_table_id = get_default_route_table(vpc_id, region=region)
+    if not route_table_id:
+        return None
+    try:
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot and snapshot.route_table_id(route_table_name) == route_table_id:
+            print(f"[ℹ️] Route Table {route_table_id} is already named '{route_table_name}'.")
+            return route_table_id
+        route_table_tags = dict(tags or {}, owner=owner, Name=route_table_name)
+        tag_resources(get_client('ec2', region), [route_table_id], route_table_tags)
+        if snapshot:
+            snapshot.record_tags([route_table_id], route_table_tags)
+        print(f"[✅] Tagged Route Table {route_table_id} with Name: {route_table_name}")
+        return route_table_id
+    except Exception as e:
+        print(f"[❌] Error: {str(e)}")
+
+
+def retag_vpc_resources(vpc_id, tags, region='us-east-1'):
+    """
+    Bring the common tags onto every resource the run's VPC snapshot knows, in one batched create_tags call.
+
+    New resources are tagged as they are created; this catches the ones created before a
+    tag was added to the common set. Resources whose owner tag names someone else are
+    reported and left alone. Without a snapshot (the VPC is new in this run) nothing is
+    read or written.
+
+    :param vpc_id: The ID of the VPC.
+    :param tags: Common tags (see functions.tagging.common_tags()).
+    :param region: The AWS region.
+    :return: List of the resource IDs that were retagged, or None on error.
+    """
+    snapshot = get_snapshot(vpc_id, region)
+    if not snapshot:
+        return []
+    try:
+        retag = []
+        for resource_id, resource_tags in snapshot.tagged_resources():
+            missing = missing_tags(resource_tags, tags)
+            if 'owner' in missing and any(tag['Key'] == 'owner' for tag in resource_tags):
+                print(f"[⚠️] {resource_id} is owned by someone else; not retagging it.")
+            elif missing:
+                retag.append(resource_id)
+        if not retag:
+            print(f"[ℹ️] Every resource in VPC {vpc_id} already carries the common tags.")
+            return []
+        calls = tag_resources(get_client('ec2', region), retag, tags)
+        snapshot.record_tags(retag, tags)
+        print(f"[✅] Retagged {len(retag)} resource(s) in VPC {vpc_id} with {calls} create_tags call(s).")
+        return retag
+    except Exception as e:
+        print(f"[❌] Error: {str(e)}")
+
+
+def create_default_route(route_table_id, gateway_id, region='us-east-1'):
+    """
+    Route 0.0.0.0/0 in a route table through an Internet Gateway.
+
+    :param route_table_id: The ID of the route table.
+    :param gateway_id: The ID of the Internet Gateway.
+    :param region: The AWS region.
+    :return: True if the route exists after the call, otherwise None.
+    """
+    try:
+        ec2 = get_client('ec2', region)
+        snapshot = find_route_table_snapshot(route_table_id, region)
+        if snapshot and snapshot.has_route(route_table_id, "0.0.0.0/0", GatewayId=gateway_id):
+            print(f"[ℹ️] Route Table {route_table_id} already routes through Internet Gateway {gateway_id}.")
+            return True
+
+        try:
+            ec2.create_route(RouteTableId=route_table_id, DestinationCidrBlock="0.0.0.0/0", GatewayId=gateway_id)
+            print(f"[✅] Internet Gateway {gateway_id} attached to Public Route Table {route_table_id}")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'RouteAlreadyExists':
+                raise
+            # The existing default route is a blackhole or points elsewhere: repoint it at the gateway
+            ec2.replace_route(RouteTableId=route_table_id, DestinationCidrBlock="0.0.0.0/0", GatewayId=gateway_id)
+            print(f"[✅] Replaced the default route of Route Table {route_table_id} with Internet Gateway {gateway_id}")
+        if snapshot:
+            snapshot.record_route(route_table_id, {'DestinationCidrBlock': "0.0.0.0/0", 'GatewayId': gateway_id})
+        return True
+    except ClientError as e:
+        print(f"[❌] Error: {str(e)}")
+    except Exception as e:
+        print(f"[❌] Error: {str(e)}")
+
+
+def _existing_nat_gateways(ec2, vpc_id, public_subnet_ids, snapshot):
+    """
+    Find the available or pending NAT Gateway in each public subnet.
+
+    One paginated describe_nat_gateways call covers every subnet (none if the run's
+    VPC snapshot is loaded). A subnet with several NAT Gateways is reported and an
+    available one is preferred.
+
+    :return: Dictionary of public subnet ID -> NAT Gateway description, for the subnets that have one.
+    """
+    if snapshot:
+        candidates = [nat_gateway for nat_gateway in snapshot.nat_gateways.values()
+                      if nat_gateway['SubnetId'] in public_subnet_ids and nat_gateway['State'] in ('available', 'pending')]
+    else:
+        candidates = iter_resources(ec2, 'describe_nat_gateways', [
+            {'Name': 'vpc-id', 'Values': [vpc_id]},
+            {'Name': 'subnet-id', 'Values': list(public_subnet_ids)},
+            {'Name': 'state', 'Values': ['available', 'pending']}
+        ])
+
+    by_subnet = {}
+    for nat_gateway in candidates:
+        by_subnet.setdefault(nat_gateway['SubnetId'], []).append(nat_gateway)
+    existing = {}
+    for subnet_id, nat_gateways in by_subnet.items():
+        nat_gateways.sort(key=lambda nat_gateway: (nat_gateway['State'] != 'available', nat_gateway['NatGatewayId']))
+        existing[subnet_id] = nat_gateways[0]
+        if len(nat_gateways) > 1:
+            print(f"[⚠️] {len(nat_gateways)} NAT Gateways found in subnet {subnet_id} "
+                  f"({', '.join(nat_gateway['NatGatewayId'] for nat_gateway in nat_gateways)}); "
+                  f"using {nat_gateways[0]['NatGatewayId']}.")
+    return existing
+
+
+def _create_nat_gateway(ec2, public_subnet_id, tags=None):
+    """
+    Allocate an Elastic IP and create a NAT Gateway with it in a public subnet, both tagged on creation.
+
+    :param tags: Dictionary of tags for the Elastic IP and the NAT Gateway.
+    :return: The ID of the new (still pending) NAT Gateway.
+    """
+    eip_response = ec2.allocate_address(Domain='vpc', TagSpecifications=tag_specifications('elastic-ip', tags or {}))
+    allocation_id = eip_response['AllocationId']
+    print(f"[✅] Allocated Elastic IP with Allocation ID: {allocation_id}")
+
+    nat_gateway_response = ec2.create_nat_gateway(
+        SubnetId=public_subnet_id,
+        AllocationId=allocation_id,
+        TagSpecifications=tag_specifications('natgateway', tags or {})
+    )
+    nat_gateway_id = nat_gateway_response['NatGateway']['NatGatewayId']
+    print(f"[✅] Created NAT Gateway with ID: {nat_gateway_id} in subnet {public_subnet_id}")
+    return nat_gateway_id
+
+
+def _route_through_nat_gateway(ec2, route_table_id, nat_gateway_id, snapshot):
+    """
+    Route 0.0.0.0/0 in a route table through a NAT Gateway.
+
+    A default route that points somewhere else (e.g. the shared NAT Gateway of
+    single mode) is replaced.
+
+    :return: 'unchanged', 'created' or 'replaced'.
+    """
+    if snapshot and snapshot.has_route(route_table_id, '0.0.0.0/0', NatGatewayId=nat_gateway_id):
+        return 'unchanged'
+    try:
+        ec2.create_route(RouteTableId=route_table_id, DestinationCidrBlock='0.0.0.0/0', NatGatewayId=nat_gateway_id)
+        outcome = 'created'
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'RouteAlreadyExists':
+            raise
+        ec2.replace_route(RouteTableId=route_table_id, DestinationCidrBlock='0.0.0.0/0', NatGatewayId=nat_gateway_id)
+        outcome = 'replaced'
+    if snapshot:
+        snapshot.record_route(route_table_id, {'DestinationCidrBlock': '0.0.0.0/0', 'NatGatewayId': nat_gateway_id})
+    return outcome
+
+
+def create_nat_gateway_and_update_routes(vpc_id, private_rtb_name, public_subnet_id, region='us-east-1', tags=None):
     """
     Create a NAT Gateway and update the routes in the private route table.
-    If a NAT Gateway already exists in the VPC, reuse it.
+    If a NAT Gateway already exists in the public subnet, reuse it; if there are
+    several, the choice is reported and an available one is preferred.
 
     :param vpc_id: The ID of the VPC.
     :param private_rtb_name: The name of the private route table.
     :param public_subnet_id: The ID of the public subnet where the NAT Gateway will be created.
     :param region: The AWS region.
+    :param tags: Tags for a new NAT Gateway and its Elastic IP (see functions.tagging.common_tags()).
+    :return: The ID of the NAT Gateway the private route table now uses, or None on error.
     """
     try:
-        ec2 = boto3.client('ec2', region_name=region)
+        ec2 = get_client('ec2', region)
 
-        # Step 1: Check if a NAT Gateway already exists in the VPC
-        print("[ℹ️] Checking for existing NAT Gateways in the VPC...")
-        nat_gateways_response = ec2.describe_nat_gateways(
-            Filters=[
-                {'Name': 'vpc-id', 'Values': [vpc_id]},
-                {'Name': 'state', 'Values': ['available', 'pending']}
-            ]
-        )
-        existing_nat_gateways = nat_gateways_response.get('NatGateways', [])
+        # Step 1: Check if a NAT Gateway already exists in the public subnet
+        print("[ℹ️] Checking for existing NAT Gateways in the public subnet...")
+        snapshot = get_snapshot(vpc_id, region)
+        existing = _existing_nat_gateways(ec2, vpc_id, [public_subnet_id], snapshot).get(public_subnet_id)
 
-        if existing_nat_gateways:
-            nat_gateway_id = existing_nat_gateways[0]['NatGatewayId']
+        if existing:
+            nat_gateway_id = existing['NatGatewayId']
             print(f"[✅] Found existing NAT Gateway with ID: {nat_gateway_id}")
         else:
-            # Step 2: Allocate an Elastic IP for the NAT Gateway
-            eip_response = ec2.allocate_address(Domain='vpc')
-            allocation_id = eip_response['AllocationId']
-            print(f"[✅] Allocated Elastic IP with Allocation ID: {allocation_id}")
-
-            # Step 3: Create the NAT Gateway in the public subnet
-            nat_gateway_response = ec2.create_nat_gateway(
-                SubnetId=public_subnet_id,
-                AllocationId=allocation_id
-            )
-            nat_gateway_id = nat_gateway_response['NatGateway']['NatGatewayId']
-            print(f"[✅] Created NAT Gateway with ID: {nat_gateway_id}")
+            # Step 2: Allocate an Elastic IP and create the NAT Gateway in the public subnet
+            nat_gateway_id = _create_nat_gateway(ec2, public_subnet_id, tags)
 
-            # Wait for the NAT Gateway to become available
-            waiter = ec2.get_waiter('nat_gateway_available')
+            # Step 3: Wait for the NAT Gateway to become available
             print("[ℹ️] Waiting for the NAT Gateway to become available...")
-            waiter.wait(NatGatewayIds=[nat_gateway_id])
+            waited = wait_for_resources([('nat_gateway', nat_gateway_id)], region=region)
+            if waited['failures']:
+                raise RuntimeError('; '.join(waited['failures'].values()))
             print(f"[✅] NAT Gateway {nat_gateway_id} is now available.")
+            if snapshot:
+                snapshot.record_nat_gateway(waited['results'][('nat_gateway', nat_gateway_id)])
 
         # Step 4: Get the Route Table ID for the private route table
-        route_table_response = ec2.describe_route_tables(
-            Filters=[
-                {'Name': 'vpc-id', 'Values': [vpc_id]},
-                {'Name': 'tag:Name', 'Values': [private_rtb_name]}
-            ]
-        )
-        if not route_table_response['RouteTables']:
+        route_table = resolve_route_tables(ec2, [private_rtb_name], vpc_id)[private_rtb_name]
+        if not route_table:
             print(f"[❌] Route table with name '{private_rtb_name}' not found.")
             return
 
-        private_rtb_id = route_table_response['RouteTables'][0]['RouteTableId']
+        private_rtb_id = route_table['RouteTableId']
         print(f"[✅] Found Private Route Table '{private_rtb_name}' with ID: {private_rtb_id}")
 
         # Step 5: Update the private route table to route traffic through the NAT Gateway
-        ec2.create_route(
-            RouteTableId=private_rtb_id,
-            DestinationCidrBlock='0.0.0.0/0',
-            NatGatewayId=nat_gateway_id
-        )
-        print(f"[✅] Updated Route Table {private_rtb_id} to route traffic through NAT Gateway {nat_gateway_id}")
+        if _route_through_nat_gateway(ec2, private_rtb_id, nat_gateway_id, snapshot) == 'unchanged':
+            print(f"[ℹ️] Route Table {private_rtb_id} already routes traffic through NAT Gateway {nat_gateway_id}")
+        else:
+            print(f"[✅] Updated Route Table {private_rtb_id} to route traffic through NAT Gateway {nat_gateway_id}")
+        return nat_gateway_id
 
     except Exception as e:
         print(f"[❌] An error occurred: {e}")
 
 
-# Example usage
-if __name__ == "__main__":
-    owner       = "ikallam"
-    cidr_block  = "10.0.0.0/16"
-    vpc_name    = f"{owner}-testing-vpc"
-    region_name = "us-east-1"
-    ec2 = boto3.client('ec2', region_name=region_name)
-    vpc_id = create_vpc(cidr_block, owner, vpc_name, region_name)
+def az_route_table_name(private_rtb_name, az):
+    """Name of the private route table of one AZ in per-AZ NAT mode, e.g. 'private_rtb_us-east-1a'."""
+    return f"{private_rtb_name}_{az}"
+
+
+def _prepare_az(ec2, vpc_id, az, public_subnet_id, private_subnet_id, route_table_name, owner, region,
+                existing_nat_gateway, current_association, tags=None):
+    """
+    First half of one AZ's egress setup: its NAT Gateway (reused or created) and its
+    private route table with the AZ's private subnet associated.
+
+    :return: Tuple of (NAT Gateway ID, route table ID).
+    """
+    if existing_nat_gateway:
+        nat_gateway_id = existing_nat_gateway['NatGatewayId']
+        print(f"[✅] [{az}] Found existing NAT Gateway with ID: {nat_gateway_id}")
+    else:
+        nat_gateway_id = _create_nat_gateway(ec2, public_subnet_id, dict(tags or {}, owner=owner))
+
+    route_table_id = get_or_create_route_table(vpc_id, route_table_name, owner, region=region, tags=tags)
+    if not route_table_id:
+        raise RuntimeError(f"route table '{route_table_name}' could not be created")
+    if current_association and current_association['RouteTableId'] == route_table_id:
+        print(f"[ℹ️] [{az}] Subnet {private_subnet_id} is already associated with Route Table {route_table_id}")
+    else:
+        try:
+            _, association_id = _associate_subnet(ec2, route_table_id, private_subnet_id,
+                                                  current_association['RouteTableAssociationId'] if current_association else None)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'Resource.AlreadyAssociated':
+                raise
+            # Associated with a table the snapshot does not cover: look the association up and move it
+            route_table = find_unique(ec2, 'describe_route_tables', [
+                {'Name': 'association.subnet-id', 'Values': [private_subnet_id]}], 'route-table', 'RouteTableId')
+            association = next(association for association in route_table['Associations']
+                               if association.get('SubnetId') == private_subnet_id)
+            _, association_id = _associate_subnet(ec2, route_table_id, private_subnet_id,
+                                                  association['RouteTableAssociationId'])
+        snapshot = get_snapshot(vpc_id, region)
+        if snapshot:
+            snapshot.record_association(route_table_id, private_subnet_id, association_id)
+        print(f"[✅] [{az}] Associated Subnet {private_subnet_id} with Route Table {route_table_id}")
+    return nat_gateway_id, route_table_id
+
+
+def create_nat_gateways_per_az(vpc_id, public_subnet_ids, private_subnet_ids, private_rtb_name, owner,
+                               region='us-east-1', max_workers=8, tags=None):
+    """
+    Give every AZ its own NAT Gateway and private route table, so node egress never crosses AZs.
+
+    The AZs are set up concurrently: Elastic IP allocation, NAT Gateway creation and
+    each AZ's route table and subnet association run in a worker pool, every new or
+    still pending NAT Gateway is then awaited in one shared waiter, and finally each
+    route table gets its default route through its own AZ's NAT Gateway. Existing NAT
+    Gateways, route tables, associations and routes are reused, so a re-run of a
+    finished VPC makes no changes. A private subnet still associated with the shared
+    private route table of single mode is moved to its AZ's table.
+
+    :param vpc_id: The ID of the VPC.
+    :param public_subnet_ids: Dictionary of AZ -> public subnet ID (where each NAT Gateway lives).
+    :param private_subnet_ids: Dictionary of AZ -> private subnet ID.
+    :param private_rtb_name: Base name of the private route tables; each AZ's table is
+                             named az_route_table_name(private_rtb_name, az).
+    :param owner: The owner tag value.
+    :param region: The AWS region.
+    :param max_workers: Maximum number of AZs set up at once.
+    :param tags: Common tags for every NAT Gateway, Elastic IP and route table (see
+                 functions.tagging.common_tags()); owner is added.
+    :return: Dictionary with 'results' (AZ -> {'nat_gateway_id', 'route_table_id'}) and
+             'failures' (AZ -> error message).
+    """
+    results, failures = {}, {}
+    ec2 = get_client('ec2', region)
+    snapshot = get_snapshot(vpc_id, region)
+
+    for az in private_subnet_ids:
+        if not public_subnet_ids.get(az):
+            failures[az] = f"no public subnet in {az} for its NAT Gateway"
+    azs = [az for az in private_subnet_ids if az not in failures]
+    if not azs:
+        return {'results': results, 'failures': failures}
+
+    # Read once for every AZ: NAT Gateways, route table names and subnet associations
+    try:
+        existing = _existing_nat_gateways(ec2, vpc_id, [public_subnet_ids[az] for az in azs], snapshot)
+        route_table_names = {az: az_route_table_name(private_rtb_name, az) for az in azs}
+        resolve_route_tables(ec2, list(route_table_names.values()), vpc_id)
+        if snapshot:
+            associations = snapshot.subnet_associations()
+        else:
+            associations = {}
+            for route_table in iter_resources(ec2, 'describe_route_tables', [
+                    {'Name': 'association.subnet-id', 'Values': [private_subnet_ids[az] for az in azs]}]):
+                for association in route_table.get('Associations', []):
+                    if association.get('SubnetId'):
+                        associations[association['SubnetId']] = association
+    except Exception as e:
+        print(f"[❌] Error reading the VPC's NAT Gateways and route tables: {e}")
+        return {'results': results, 'failures': dict(failures, **{az: str(e) for az in azs})}
+
+    # NAT Gateways, route tables and associations for every AZ at once
+    prepared = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(azs))) as pool:
+        futures = {az: pool.submit(_prepare_az, ec2, vpc_id, az, public_subnet_ids[az], private_subnet_ids[az],
+                                   route_table_names[az], owner, region, existing.get(public_subnet_ids[az]),
+                                   associations.get(private_subnet_ids[az]), tags)
+                   for az in azs}
+    for az, future in futures.items():
+        try:
+            prepared[az] = future.result()
+        except Exception as e:
+            print(f"[❌] [{az}] Error: {e}")
+            failures[az] = str(e)
+
+    # One waiter for every NAT Gateway that is not available yet
+    pending = [nat_gateway_id for az, (nat_gateway_id, _) in prepared.items()
+               if (existing.get(public_subnet_ids[az]) or {}).get('State') != 'available']
+    if pending:
+        print(f"[ℹ️] Waiting for {len(pending)} NAT Gateway(s) to become available...")
+        waited = wait_for_resources([('nat_gateway', nat_gateway_id) for nat_gateway_id in pending], region=region)
+        for az, (nat_gateway_id, _) in list(prepared.items()):
+            handle = ('nat_gateway', nat_gateway_id)
+            if handle in waited['failures']:
+                failures[az] = waited['failures'][handle]
+                del prepared[az]
+            elif handle in waited['results'] and snapshot:
+                snapshot.record_nat_gateway(waited['results'][handle])
+
+    # Each AZ's default route through its own NAT Gateway
+    if prepared:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prepared))) as pool:
+            futures = {az: pool.submit(_route_through_nat_gateway, ec2, route_table_id, nat_gateway_id, snapshot)
+                       for az, (nat_gateway_id, route_table_id) in prepared.items()}
+        for az, future in futures.items():
+            nat_gateway_id, route_table_id = prepared[az]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                print(f"[❌] [{az}] Error routing Route Table {route_table_id} through NAT Gateway {nat_gateway_id}: {e}")
+                failures[az] = str(e)
+                continue
+            if outcome == 'unchanged':
+                print(f"[ℹ️] [{az}] Route Table {route_table_id} already routes traffic through NAT Gateway {nat_gateway_id}")
+            else:
+                print(f"[✅] [{az}] Route Table {route_table_id} now routes traffic through NAT Gateway {nat_gateway_id}")
+            results[az] = {'nat_gateway_id': nat_gateway_id, 'route_table_id': route_table_id}
+
+    return {'results': results, 'failures': failures}
+
+
+def managed_route_table_names(config):
+    """
+    Names of every route table the build may manage, in either NAT Gateway mode.
+
+    Both modes' private route tables are listed, so after switching modes the
+    subnets still associated with the other mode's tables are seen and moved.
+    """
+    return [config.public_route_table_name, config.private_route_table_name] + \
+           [az_route_table_name(config.private_route_table_name, az) for az in config.private_subnets]
+
+
+def apply(config):
+    """Build or converge the VPC described by the cluster_config module."""
+    ec2 = get_client('ec2', config.region_name)
+    # With cidr_plan set, the layout below is planned against the account instead of hand-written
+    apply_cidr_plan(config)
+
+    # One concurrent snapshot drives every idempotency check below
+    load_vpc_snapshot(
+        config.vpc_name,
+        [f"public_subnet_{az}" for az in config.public_subnets] + [f"private_subnet_{az}" for az in config.private_subnets],
+        managed_route_table_names(config),
+        region=config.region_name
+    )
+    # Every resource is created with these tags; ones that predate a change to them are retagged in one batch
+    tags = common_tags(config)
+    vpc_id = create_vpc(config.cidr_block, config.owner, config.vpc_name, config.region_name, tags=tags)
     # Public Subnets
-    public_subnets = {
-        "us-east-1a": "10.0.1.0/24",
-        "us-east-1b": "10.0.2.0/24",
-        "us-east-1c": "10.0.3.0/24"
-    }
-    create_subnets(vpc_id, public_subnets, is_public=True, region=region_name)
+    public_subnet_ids = create_subnets(vpc_id, config.public_subnets, is_public=True, region=config.region_name, tags=tags)
 
     # Private Subnets
-    private_subnets = {
-        "us-east-1a": "10.0.11.0/24",
-        "us-east-1b": "10.0.12.0/24",
-        "us-east-1c": "10.0.13.0/24"
-    }
-    create_subnets(vpc_id, private_subnets, is_public=False, region=region_name)
+    private_subnet_ids = create_subnets(vpc_id, config.private_subnets, is_public=False, region=config.region_name, tags=tags)
 
     # create internet gateway for public subnets
-    internet_gateway_id = get_existing_internet_gateway(vpc_id, region_name)
+    internet_gateway_id = get_existing_internet_gateway(vpc_id, config.region_name)
     if not internet_gateway_id:
         # Create Internet Gateway if it doesn't exist
-        internet_gateway_id = create_and_attach_internet_gateway(vpc_id, region='us-east-1')
-
-    default_route_table_id = get_default_route_table(vpc_id, region=region_name)
-    ec2.create_tags(
-            Resources=[default_route_table_id],
-            Tags=[
-                {'Key': 'owner', 'Value': owner},
-                {'Key': 'Name', 'Value': "public_rtb"}
-            ]
-        )
-    # create private route table
-    private_route_table_id = get_or_create_route_table(vpc_id=vpc_id,route_table_name="private_rtb",owner=owner,region=region_name)
-    # associate private subnet to private route table
-    associate_private_subnets_to_route_table( vpc_id=vpc_id,route_table_name="private_rtb",region="us-east-1")
-
-    ec2.create_route(RouteTableId=default_route_table_id,DestinationCidrBlock="0.0.0.0/0",GatewayId=internet_gateway_id)
-    print(f"[✅] Internet Gateway {internet_gateway_id} attached to Public Route Table {default_route_table_id}")
-    create_nat_gateway_and_update_routes(vpc_id=vpc_id, private_rtb_name="private_rtb", public_subnet_id=get_subnet_by_name(ec2, "public_subnet_us-east-1a"), region=region_name)
\ No newline at end of file
+        internet_gateway_id = create_and_attach_internet_gateway(vpc_id, config.owner, config.vpc_name, region=config.region_name,
+                                                                 tags=tags)
+
+    default_route_table_id = name_default_route_table(vpc_id, config.public_route_table_name, config.owner, region=config.region_name,
+                                                      tags=tags)
+    retag_vpc_resources(vpc_id, tags, region=config.region_name)
+    if config.nat_gateway_mode == 'per_az':
+        create_default_route(default_route_table_id, internet_gateway_id, region=config.region_name)
+        # one NAT gateway and private route table per AZ, set up concurrently
+        nat_gateways = create_nat_gateways_per_az(vpc_id, public_subnet_ids, private_subnet_ids,
+                                                  config.private_route_table_name, config.owner, region=config.region_name,
+                                                  tags=tags)
+        for az, error in nat_gateways['failures'].items():
+            print(f"[❌] [{az}] NAT Gateway setup failed: {error}")
+    else:
+        # create private route table
+        get_or_create_route_table(vpc_id=vpc_id, route_table_name=config.private_route_table_name, owner=config.owner, region=config.region_name,
+                                  tags=tags)
+        # associate private subnet to private route table
+        associate_private_subnets_to_route_table(vpc_id=vpc_id, route_table_name=config.private_route_table_name, region=config.region_name)
+
+        create_default_route(default_route_table_id, internet_gateway_id, region=config.region_name)
+        create_nat_gateway_and_update_routes(vpc_id=vpc_id, private_rtb_name=config.private_route_table_name,
+                                             public_subnet_id=get_subnet_by_name(ec2, config.nat_subnet_name, vpc_id), region=config.region_name,
+                                             tags=tags)
+
+    stats = client_stats()
+    print(f"[ℹ️] Client registry built {stats['clients_created']} client(s), reused {stats['cache_hits']} time(s).")
+
+
+def plan(config, as_json=False):
+    """Print the actions apply() would take, without changing anything."""
+    from functions.plan import plan_vpc, print_plan
+    apply_cidr_plan(config)
+    print_plan(plan_vpc(config.vpc_name, config.cidr_block, config.public_subnets, config.private_subnets,
+                        config.public_route_table_name, config.private_route_table_name, config.nat_subnet_az,
+                        region=config.region_name,
+                        az_route_table_names={az: az_route_table_name(config.private_route_table_name, az)
+                                              for az in config.private_subnets}
+                        if config.nat_gateway_mode == 'per_az' else None,
+                        tags=common_tags(config)), as_json=as_json)
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import cluster_config
+
+    parser = argparse.ArgumentParser(description="Create the VPC, subnets, gateways and route tables.")
+    parser.add_argument('command', nargs='?', choices=['apply', 'plan'], default='apply',
+                        help="'plan' prints the actions without changing anything (default: apply).")
+    parser.add_argument('--json', action='store_true', help="Print the plan as JSON.")
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        plan(cluster_config, as_json=args.json)
+    else:
+        apply(cluster_config)
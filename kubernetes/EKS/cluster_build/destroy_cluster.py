@@ -0,0 +1,127 @@
+import argparse
+
+import cluster_config as config
+from build_cluster import JOURNAL_FILE
+from functions import trace
+from functions.build_graph import Step, run_steps
+from functions.clients import client_stats
+from functions.journal import Journal
+from functions.plan import plan_teardown, print_plan
+from functions.teardown import (
+    discover, delete_eks_nodegroups, delete_eks_cluster, delete_launch_templates, delete_iam_role, delete_nat_gateways,
+    release_addresses, delete_route_tables, delete_internet_gateways, delete_subnets, delete_vpc
+)
+from functions.throttle import throttle_stats
+
+
+def raise_failures(failures):
+    """Fail the step if any of its resources could not be deleted."""
+    if failures:
+        raise RuntimeError(', '.join(f"{resource}: {error}" for resource, error in failures.items()))
+
+
+def delete_role(inventory, role_name):
+    """Delete one of the cluster's roles if discover() found it (and it is owned)."""
+    role = inventory['roles'].get(role_name)
+    if role:
+        delete_iam_role(role_name, role['policies'], role['inline_policies'])
+
+
+def teardown_steps(settings, inventory):
+    """
+    Declare the teardown as a step graph: the build graph with every edge reversed.
+
+    Node groups and NAT gateways start at once; launch templates and each role go as
+    soon as the part of the cluster that used them is gone; subnets, the Internet Gateway and finally the VPC
+    follow once nothing in them is left. Inside a step, independent deletes (node groups,
+    subnets, policy detachments, ...) run concurrently and their waiters poll together.
+
+    :param settings: The cluster_config module, or a per-cluster copy of it (see fleet.cluster_settings()).
+    :param inventory: Dictionary returned by functions.teardown.discover().
+    :return: List of Step objects for run_steps().
+    """
+    region = settings.region_name
+    cluster = inventory['cluster']
+    vpc_id = inventory['vpc_id']
+    # With one role for both, it waits for the cluster as well as the node groups
+    shared_role = settings.control_plane_role_name == settings.worker_nodes_role_name
+    return [
+        Step('nodegroups',
+             lambda: raise_failures(delete_eks_nodegroups(cluster['name'], inventory['nodegroups'], region=region))
+             if cluster else None),
+        Step('cluster', lambda: delete_eks_cluster(cluster['name'], cluster['status'], region=region) if cluster else None,
+             after=['nodegroups']),
+        Step('launch_templates',
+             lambda: raise_failures(delete_launch_templates(inventory['launch_templates'], region=region)),
+             after=['nodegroups']),
+        Step('worker_role', lambda: delete_role(inventory, settings.worker_nodes_role_name),
+             after=['cluster' if shared_role else 'nodegroups']),
+        *([] if shared_role else [
+            Step('cluster_role', lambda: delete_role(inventory, settings.control_plane_role_name), after=['cluster'])
+        ]),
+
+        Step('nat_gateways', lambda: raise_failures(delete_nat_gateways(inventory['nat_gateways'], region=region))),
+        Step('addresses', lambda: raise_failures(release_addresses(inventory['addresses'], region=region)),
+             after=['nat_gateways']),
+        Step('route_tables',
+             lambda: raise_failures(delete_route_tables(inventory['route_tables'], inventory['routes'], region=region))),
+        # Node instances and NAT gateways hold public addresses, which keep the gateway attached
+        Step('internet_gateway',
+             lambda: raise_failures(delete_internet_gateways(inventory['internet_gateways'], vpc_id, region=region)),
+             after=['cluster', 'addresses', 'route_tables']),
+        Step('subnets', lambda: raise_failures(delete_subnets(inventory['subnets'], region=region)),
+             after=['cluster', 'nat_gateways', 'route_tables']),
+        Step('vpc', lambda: delete_vpc(vpc_id, region=region) if vpc_id else None,
+             after=['subnets', 'internet_gateway']),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete the node groups, EKS cluster, IAM roles and VPC the build "
+                                                 "scripts created, in reverse dependency order.")
+    parser.add_argument('--dry-run', action='store_true', help="Only list what would be deleted, in order.")
+    parser.add_argument('--json', action='store_true', help="Print the listing as JSON.")
+    parser.add_argument('--yes', action='store_true', help="Delete without asking for confirmation.")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of steps running at once.")
+    parser.add_argument('--trace', metavar='PATH', help="Record every API call, step and waiter and write a "
+                                                        "Chrome trace-event file (chrome://tracing, Perfetto).")
+    parser.add_argument('--trace-summary', metavar='PATH',
+                        help="Write per-operation call counts and p50/p99 latency as JSON.")
+    parser.add_argument('--journal', default=JOURNAL_FILE, metavar='PATH',
+                        help="Build journal to reset once everything is deleted (default: %(default)s).")
+    args = parser.parse_args()
+
+    if args.trace or args.trace_summary:
+        trace.enable()
+    inventory = discover(config)
+    actions = plan_teardown(inventory)
+    if not any(action['action'] != 'warning' for action in actions):
+        for skipped in inventory['skipped']:
+            print(f"[⚠️] {skipped} found by name but not owned by '{config.owner}'; left alone.")
+        print(f"[✅] Nothing to delete: no resource named in cluster_config.py and owned by '{config.owner}' was found.")
+        return 0
+    print_plan(actions, as_json=args.json)
+    if args.dry_run:
+        return 0
+    if not args.yes and input("Delete everything listed above? [y/N] ").strip().lower() not in ('y', 'yes'):
+        print("[ℹ️] Nothing deleted.")
+        return 1
+
+    report = run_steps(teardown_steps(config, inventory), max_workers=args.workers)
+    for name, error in report['failed'].items():
+        print(f"[❌] {name}: {error}")
+    if not report['failed'] and not report['skipped']:
+        # The next build must not resume from IDs of resources that are gone
+        Journal(args.journal).reset(None)
+
+    stats = client_stats()
+    print(f"[ℹ️] Client registry built {stats['clients_created']} client(s), reused {stats['cache_hits']} time(s).")
+    for budget, counters in throttle_stats().items():
+        print(f"[ℹ️] {budget}: {counters['calls']} call(s), {counters['throttles']} throttle(s), "
+              f"{counters['retries']} retr(ies), {counters['token_wait_seconds']:.1f}s waiting for tokens")
+    trace.export(args.trace, args.trace_summary)
+    return 1 if report['failed'] or report['skipped'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
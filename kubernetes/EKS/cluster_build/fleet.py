@@ -0,0 +1,271 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from types import ModuleType, SimpleNamespace
+
+import cluster_config as config
+from functions.validate import validate_config
+
+# The build modules (and with them boto3) are imported inside run_account(), so that
+# spawned account processes pick up AWS_PROFILE before the first session is created
+# and 'validate' stays offline.
+
+BASE_REGION = config.region_name
+
+# Same order as build_cluster.PHASES, kept here so the report does not import boto3
+PHASE_NAMES = ('iam', 'network', 'control_plane', 'nodegroups')
+
+
+def _move_region(value, region):
+    """Rewrite base-region names (AZs, subnet names) to the same names in another region."""
+    if isinstance(value, str):
+        return value.replace(BASE_REGION, region)
+    if isinstance(value, dict):
+        return {_move_region(key, region): item for key, item in value.items()}
+    if isinstance(value, list):
+        return [_move_region(item, region) for item in value]
+    return value
+
+
+def cluster_settings(cluster, defaults=None):
+    """
+    Build one cluster's settings: cluster_config, then the fleet defaults, then the cluster's own keys.
+
+    A cluster in another region without its own public_subnets / private_subnets /
+    nat_subnet_az / cluster_subnet_names gets the base layout moved to its region
+    (us-east-1a -> <region>a, ...). vpc_name defaults to '<cluster_name>-vpc' and the
+    cluster's tags follow cluster_name, owner and common_tags.
+
+    :param cluster: Dictionary of cluster_config overrides; must contain cluster_name.
+    :param defaults: Dictionary of overrides shared by every cluster in the fleet.
+    :return: SimpleNamespace with every cluster_config attribute plus nodegroup_specs().
+    """
+    values = {name: value for name, value in vars(config).items()
+              if not name.startswith('_') and not callable(value) and not isinstance(value, ModuleType)}
+    overrides = dict(defaults or {}, **cluster)
+    values.update(overrides)
+
+    if values['region_name'] != BASE_REGION:
+        for name in ('public_subnets', 'private_subnets', 'nat_subnet_az', 'cluster_subnet_names'):
+            if name not in overrides:
+                values[name] = _move_region(values[name], values['region_name'])
+    values['nat_subnet_name'] = f"public_subnet_{values['nat_subnet_az']}"
+    if 'vpc_name' not in overrides:
+        values['vpc_name'] = f"{values['cluster_name']}-vpc"
+    if 'tags' not in overrides:
+        values['tags'] = {**values['tags'], **values['common_tags'], 'owner': values['owner'], 'Name': values['cluster_name']}
+    values.setdefault('profile', None)
+
+    settings = SimpleNamespace(**values)
+    settings.nodegroup_specs = lambda subnet_ids, node_role: config.nodegroup_specs(subnet_ids, node_role, settings)
+    return settings
+
+
+def load_fleet(path):
+    """
+    Read a fleet spec.
+
+    The spec is JSON: {"defaults": {...}, "clusters": [{"cluster_name": ..., "region_name": ...,
+    "profile": ..., <any other cluster_config name>: ...}, ...]}. "profile" selects the
+    AWS profile (account); leave it out for the default credential chain.
+
+    :param path: Path to the JSON file.
+    :return: List of per-cluster settings from cluster_settings().
+    """
+    with open(path) as spec_file:
+        spec = json.load(spec_file)
+    return [cluster_settings(cluster, spec.get('defaults')) for cluster in spec['clusters']]
+
+
+def validate_fleet(clusters):
+    """
+    Check every cluster's settings plus the rules that only apply across a fleet.
+
+    Several clusters may share an account and region: each gets its own VPC and every
+    subnet, route table and gateway lookup is scoped to it. Their VPC names must differ.
+
+    :param clusters: List of per-cluster settings.
+    :return: List of error messages; empty when the fleet is valid.
+    """
+    errors = []
+    seen_names, seen_vpcs = set(), {}
+    for settings in clusters:
+        errors += [f"{settings.cluster_name}: {error}" for error in validate_config(settings)]
+        if settings.cluster_name in seen_names:
+            errors.append(f"{settings.cluster_name}: cluster_name is used more than once")
+        seen_names.add(settings.cluster_name)
+        placement = (settings.profile, settings.region_name, settings.vpc_name)
+        if placement in seen_vpcs:
+            errors.append(f"{settings.cluster_name}: shares VPC {settings.vpc_name} in account "
+                          f"{settings.profile or 'default'} and region {settings.region_name} with {seen_vpcs[placement]}")
+        seen_vpcs.setdefault(placement, settings.cluster_name)
+    return errors
+
+
+def _build_cluster(settings, step_workers):
+    """Run one cluster's step graph and reduce the report to what the fleet summary needs."""
+    from build_cluster import build_steps, phase_seconds
+    from functions.build_graph import run_steps
+
+    print(f"[ℹ️] [{settings.cluster_name}] Building in {settings.region_name} "
+          f"(account {settings.profile or 'default'})...", flush=True)
+    started = time.monotonic()
+    try:
+        report = run_steps(build_steps(settings), max_workers=step_workers, label=settings.cluster_name)
+    except Exception as e:
+        report = {'timings': {}, 'failed': {'build': str(e)}, 'skipped': []}
+    result = {
+        'cluster': settings.cluster_name,
+        'account': settings.profile or 'default',
+        'region': settings.region_name,
+        'ok': not report['failed'] and not report['skipped'],
+        'wall_seconds': time.monotonic() - started,
+        'phases': phase_seconds(report['timings']),
+        'failed': report['failed'],
+        'skipped': report['skipped'],
+    }
+    marker = '✅' if result['ok'] else '❌'
+    print(f"[{marker}] [{settings.cluster_name}] Finished in {result['wall_seconds']:.1f}s.", flush=True)
+    return result
+
+
+def run_account(profile, clusters, region_workers=2, step_workers=4):
+    """
+    Build every cluster of one account, with one bounded worker pool per region.
+
+    Clusters in different regions never wait on each other's pool, and the client
+    registry and rate limiter already keep a separate budget per region.
+
+    :param profile: AWS profile of the account, or None for the default credential chain.
+    :param clusters: List of per-cluster settings in this account.
+    :param region_workers: Maximum clusters building at once in one region.
+    :param step_workers: Maximum steps running at once inside one cluster build.
+    :return: List of per-cluster result dictionaries.
+    """
+    if profile:
+        os.environ['AWS_PROFILE'] = profile
+
+    by_region = defaultdict(list)
+    for settings in clusters:
+        by_region[settings.region_name].append(settings)
+
+    pools = {region: ThreadPoolExecutor(max_workers=region_workers, thread_name_prefix=f"fleet-{region}")
+             for region in by_region}
+    try:
+        futures = [pools[region].submit(_build_cluster, settings, step_workers)
+                   for region, region_clusters in by_region.items() for settings in region_clusters]
+        return [future.result() for future in as_completed(futures)]
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+
+
+def _run_account_process(profile, cluster_values, region_workers, step_workers):
+    """Entry point of a spawned account process; keeps its progress lines streaming."""
+    sys.stdout.reconfigure(line_buffering=True)
+    return run_account(profile, [cluster_settings(values) for values in cluster_values], region_workers, step_workers)
+
+
+def _plain(settings):
+    """Settings as a picklable dictionary (everything but the nodegroup_specs closure)."""
+    return {name: value for name, value in vars(settings).items() if name != 'nodegroup_specs'}
+
+
+def run_fleet(clusters, region_workers=2, step_workers=4):
+    """
+    Build a fleet: one process per account when there are several, otherwise in this process.
+
+    :param clusters: List of per-cluster settings from load_fleet().
+    :param region_workers: Maximum clusters building at once in one region of one account.
+    :param step_workers: Maximum steps running at once inside one cluster build.
+    :return: Dictionary with 'clusters' (per-cluster results) and 'wall_seconds'.
+    """
+    started = time.monotonic()
+    by_account = defaultdict(list)
+    for settings in clusters:
+        by_account[settings.profile].append(settings)
+
+    if len(by_account) == 1:
+        profile, account_clusters = next(iter(by_account.items()))
+        results = run_account(profile, account_clusters, region_workers, step_workers)
+    else:
+        # spawn, not fork: every account process starts with a clean boto3 session and its own AWS_PROFILE
+        results = []
+        with ProcessPoolExecutor(max_workers=len(by_account), mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(_run_account_process, profile, [_plain(settings) for settings in account_clusters],
+                                   region_workers, step_workers): profile
+                       for profile, account_clusters in by_account.items()}
+            for future in as_completed(futures):
+                try:
+                    results += future.result()
+                except Exception as e:
+                    print(f"[❌] Account {futures[future] or 'default'} failed: {e}")
+                    results += [{'cluster': settings.cluster_name, 'account': futures[future] or 'default',
+                                 'region': settings.region_name, 'ok': False, 'wall_seconds': 0.0, 'phases': {},
+                                 'failed': {'account': str(e)}, 'skipped': []}
+                                for settings in by_account[futures[future]]]
+    return {'clusters': sorted(results, key=lambda result: (result['account'], result['region'], result['cluster'])),
+            'wall_seconds': time.monotonic() - started}
+
+
+def print_fleet_report(report):
+    """
+    Print one line per cluster with its time per phase, then totals per phase.
+
+    :param report: Dictionary returned by run_fleet().
+    """
+    phases = list(PHASE_NAMES)
+    print(f"{'cluster':<30} {'account':<12} {'region':<15} {'status':<7} "
+          + ' '.join(f"{phase:>13}" for phase in phases) + f" {'total':>8}")
+    for result in report['clusters']:
+        print(f"{result['cluster']:<30} {result['account']:<12} {result['region']:<15} "
+              f"{'ok' if result['ok'] else 'FAILED':<7} "
+              + ' '.join(f"{result['phases'].get(phase, 0.0):>12.1f}s" for phase in phases)
+              + f" {result['wall_seconds']:>7.1f}s")
+        for name, error in result['failed'].items():
+            print(f"[❌] [{result['cluster']}] {name}: {error}")
+
+    failed = [result['cluster'] for result in report['clusters'] if not result['ok']]
+    totals = {phase: sum(result['phases'].get(phase, 0.0) for result in report['clusters']) for phase in phases}
+    print("[ℹ️] Time per phase summed over clusters: "
+          + ', '.join(f"{phase} {seconds:.1f}s" for phase, seconds in totals.items()))
+    print(f"[{'❌' if failed else '✅'}] {len(report['clusters']) - len(failed)}/{len(report['clusters'])} cluster(s) "
+          f"built in {report['wall_seconds']:.1f}s" + (f"; failed: {', '.join(failed)}" if failed else '.'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build many VPC + EKS clusters across regions and accounts.")
+    parser.add_argument('command', nargs='?', choices=['apply', 'validate'], default='apply',
+                        help="'validate' only checks the fleet spec (default: apply).")
+    parser.add_argument('--spec', required=True, help="Path to the fleet spec JSON file.")
+    parser.add_argument('--region-workers', type=int, default=2,
+                        help="Maximum clusters building at once per region and account.")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum steps running at once inside one cluster.")
+    parser.add_argument('--report', help="Also write the final report to this JSON file.")
+    args = parser.parse_args()
+
+    clusters = load_fleet(args.spec)
+    errors = validate_fleet(clusters)
+    for error in errors:
+        print(f"[❌] {error}")
+    if errors:
+        return 1
+    if args.command == 'validate':
+        print(f"[✅] Fleet spec is valid: {len(clusters)} cluster(s).")
+        return 0
+
+    report = run_fleet(clusters, region_workers=args.region_workers, step_workers=args.workers)
+    print_fleet_report(report)
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    return 0 if all(result['ok'] for result in report['clusters']) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.clients import get_client
+from functions.pod_density import PREFIX_DELEGATION_CNI
+from functions.waiters import wait_for_resources
+
+# Add-ons whose pods run on the nodes: applied once the node groups are up, since EKS
+# reports a Deployment without nodes to schedule on as DEGRADED
+NODE_ADDONS = ('coredns',)
+
+
+def _merge(base, extra):
+    """Deep-merge two configuration dictionaries; extra wins on conflicts."""
+    merged = dict(base)
+    for key, value in extra.items():
+        merged[key] = _merge(merged[key], value) if isinstance(value, dict) and isinstance(merged.get(key), dict) else value
+    return merged
+
+
+def addon_specs(settings):
+    """
+    The add-ons a cluster should run: cluster_config.addons, plus prefix delegation in vpc-cni.
+
+    :param settings: The cluster_config module or a per-cluster copy of it.
+    :return: Dictionary of add-on name -> configuration values.
+    """
+    addons = dict(getattr(settings, 'addons', None) or {})
+    if getattr(settings, 'prefix_delegation', False):
+        addons['vpc-cni'] = _merge(addons.get('vpc-cni') or {}, PREFIX_DELEGATION_CNI)
+    return addons
+
+
+def addon_configuration(addon):
+    """The add-on's configurationValues as a dictionary (EKS returns JSON or YAML text, or nothing)."""
+    try:
+        return json.loads(addon.get('configurationValues') or '{}')
+    except ValueError:
+        return None
+
+
+def _request_addon(eks_client, cluster_name, addon_name, configuration, tags):
+    """
+    Create or update one add-on without waiting.
+
+    :return: Tuple of the add-on description if it is already ACTIVE with this configuration (else None)
+             and the ID of the update started (else None).
+    """
+    try:
+        addon = eks_client.describe_addon(clusterName=cluster_name, addonName=addon_name)['addon']
+    except eks_client.exceptions.ResourceNotFoundException:
+        addon = None
+
+    values = json.dumps(configuration, sort_keys=True)
+    if addon is None:
+        eks_client.create_addon(clusterName=cluster_name, addonName=addon_name, configurationValues=values,
+                                resolveConflicts='OVERWRITE', tags=tags or {})
+        print(f"[✅] Add-on '{addon_name}' installation initiated on cluster '{cluster_name}'.")
+    elif addon_configuration(addon) != configuration:
+        update = eks_client.update_addon(clusterName=cluster_name, addonName=addon_name, configurationValues=values,
+                                         resolveConflicts='OVERWRITE')['update']
+        print(f"[✅] Add-on '{addon_name}' configuration update initiated on cluster '{cluster_name}'.")
+        return None, update['id']
+    elif addon['status'] == 'ACTIVE':
+        print(f"[ℹ️] Add-on '{addon_name}' is already configured on cluster '{cluster_name}'.")
+        return addon, None
+    return None, None
+
+
+def configure_addons(cluster_name, addons, tags=None, region='us-east-1', deadline=900):
+    """
+    Install EKS add-ons with the given configurations, or update those whose configuration differs.
+
+    Every describe/create/update call is submitted at once, then one wait engine polls
+    all pending add-ons, so N add-ons take roughly as long as the slowest one. An update
+    is followed by its update ID until EKS reports it Successful, since the add-on can
+    still read ACTIVE right after update_addon, then the add-on is read again. Settings
+    made outside EKS (e.g. kubectl edits of the add-on's resources) are overwritten, so
+    the cluster converges to the configuration.
+
+    :param cluster_name: Name of the EKS cluster.
+    :param addons: Dictionary of add-on name (e.g. 'kube-proxy') -> configuration values (the add-on's JSON schema).
+    :param tags: Dictionary of tags for newly created add-ons (optional).
+    :param region: The AWS region of the cluster.
+    :param deadline: Maximum seconds to wait for all add-ons.
+    :return: Dictionary with 'results' (add-on name -> ACTIVE add-on description)
+             and 'failures' (add-on name -> error message).
+    """
+    eks_client = get_client('eks', region)
+    results, failures, pending = {}, {}, []
+
+    if not addons:
+        return {'results': results, 'failures': failures}
+
+    with ThreadPoolExecutor(max_workers=len(addons)) as pool:
+        futures = {
+            addon_name: pool.submit(_request_addon, eks_client, cluster_name, addon_name, configuration, tags)
+            for addon_name, configuration in addons.items()
+        }
+    for addon_name, future in futures.items():
+        try:
+            addon, update_id = future.result()
+            if addon:
+                results[addon_name] = addon
+            else:
+                pending.append(('eks_addon_update', (cluster_name, addon_name, update_id)) if update_id
+                               else ('eks_addon', (cluster_name, addon_name)))
+        except Exception as e:
+            print(f"[❌] Error configuring add-on '{addon_name}': {e}")
+            failures[addon_name] = str(e)
+
+    if pending:
+        waited = wait_for_resources(pending, region=region, deadline=deadline)
+        updated = [('eks_addon', resource_id[:2]) for resource_type, resource_id in waited['results']
+                   if resource_type == 'eks_addon_update']
+        if updated:
+            # the updates succeeded; read the add-ons they left behind
+            followed = wait_for_resources(updated, region=region, deadline=deadline)
+            waited['results'].update(followed['results'])
+            waited['failures'].update(followed['failures'])
+        for (resource_type, resource_id), addon in waited['results'].items():
+            if resource_type == 'eks_addon':
+                print(f"[✅] Add-on '{resource_id[1]}' is active on cluster '{cluster_name}'.")
+                results[resource_id[1]] = addon
+        for (_, resource_id), error in waited['failures'].items():
+            print(f"[❌] Add-on '{resource_id[1]}' did not become active: {error}")
+            failures[resource_id[1]] = error
+    return {'results': results, 'failures': failures}
+
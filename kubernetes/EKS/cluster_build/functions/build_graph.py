@@ -0,0 +1,231 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from functions.journal import input_hash
+from functions.trace import span
+
+
+class Step:
+    """
+    A unit of build work in a step graph.
+
+    :param name: Unique step name.
+    :param func: Callable invoked with the step's inputs as keyword arguments.
+    :param inputs: Names of the values the step consumes (produced by other steps or passed in).
+    :param outputs: Names of the values the step produces. With one output, func returns the
+                    value itself; with several, func returns a dictionary keyed by output name.
+    :param after: Names of steps that must finish first even though no value flows between them.
+    :param fingerprint: JSON-serializable value of the settings func reads besides its inputs, or a
+                        callable returning it when the step starts; with a journal, a change to
+                        it makes the step run again.
+    :param verify: Cheap check that a journaled result still exists, called with the step's
+                   inputs and outputs as keyword arguments; returns True to skip the step.
+                   Without it a journaled result is trusted as is.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), after=(), fingerprint=None, verify=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.after = tuple(after)
+        self.fingerprint = fingerprint
+        self.verify = verify
+
+    def __repr__(self):
+        return f"Step({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+def _dependencies(steps, values):
+    """Map each step name to the set of step names it waits on, validating the graph."""
+    names = {step.name for step in steps}
+    if len(names) != len(steps):
+        raise ValueError("Step names must be unique.")
+
+    producers = {}
+    for step in steps:
+        for output in step.outputs:
+            if output in producers:
+                raise ValueError(f"Output '{output}' is produced by both '{producers[output]}' and '{step.name}'.")
+            producers[output] = step.name
+
+    dependencies = {}
+    for step in steps:
+        needed = set()
+        for name in step.inputs:
+            if name in producers:
+                needed.add(producers[name])
+            elif name not in values:
+                raise ValueError(f"Step '{step.name}' needs '{name}', which no step produces and no value provides.")
+        for name in step.after:
+            if name not in names:
+                raise ValueError(f"Step '{step.name}' runs after unknown step '{name}'.")
+            needed.add(name)
+        dependencies[step.name] = needed
+
+    # Kahn's algorithm, only to reject cycles before anything runs
+    remaining = {name: set(needed) for name, needed in dependencies.items()}
+    while remaining:
+        ready = [name for name, needed in remaining.items() if not needed]
+        if not ready:
+            raise ValueError(f"Step graph has a cycle between: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for needed in remaining.values():
+            needed.difference_update(ready)
+    return dependencies
+
+
+def _verified(step, inputs, outputs):
+    """Run a step's verify check; a check that raises counts as failed."""
+    if step.verify is None:
+        return True
+    try:
+        return bool(step.verify(**inputs, **outputs))
+    except Exception as e:
+        print(f"[⚠️] Could not verify the journaled result of step '{step.name}': {e}")
+        return False
+
+
+def _run_step(step, values, begins, started, journal=None, label=None):
+    """
+    Call a step and turn its return value into a dictionary of outputs.
+
+    With a journal, a step that produces values and already finished with the same
+    input hash is verified instead of run.
+
+    :return: Tuple of (outputs dictionary, True if they came from the journal).
+    """
+    begins[step.name] = time.monotonic() - started
+    inputs = {name: values[name] for name in step.inputs}
+    inputs_hash = input_hash(step, inputs) if journal is not None and step.outputs else None
+    if inputs_hash:
+        outputs = journal.completed(label, step.name, inputs_hash)
+        if outputs is not None and _verified(step, inputs, outputs):
+            return outputs, True
+
+    try:
+        with span(step.name, 'step'):
+            result = step.func(**inputs)
+        if not step.outputs:
+            return {}, False
+        if len(step.outputs) == 1:
+            result = {step.outputs[0]: result}
+        missing = [name for name in step.outputs if (result or {}).get(name) is None]
+        if missing:
+            raise RuntimeError(f"Step '{step.name}' produced no value for {', '.join(missing)}.")
+    except Exception as e:
+        if inputs_hash:
+            journal.record_failed(label, step.name, inputs_hash, str(e))
+        raise
+    outputs = {name: result[name] for name in step.outputs}
+    if inputs_hash:
+        journal.record_done(label, step.name, inputs_hash, outputs, time.monotonic() - started - begins[step.name])
+    return outputs, False
+
+
+def critical_path(dependencies, timings):
+    """
+    Find the chain of dependent steps with the largest total duration.
+
+    :param dependencies: Step name -> set of step names it waited on.
+    :param timings: Step name -> (start, end) in seconds for every step that ran.
+    :return: Tuple of (list of step names in run order, total seconds).
+    """
+    best = {}
+
+    def longest(name):
+        if name not in best:
+            duration = timings[name][1] - timings[name][0]
+            previous = max(
+                (longest(dependency) for dependency in dependencies[name] if dependency in timings),
+                key=lambda path: path[1],
+                default=([], 0.0)
+            )
+            best[name] = (previous[0] + [name], previous[1] + duration)
+        return best[name]
+
+    return max((longest(name) for name in timings), key=lambda path: path[1], default=([], 0.0))
+
+
+def run_steps(steps, values=None, max_workers=4, label=None, journal=None):
+    """
+    Run a step graph, starting every step as soon as the steps it depends on have finished.
+
+    Independent steps run concurrently on a pool of at most max_workers threads. A step
+    that raises or returns None for a declared output fails, and every step downstream
+    of it is skipped; unrelated branches keep going.
+
+    With a journal, every step that produces values is recorded once it finishes. On the
+    next run such a step is skipped if its inputs and fingerprint hash the same and its
+    verify check passes, so a failed build resumes from the failed step. A step whose
+    inputs changed (e.g. an upstream step re-created a resource) runs again.
+
+    :param steps: List of Step objects.
+    :param values: Dictionary of initial values available as step inputs.
+    :param max_workers: Maximum number of steps running at the same time.
+    :param label: Prefix for progress lines, e.g. the cluster name when several graphs run at once;
+                  also the graph's key in the journal.
+    :param journal: functions.journal.Journal to resume from and record into (optional).
+    :return: Dictionary with 'values', 'timings', 'failed', 'skipped', 'resumed', 'critical_path',
+             'critical_path_seconds' and 'wall_seconds'.
+    """
+    values = dict(values or {})
+    dependencies = _dependencies(steps, values)
+    by_name = {step.name: step for step in steps}
+    done, failed, skipped, resumed, timings = set(), {}, [], [], {}
+    running, begins = {}, {}
+    started = time.monotonic()
+    prefix = f"[{label}] " if label else ''
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            running_names = set(running.values())
+            for name, needed in dependencies.items():
+                if name in done or name in failed or name in skipped or name in running_names:
+                    continue
+                if needed & (set(failed) | set(skipped)):
+                    print(f"[⚠️] {prefix}Skipping step '{name}' because a step it depends on did not finish.")
+                    skipped.append(name)
+                elif needed <= done:
+                    step = by_name[name]
+                    print(f"[ℹ️] {prefix}Starting step '{name}'...")
+                    running[pool.submit(_run_step, step, dict(values), begins, started, journal, label)] = name
+
+            if not running:
+                if len(done) + len(failed) + len(skipped) == len(steps):
+                    break
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                timings[name] = (begins[name], time.monotonic() - started)
+                try:
+                    outputs, from_journal = future.result()
+                    values.update(outputs)
+                    done.add(name)
+                    if from_journal:
+                        resumed.append(name)
+                        print(f"[✅] {prefix}Step '{name}' already done (journal, verified).")
+                    else:
+                        print(f"[✅] {prefix}Step '{name}' finished in {timings[name][1] - timings[name][0]:.1f}s.")
+                except Exception as e:
+                    failed[name] = str(e)
+                    print(f"[❌] {prefix}Step '{name}' failed: {e}")
+
+    path, path_seconds = critical_path(dependencies, timings)
+    report = {
+        'values': values,
+        'timings': timings,
+        'failed': failed,
+        'skipped': skipped,
+        'resumed': resumed,
+        'critical_path': path,
+        'critical_path_seconds': path_seconds,
+        'wall_seconds': time.monotonic() - started,
+    }
+    print(f"[ℹ️] {prefix}Build finished in {report['wall_seconds']:.1f}s; "
+          f"critical path ({path_seconds:.1f}s): {' -> '.join(path) or 'none'}"
+          + (f"; {len(resumed)} step(s) resumed from the journal" if resumed else ''))
+    return report
@@ -0,0 +1,188 @@
+import math
+
+from functions.pod_density import ENI_LIMITS, max_pods
+
+# Per instance type: (memory GiB, on-demand USD per hour in us-east-1 (Linux), CPU baseline
+# per vCPU, architecture). A baseline below 1 marks a burstable type; vCPUs come from ENI_LIMITS.
+INSTANCE_SPECS = {
+    't3.small': (2, 0.0208, 0.2, 'x86_64'), 't3.medium': (4, 0.0416, 0.2, 'x86_64'),
+    't3.large': (8, 0.0832, 0.3, 'x86_64'), 't3.xlarge': (16, 0.1664, 0.4, 'x86_64'),
+    't3.2xlarge': (32, 0.3328, 0.4, 'x86_64'),
+    't3a.small': (2, 0.0188, 0.2, 'x86_64'), 't3a.medium': (4, 0.0376, 0.2, 'x86_64'),
+    't3a.large': (8, 0.0752, 0.3, 'x86_64'), 't3a.xlarge': (16, 0.1504, 0.4, 'x86_64'),
+    't3a.2xlarge': (32, 0.3008, 0.4, 'x86_64'),
+    'm5.large': (8, 0.096, 1.0, 'x86_64'), 'm5.xlarge': (16, 0.192, 1.0, 'x86_64'),
+    'm5.2xlarge': (32, 0.384, 1.0, 'x86_64'), 'm5.4xlarge': (64, 0.768, 1.0, 'x86_64'),
+    'm5.8xlarge': (128, 1.536, 1.0, 'x86_64'),
+    'm5a.large': (8, 0.086, 1.0, 'x86_64'), 'm5a.xlarge': (16, 0.172, 1.0, 'x86_64'),
+    'm5a.2xlarge': (32, 0.344, 1.0, 'x86_64'), 'm5a.4xlarge': (64, 0.688, 1.0, 'x86_64'),
+    'm6i.large': (8, 0.096, 1.0, 'x86_64'), 'm6i.xlarge': (16, 0.192, 1.0, 'x86_64'),
+    'm6i.2xlarge': (32, 0.384, 1.0, 'x86_64'), 'm6i.4xlarge': (64, 0.768, 1.0, 'x86_64'),
+    'm6i.8xlarge': (128, 1.536, 1.0, 'x86_64'),
+    'c5.large': (4, 0.085, 1.0, 'x86_64'), 'c5.xlarge': (8, 0.17, 1.0, 'x86_64'),
+    'c5.2xlarge': (16, 0.34, 1.0, 'x86_64'), 'c5.4xlarge': (32, 0.68, 1.0, 'x86_64'),
+    'c5a.large': (4, 0.077, 1.0, 'x86_64'), 'c5a.xlarge': (8, 0.154, 1.0, 'x86_64'),
+    'c5a.2xlarge': (16, 0.308, 1.0, 'x86_64'), 'c5a.4xlarge': (32, 0.616, 1.0, 'x86_64'),
+    'c6i.large': (4, 0.085, 1.0, 'x86_64'), 'c6i.xlarge': (8, 0.17, 1.0, 'x86_64'),
+    'c6i.2xlarge': (16, 0.34, 1.0, 'x86_64'), 'c6i.4xlarge': (32, 0.68, 1.0, 'x86_64'),
+    'r5.large': (16, 0.126, 1.0, 'x86_64'), 'r5.xlarge': (32, 0.252, 1.0, 'x86_64'),
+    'r5.2xlarge': (64, 0.504, 1.0, 'x86_64'), 'r5.4xlarge': (128, 1.008, 1.0, 'x86_64'),
+    'r5a.large': (16, 0.113, 1.0, 'x86_64'), 'r5a.xlarge': (32, 0.226, 1.0, 'x86_64'),
+    'r5a.2xlarge': (64, 0.452, 1.0, 'x86_64'), 'r5a.4xlarge': (128, 0.904, 1.0, 'x86_64'),
+    'r6i.large': (16, 0.126, 1.0, 'x86_64'), 'r6i.xlarge': (32, 0.252, 1.0, 'x86_64'),
+    'r6i.2xlarge': (64, 0.504, 1.0, 'x86_64'), 'r6i.4xlarge': (128, 1.008, 1.0, 'x86_64'),
+    'm6g.medium': (4, 0.0385, 1.0, 'arm64'), 'm6g.large': (8, 0.077, 1.0, 'arm64'),
+    'm6g.xlarge': (16, 0.154, 1.0, 'arm64'), 'm6g.2xlarge': (32, 0.308, 1.0, 'arm64'),
+    'm6g.4xlarge': (64, 0.616, 1.0, 'arm64'),
+}
+
+CPU_PROFILES = ('sustained', 'burstable')
+
+# USD per vCPU-hour a T instance in unlimited mode pays for running above its baseline
+SURPLUS_CREDIT_PRICE = 0.05
+
+# Rough average Spot price as a fraction of on-demand; only used for the cost estimate
+SPOT_PRICE_FACTOR = 0.35
+
+
+def _reserved_cpu(vcpus):
+    """CPU the EKS AMI reserves for the kubelet and system daemons: 6% of the first core, 1% of the second, ..."""
+    steps = [(1, 0.06), (1, 0.01), (2, 0.005)]
+    reserved, left = 0.0, vcpus
+    for cores, share in steps:
+        reserved += min(left, cores) * share
+        left -= min(left, cores)
+    return reserved + left * 0.0025
+
+
+def allocatable(instance_type, pods):
+    """
+    The vCPUs and memory pods can request on one node, after the kubelet's reservations.
+
+    Memory follows the EKS AMI: 255 MiB plus 11 MiB per pod reserved, and 100 MiB kept
+    free for the eviction threshold.
+
+    :param instance_type: EC2 instance type from INSTANCE_SPECS.
+    :param pods: The node's max-pods.
+    :return: Tuple of (vCPUs, memory GiB).
+    """
+    vcpus = ENI_LIMITS[instance_type][0]
+    memory_gib = INSTANCE_SPECS[instance_type][0]
+    return vcpus - _reserved_cpu(vcpus), memory_gib - (255 + 11 * pods + 100) / 1024
+
+
+def hourly_price(instance_type, cpu_profile='sustained'):
+    """
+    What one node costs per hour when the workload has the given CPU profile.
+
+    A burstable type under a sustained load runs above its baseline all the time and
+    pays for surplus credits on top of its price; under a bursty load it does not.
+
+    :param instance_type: EC2 instance type from INSTANCE_SPECS.
+    :param cpu_profile: 'sustained' or 'burstable'.
+    :return: USD per hour.
+    """
+    _, price, baseline, _ = INSTANCE_SPECS[instance_type]
+    if cpu_profile == 'sustained':
+        price += ENI_LIMITS[instance_type][0] * (1 - baseline) * SURPLUS_CREDIT_PRICE
+    return price
+
+
+def rank_instance_types(vcpus, memory_gib, pods, cpu_profile='sustained', architecture='x86_64',
+                        prefix_delegation=True, min_nodes=2):
+    """
+    Rank instance types by what it costs to run a workload on them, cheapest first.
+
+    For each type the node count is the largest of what the vCPUs, the memory and the
+    pods need (with the kubelet's reservations taken off every node), so the ranking
+    is throughput per dollar for the dimension the workload is bound by.
+
+    :param vcpus: Total vCPUs the workload requests.
+    :param memory_gib: Total memory (GiB) the workload requests.
+    :param pods: Number of pods.
+    :param cpu_profile: 'sustained' (steady CPU) or 'burstable' (mostly idle with peaks).
+    :param architecture: 'x86_64' or 'arm64'; a node group cannot mix the two.
+    :param prefix_delegation: Whether the VPC CNI hands out prefixes (see functions.pod_density).
+    :param min_nodes: Fewest nodes to run, for availability.
+    :return: List of dictionaries with instance_type, nodes, hourly_cost, vcpus_per_dollar and bound_by.
+    :raises ValueError: If an argument is out of range or no instance type matches.
+    """
+    if cpu_profile not in CPU_PROFILES:
+        raise ValueError(f"cpu_profile must be one of {', '.join(CPU_PROFILES)}, got {cpu_profile!r}")
+    if vcpus <= 0 or memory_gib <= 0 or pods <= 0 or min_nodes < 1:
+        raise ValueError("vcpus, memory_gib and pods must be positive and min_nodes at least 1")
+
+    ranking = []
+    for instance_type, (_, _, _, instance_architecture) in INSTANCE_SPECS.items():
+        if instance_architecture != architecture:
+            continue
+        node_pods = max_pods(instance_type, prefix_delegation)
+        node_vcpus, node_memory = allocatable(instance_type, node_pods)
+        # aws-node and kube-proxy take two pod slots on every node
+        needs = {'vcpus': math.ceil(vcpus / node_vcpus), 'memory': math.ceil(memory_gib / node_memory),
+                 'pods': math.ceil(pods / max(node_pods - 2, 1))}
+        bound_by = max(needs, key=needs.get)
+        nodes = max(needs[bound_by], min_nodes)
+        price = hourly_price(instance_type, cpu_profile)
+        ranking.append({
+            'instance_type': instance_type, 'nodes': nodes, 'hourly_cost': round(nodes * price, 4),
+            'vcpus_per_dollar': round(node_vcpus / price, 2), 'bound_by': bound_by,
+        })
+    if not ranking:
+        raise ValueError(f"no instance type in INSTANCE_SPECS has architecture {architecture!r}")
+    return sorted(ranking, key=lambda row: (row['hourly_cost'], -row['vcpus_per_dollar']))
+
+
+def _shape(instance_type):
+    """Instance types with the same shape are interchangeable in one node group (and to the cluster autoscaler)."""
+    memory_gib, _, baseline, architecture = INSTANCE_SPECS[instance_type]
+    return ENI_LIMITS[instance_type][0], memory_gib, baseline < 1, architecture
+
+
+def plan_capacity(vcpus, memory_gib, pods, cpu_profile='sustained', spot_share=0.0, architecture='x86_64',
+                  prefix_delegation=True, diversity=4, min_nodes=2, max_scale=2.0):
+    """
+    Plan node groups for a workload: diversified instance types, a Spot / On-Demand split and scaling.
+
+    The cheapest type decides the node shape; every other type with the same vCPUs,
+    memory and CPU profile joins the list (cheapest first) so Spot has several pools to
+    draw from. The nodes are split by spot_share into an ON_DEMAND and a SPOT node group.
+
+    :param vcpus: Total vCPUs the workload requests.
+    :param memory_gib: Total memory (GiB) the workload requests.
+    :param pods: Number of pods.
+    :param cpu_profile: 'sustained' or 'burstable'.
+    :param spot_share: Fraction of the nodes to run on Spot, 0 to 1.
+    :param architecture: 'x86_64' or 'arm64'.
+    :param prefix_delegation: Whether the VPC CNI hands out prefixes.
+    :param diversity: Most instance types per node group.
+    :param min_nodes: Fewest nodes to run, for availability.
+    :param max_scale: maxSize as a multiple of the planned node count.
+    :return: Dictionary with 'ranking' (see rank_instance_types()), 'nodegroups' (list of
+             dictionaries with the create_eks_nodegroup arguments instance_types,
+             capacity_type and scaling_config) and 'hourly_cost' (USD, Spot estimated).
+    :raises ValueError: If an argument is out of range or no instance type matches.
+    """
+    if not 0 <= spot_share <= 1:
+        raise ValueError(f"spot_share must be between 0 and 1, got {spot_share}")
+    if diversity < 1 or max_scale < 1:
+        raise ValueError("diversity must be at least 1 and max_scale at least 1.0")
+    ranking = rank_instance_types(vcpus, memory_gib, pods, cpu_profile, architecture, prefix_delegation, min_nodes)
+
+    best = ranking[0]
+    instance_types = [row['instance_type'] for row in ranking
+                      if _shape(row['instance_type']) == _shape(best['instance_type'])][:diversity]
+    # Every type in the list has to carry the load on its own
+    nodes = max(row['nodes'] for row in ranking if row['instance_type'] in instance_types)
+    price = max(hourly_price(instance_type, cpu_profile) for instance_type in instance_types)
+
+    spot_nodes = math.floor(nodes * spot_share)
+    nodegroups, hourly_cost = [], 0.0
+    for capacity_type, count, factor in (('ON_DEMAND', nodes - spot_nodes, 1.0), ('SPOT', spot_nodes, SPOT_PRICE_FACTOR)):
+        if count:
+            nodegroups.append({
+                'capacity_type': capacity_type, 'instance_types': instance_types,
+                'scaling_config': {'minSize': count, 'maxSize': math.ceil(count * max_scale), 'desiredSize': count},
+            })
+            hourly_cost += count * price * factor
+    return {'ranking': ranking, 'nodegroups': nodegroups, 'hourly_cost': round(hourly_cost, 4)}
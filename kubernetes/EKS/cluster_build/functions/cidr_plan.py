@@ -0,0 +1,257 @@
+import ipaddress
+from bisect import bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+
+# Defaults for the cidr_plan setting in cluster_config
+PLAN_DEFAULTS = {
+    'supernet': '10.0.0.0/8',
+    'vpc_prefix': 16,
+    'az_count': 3,
+    'public_prefix': 24,
+    'private_prefix': 20,
+}
+
+
+class IntervalIndex:
+    """
+    Sorted index of IPv4 ranges answering "does this block overlap anything?" in O(log n).
+
+    Ranges are kept sorted by first address next to a running maximum of last addresses,
+    so every range that starts at or before a block's last address is found with one
+    bisect, and the running maximum says at once whether any of them reaches into the
+    block. Adding ranges only marks the maximum stale; it is rebuilt on the next query.
+    """
+
+    def __init__(self, ranges=()):
+        """
+        :param ranges: Iterable of (CIDR string or ip_network, label) tuples.
+        """
+        self._ranges = sorted((int(network.network_address), int(network.broadcast_address), label)
+                              for network, label in ((ipaddress.ip_network(cidr, strict=False), label)
+                                                     for cidr, label in ranges)
+                              if network.version == 4)
+        self._starts = [first for first, _, _ in self._ranges]
+        self._max_last = None
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def add(self, cidr, label=''):
+        """Add one range, e.g. a block the planner just allocated."""
+        network = ipaddress.ip_network(cidr, strict=False)
+        entry = (int(network.network_address), int(network.broadcast_address), label)
+        insort(self._ranges, entry)
+        insort(self._starts, entry[0])
+        self._max_last = None
+
+    def _reaching(self, first, last):
+        """Index one past the last range starting at or before last, and the furthest end among them."""
+        if self._max_last is None:
+            self._max_last = []
+            furthest = -1
+            for _, range_last, _ in self._ranges:
+                furthest = max(furthest, range_last)
+                self._max_last.append(furthest)
+        position = bisect_right(self._starts, last)
+        return position, (self._max_last[position - 1] if position else -1)
+
+    def overlaps(self, cidr):
+        """Return True if the block shares any address with an indexed range."""
+        network = ipaddress.ip_network(cidr)
+        _, furthest = self._reaching(int(network.network_address), int(network.broadcast_address))
+        return furthest >= int(network.network_address)
+
+    def conflicts(self, cidr):
+        """
+        List the indexed ranges that overlap a block.
+
+        :return: List of (CIDR string, label) tuples.
+        """
+        network = ipaddress.ip_network(cidr)
+        first = int(network.network_address)
+        position, _ = self._reaching(first, int(network.broadcast_address))
+        found = []
+        # Walk back only while some earlier range can still reach the block
+        while position > 0 and self._max_last[position - 1] >= first:
+            position -= 1
+            range_first, range_last, label = self._ranges[position]
+            if range_last >= first:
+                found.append((_as_cidr(range_first, range_last), label))
+        return found[::-1]
+
+    def first_free(self, parent, prefix_length):
+        """
+        Find the lowest block of a given size inside parent that overlaps nothing indexed.
+
+        Each overlap skips straight past the furthest-reaching conflicting range, so the
+        search costs one bisect per conflict, not one per candidate block.
+
+        :param parent: CIDR the block must fit in.
+        :param prefix_length: Prefix length of the block, e.g. 24.
+        :return: ipaddress.IPv4Network, or None if parent has no free block of that size.
+        """
+        parent = ipaddress.ip_network(parent)
+        size = 2 ** (32 - prefix_length)
+        candidate = int(parent.network_address)
+        parent_last = int(parent.broadcast_address)
+        while candidate + size - 1 <= parent_last:
+            _, furthest = self._reaching(candidate, candidate + size - 1)
+            if furthest < candidate:
+                return ipaddress.ip_network(f"{ipaddress.IPv4Address(candidate)}/{prefix_length}")
+            candidate = (furthest // size + 1) * size
+        return None
+
+
+def _as_cidr(first, last):
+    """Render an indexed range; ranges that are not one CIDR block show as first-last."""
+    blocks = list(ipaddress.summarize_address_range(ipaddress.IPv4Address(first), ipaddress.IPv4Address(last)))
+    return str(blocks[0]) if len(blocks) == 1 else f"{ipaddress.IPv4Address(first)}-{ipaddress.IPv4Address(last)}"
+
+
+def _account_ranges(profile, region, skip_vpc_name):
+    """Every VPC, subnet and peered VPC CIDR one account can see in one region."""
+    from functions.clients import get_client
+    from functions.resolver import iter_resources
+
+    ec2 = get_client('ec2', region, profile)
+    where = f"{profile or 'default'}/{region}"
+    ranges, skipped = [], set()
+    for vpc in iter_resources(ec2, 'describe_vpcs'):
+        if any(tag['Key'] == 'Name' and tag['Value'] == skip_vpc_name for tag in vpc.get('Tags', [])):
+            skipped.add(vpc['VpcId'])
+            continue
+        cidrs = {association['CidrBlock'] for association in vpc.get('CidrBlockAssociationSet', [])
+                 if association.get('CidrBlockState', {}).get('State', 'associated') == 'associated'}
+        ranges += [(cidr, f"{where} {vpc['VpcId']}") for cidr in cidrs | {vpc['CidrBlock']}]
+    for subnet in iter_resources(ec2, 'describe_subnets'):
+        if subnet['VpcId'] not in skipped:
+            ranges.append((subnet['CidrBlock'], f"{where} {subnet['SubnetId']}"))
+    for peering in iter_resources(ec2, 'describe_vpc_peering_connections',
+                                  [{'Name': 'status-code', 'Values': ['active', 'pending-acceptance', 'provisioning']}]):
+        for side in ('AccepterVpcInfo', 'RequesterVpcInfo'):
+            info = peering.get(side, {})
+            if info.get('CidrBlock') and info.get('VpcId') not in skipped:
+                ranges.append((info['CidrBlock'], f"{where} {peering['VpcPeeringConnectionId']} ({info.get('VpcId')})"))
+    return ranges
+
+
+def load_existing_ranges(regions, profiles=(None,), skip_vpc_name=None, max_workers=8):
+    """
+    Index every VPC, subnet and peered VPC CIDR across accounts and regions.
+
+    Each (profile, region) pair is read concurrently with paginated describe calls.
+
+    :param regions: List of AWS regions to read.
+    :param profiles: List of AWS profiles (accounts); None is the default credential chain.
+    :param skip_vpc_name: Leave out the VPC with this Name tag and its subnets (the one being planned).
+    :param max_workers: Maximum number of (profile, region) pairs read at once.
+    :return: IntervalIndex of (CIDR, label) ranges.
+    """
+    pairs = [(profile, region) for profile in profiles for region in regions]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pairs))) as pool:
+        futures = [pool.submit(_account_ranges, profile, region, skip_vpc_name) for profile, region in pairs]
+    return IntervalIndex(cidr_range for future in futures for cidr_range in future.result())
+
+
+def plan_layout(existing, azs, supernet, vpc_prefix, public_prefix, private_prefix, vpc_cidr=None, current=None):
+    """
+    Allocate a VPC block and one public and one private subnet per AZ without any overlap.
+
+    Public subnets are packed from the start of the VPC, then private subnets, each at
+    the lowest free aligned block. Subnets already in current keep their CIDRs, so the
+    plan of a VPC that exists is stable across runs.
+
+    :param existing: IntervalIndex of ranges the VPC must not overlap (other VPCs, subnets, peers).
+    :param azs: List of availability zones, one public and one private subnet each.
+    :param supernet: CIDR the VPC block is taken from, e.g. '10.0.0.0/8'.
+    :param vpc_prefix: Prefix length of the VPC block.
+    :param public_prefix: Prefix length of each public subnet.
+    :param private_prefix: Prefix length of each private subnet.
+    :param vpc_cidr: CIDR of the VPC if it exists already (optional).
+    :param current: Dictionary of subnet name -> CIDR of subnets that exist already (optional).
+    :return: Dictionary with 'cidr_block', 'public_subnets' and 'private_subnets' (AZ -> CIDR).
+    :raises ValueError: If the VPC or a subnet does not fit.
+    """
+    if vpc_cidr is None:
+        vpc_network = existing.first_free(supernet, vpc_prefix)
+        if vpc_network is None:
+            raise ValueError(f"no free /{vpc_prefix} left in {supernet}")
+        vpc_cidr = str(vpc_network)
+    else:
+        clashes = existing.conflicts(vpc_cidr)
+        if clashes:
+            raise ValueError(f"VPC CIDR {vpc_cidr} overlaps {', '.join(f'{cidr} ({label})' for cidr, label in clashes)}")
+
+    current = current or {}
+    inside = IntervalIndex((cidr, name) for name, cidr in current.items())
+    layout = {'cidr_block': vpc_cidr, 'public_subnets': {}, 'private_subnets': {}}
+    for kind, prefix_length in (('public', public_prefix), ('private', private_prefix)):
+        for az in azs:
+            subnet_name = f"{kind}_subnet_{az}"
+            cidr = current.get(subnet_name)
+            if cidr is None:
+                network = inside.first_free(vpc_cidr, prefix_length)
+                if network is None:
+                    raise ValueError(f"{subnet_name}: no free /{prefix_length} left in the VPC's {vpc_cidr}")
+                cidr = str(network)
+                inside.add(cidr, subnet_name)
+            layout[f"{kind}_subnets"][az] = cidr
+    return layout
+
+
+def apply_cidr_plan(settings):
+    """
+    If settings.cidr_plan is set, replace the hand-written network layout with a planned one.
+
+    The planned cidr_block, public_subnets and private_subnets (and the cluster
+    subnet names and NAT AZ that follow from the AZs) are written back onto settings,
+    so create_vpc() and create_subnets() build exactly the plan. A VPC that already
+    exists keeps its CIDR and its subnets keep theirs; the account-wide scan of VPC,
+    subnet and peering CIDRs only runs when a new VPC block has to be chosen.
+
+    :param settings: The cluster_config module or a per-cluster copy of it.
+    :return: The layout from plan_layout(), or None if cidr_plan is not set.
+    """
+    if not getattr(settings, 'cidr_plan', None):
+        return None
+    from functions.clients import get_client
+    from functions.resolver import iter_resources, resolve_vpcs
+
+    plan = dict(PLAN_DEFAULTS, **settings.cidr_plan)
+    profile = getattr(settings, 'profile', None)
+    ec2 = get_client('ec2', settings.region_name, profile)
+    zones = ec2.describe_availability_zones(Filters=[
+        {'Name': 'zone-type', 'Values': ['availability-zone']},
+        {'Name': 'state', 'Values': ['available']}
+    ])['AvailabilityZones']
+    azs = sorted(zone['ZoneName'] for zone in zones)[:plan['az_count']]
+    if len(azs) < plan['az_count']:
+        raise ValueError(f"cidr_plan: {settings.region_name} has only {len(azs)} availability zone(s)")
+
+    vpc = resolve_vpcs(ec2, [settings.vpc_name])[settings.vpc_name]
+    if vpc:
+        existing = IntervalIndex()
+        current = {}
+        for subnet in iter_resources(ec2, 'describe_subnets', [{'Name': 'vpc-id', 'Values': [vpc['VpcId']]}]):
+            name = next((tag['Value'] for tag in subnet.get('Tags', []) if tag['Key'] == 'Name'), None)
+            current[name or subnet['SubnetId']] = subnet['CidrBlock']
+        print(f"[ℹ️] VPC '{settings.vpc_name}' exists with {vpc['CidrBlock']}; planning inside it.")
+    else:
+        existing = load_existing_ranges(plan.get('regions', [settings.region_name]),
+                                        plan.get('profiles', [profile]), skip_vpc_name=settings.vpc_name)
+        current = {}
+        print(f"[ℹ️] Checked {len(existing)} existing VPC, subnet and peering CIDR(s) for overlaps.")
+
+    layout = plan_layout(existing, azs, plan['supernet'], plan['vpc_prefix'], plan['public_prefix'],
+                         plan['private_prefix'], vpc_cidr=vpc['CidrBlock'] if vpc else None, current=current)
+    settings.cidr_block = layout['cidr_block']
+    settings.public_subnets = layout['public_subnets']
+    settings.private_subnets = layout['private_subnets']
+    if settings.nat_subnet_az not in azs:
+        settings.nat_subnet_az = azs[0]
+    settings.nat_subnet_name = f"public_subnet_{settings.nat_subnet_az}"
+    settings.cluster_subnet_names = [f"public_subnet_{az}" for az in azs]
+    print(f"[✅] Planned VPC {layout['cidr_block']}: "
+          + ', '.join(f"{az} public {layout['public_subnets'][az]} / private {layout['private_subnets'][az]}"
+                      for az in azs))
+    return layout
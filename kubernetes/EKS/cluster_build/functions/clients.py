@@ -0,0 +1,109 @@
+import threading
+
+DEFAULT_REGION = 'us-east-1'
+
+# Connection-pool settings applied to every client built by the registry.
+# Tune with configure_pool() before the first client is requested.
+# botocore's own retries are off: functions.throttle retries throttled and transient
+# errors itself so that every attempt is charged against the rate limiter.
+POOL_SETTINGS = {
+    'max_pool_connections': 50,
+    'connect_timeout': 10,
+    'read_timeout': 60,
+    'tcp_keepalive': True,
+    'retries': {'mode': 'standard', 'total_max_attempts': 1},
+}
+
+_lock = threading.RLock()
+_sessions = {}
+_clients = {}
+_stats = {'sessions_created': 0, 'clients_created': 0, 'cache_hits': 0}
+
+
+def configure_pool(**settings):
+    """
+    Update the connection-pool settings used for new clients.
+
+    Clients already in the registry were built with the old settings, so they
+    are dropped and rebuilt on the next get_client() call.
+
+    :param settings: botocore Config keyword arguments (max_pool_connections, read_timeout, ...).
+    :return: The settings now in effect.
+    """
+    with _lock:
+        POOL_SETTINGS.update(settings)
+        _clients.clear()
+        return dict(POOL_SETTINGS)
+
+
+def get_session(profile=None):
+    """
+    Return the shared boto3 session for a profile, creating it on first use.
+
+    :param profile: AWS profile name, or None for the default credential chain.
+    :return: boto3.session.Session
+    """
+    with _lock:
+        session = _sessions.get(profile)
+        if session is None:
+            import boto3
+            session = boto3.session.Session(profile_name=profile)
+            _sessions[profile] = session
+            _stats['sessions_created'] += 1
+        return session
+
+
+def get_client(service, region=DEFAULT_REGION, profile=None):
+    """
+    Return a cached boto3 client for service/region/profile.
+
+    Clients are built once and shared by every module; botocore clients are
+    thread-safe, so callers can use the same instance from worker threads. Every
+    client is wrapped in a ThrottledClient that charges the (service, region) rate
+    budget and retries throttled calls, and is hooked into functions.trace.
+
+    :param service: AWS service name, e.g. 'ec2', 'eks', 'iam', 'sts'.
+    :param region: AWS region, or None to use the session default (global services).
+    :param profile: AWS profile name, or None for the default credential chain.
+    :return: boto3 client
+    """
+    key = (service, region, profile)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _stats['cache_hits'] += 1
+            return client
+        from botocore.config import Config
+        from functions.throttle import ThrottledClient
+        from functions.trace import instrument
+        raw_client = get_session(profile).client(
+            service,
+            region_name=region,
+            config=Config(**POOL_SETTINGS)
+        )
+        client = ThrottledClient(raw_client, service, region)
+        instrument(raw_client, service, region)
+        _clients[key] = client
+        _stats['clients_created'] += 1
+        return client
+
+
+def client_stats():
+    """
+    Report how many sessions and clients the registry built and how often it reused one.
+
+    :return: Dictionary of counters plus the list of cached (service, region, profile) keys.
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats['cached_clients'] = sorted(_clients, key=lambda key: tuple(str(part) for part in key))
+        return stats
+
+
+def reset_clients():
+    """Drop every cached session and client and zero the counters."""
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
+        for key in _stats:
+            _stats[key] = 0
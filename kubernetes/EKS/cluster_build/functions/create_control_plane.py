@@ -1,6 +1,8 @@
-import boto3
+from functions.clients import get_client
+from functions.waiters import wait_for_resources
 
-def create_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs, service_ipv4_cidr, kubernetes_version, tags):
+def create_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs, service_ipv4_cidr, kubernetes_version, tags,
+                       region='us-east-1'):
     """
     Create an EKS cluster with the specified configuration.
 
@@ -11,10 +13,11 @@ def create_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs,
     :param service_ipv4_cidr: CIDR block for Kubernetes service IPs.
     :param kubernetes_version: Kubernetes version for the cluster.
     :param tags: Dictionary of tags to apply to the cluster.
+    :param region: The AWS region to create the cluster in.
     """
     
     try:
-        eks_client = boto3.client('eks',region_name='us-east-1')
+        eks_client = get_client('eks', region)
         response = eks_client.create_cluster(
             name=cluster_name,
             roleArn=role_arn,
@@ -32,16 +35,90 @@ def create_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs,
         )
         print(f"EKS cluster '{cluster_name}' creation initiated successfully.")
         print(f"Waiting for cluster '{cluster_name}' to become active...")
-        waiter = eks_client.get_waiter('cluster_active')
-        waiter.wait(
-            name=cluster_name,
-            WaiterConfig={
-                'Delay': 30,  # Wait 30 seconds between checks
-                'MaxAttempts': 40  # Maximum number of attempts (40 * 30 = 20 minutes)
-            }
-        )
-        print(f"Node group '{cluster_name}' is now active.")
+        waited = wait_for_resources([('eks_cluster', cluster_name)], region=region)
+        if waited['failures']:
+            raise RuntimeError('; '.join(waited['failures'].values()))
+        print(f"Cluster '{cluster_name}' is now active.")
         return response
     except Exception as e:
         print(f"Error creating EKS cluster: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def upgrade_path(current_version, kubernetes_version):
+    """
+    List the versions an in-place upgrade goes through; EKS moves one minor version at a time.
+
+    :param current_version: Version the cluster runs, e.g. '1.28'.
+    :param kubernetes_version: Version it should run, e.g. '1.30'.
+    :return: List of versions, e.g. ['1.29', '1.30']; empty if they are the same.
+    :raises ValueError: If kubernetes_version is older (clusters cannot be downgraded).
+    """
+    major, minor = (int(part) for part in str(current_version).split('.')[:2])
+    target_major, target_minor = (int(part) for part in str(kubernetes_version).split('.')[:2])
+    if (target_major, target_minor) < (major, minor):
+        raise ValueError(f"cluster runs Kubernetes {current_version}; it cannot be downgraded to {kubernetes_version}")
+    if target_major != major:
+        raise ValueError(f"cannot upgrade Kubernetes {current_version} to {kubernetes_version} in place")
+    return [f"{major}.{version}" for version in range(minor + 1, target_minor + 1)]
+
+
+def reconcile_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs, service_ipv4_cidr, kubernetes_version,
+                          tags, region='us-east-1'):
+    """
+    Create the EKS cluster, or bring an existing one to the Kubernetes version in place.
+
+    The cluster is described once: a missing cluster is created (see create_eks_cluster()),
+    an existing one only gets update_cluster_version calls, one per minor version (see
+    upgrade_path()). Each is followed by its update ID until EKS reports it Successful:
+    the cluster can still read ACTIVE right after the call, and a failed upgrade leaves
+    it ACTIVE on the old version.
+
+    :param cluster_name: Name of the EKS cluster.
+    :param role_arn: ARN of the IAM role for the EKS cluster.
+    :param subnet_ids: List of subnet IDs for the cluster.
+    :param public_access_cidrs: List of CIDR blocks for public access.
+    :param service_ipv4_cidr: CIDR block for Kubernetes service IPs.
+    :param kubernetes_version: Kubernetes version the cluster should run.
+    :param tags: Dictionary of tags to apply to a new cluster.
+    :param region: The AWS region of the cluster.
+    :return: The cluster description, or None on error.
+    """
+    eks_client = get_client('eks', region)
+    try:
+        try:
+            cluster = eks_client.describe_cluster(name=cluster_name)['cluster']
+        except eks_client.exceptions.ResourceNotFoundException:
+            response = create_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs, service_ipv4_cidr,
+                                          kubernetes_version, tags, region=region)
+            return response['cluster'] if response else None
+
+        if cluster['status'] != 'ACTIVE':
+            print(f"Waiting for cluster '{cluster_name}' ({cluster['status']}) to become active...")
+            cluster = _wait_active(cluster_name, region)
+        versions = upgrade_path(cluster['version'], kubernetes_version)
+        if not versions:
+            print(f"Cluster '{cluster_name}' already runs Kubernetes {kubernetes_version}.")
+        for version in versions:
+            update = eks_client.update_cluster_version(name=cluster_name, version=version)['update']
+            print(f"Cluster '{cluster_name}' upgrade {cluster['version']} -> {version} initiated successfully.")
+            _wait(('eks_cluster_update', (cluster_name, update['id'])), region)
+            cluster = eks_client.describe_cluster(name=cluster_name)['cluster']
+            print(f"Cluster '{cluster_name}' now runs Kubernetes {cluster['version']}.")
+        return cluster
+    except Exception as e:
+        print(f"Error reconciling EKS cluster: {e}")
+        return None
+
+
+def _wait(resource, region):
+    waited = wait_for_resources([resource], region=region)
+    if waited['failures']:
+        raise RuntimeError('; '.join(waited['failures'].values()))
+    return waited['results'][resource]
+
+
+def _wait_active(cluster_name, region):
+    cluster = _wait(('eks_cluster', cluster_name), region)
+    print(f"Cluster '{cluster_name}' is now active.")
+    return cluster
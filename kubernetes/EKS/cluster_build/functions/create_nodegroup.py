@@ -1,6 +1,80 @@
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-def create_eks_nodegroup(cluster_name, nodegroup_name, scaling_config, subnets, node_role, instance_types, ami_type, capacity_type, update_config, taints, labels, tags):
+from functions.clients import get_client
+from functions.launch_template import (ensure_launch_template, find_launch_template, launch_template_data,
+                                       launch_template_name)
+from functions.pod_density import user_data
+from functions.waiters import wait_for_resources
+
+
+def _nodegroup_request(cluster_name, nodegroup_name, scaling_config, subnets, node_role, instance_types, ami_type, capacity_type, update_config, taints, labels, tags,
+                       launch_template=None):
+    """Build the create_nodegroup request body from the create_eks_nodegroup arguments."""
+    request = {
+        'clusterName': cluster_name,
+        'nodegroupName': nodegroup_name,
+        'scalingConfig': scaling_config,
+        'subnets': subnets,
+        'nodeRole': node_role,
+        'instanceTypes': instance_types,
+        'amiType': ami_type,
+        'capacityType': capacity_type,
+        'updateConfig': update_config,
+        'taints': taints,
+        'labels': labels,
+        'tags': tags
+    }
+    if launch_template:
+        request['launchTemplate'] = launch_template
+    return request
+
+
+def nodegroup_launch_template(cluster_name, nodegroup_name, ami_type, max_pods, tags, region='us-east-1'):
+    """
+    Create or update the launch template that sets a node group's max-pods.
+
+    :param cluster_name: Name of the EKS cluster.
+    :param nodegroup_name: Name of the node group.
+    :param ami_type: AMI type of the node group; decides the user data format.
+    :param max_pods: The max-pods value (see functions.pod_density.nodegroup_max_pods()), or None.
+    :param tags: Dictionary of tags for the template and the instances it launches.
+    :param region: The AWS region of the cluster.
+    :return: Dictionary with the template's 'id' and 'version', or None if no template is needed.
+    """
+    data = user_data(ami_type, max_pods) if max_pods else None
+    if data is None:
+        return None
+    return ensure_launch_template(launch_template_name(cluster_name, nodegroup_name),
+                                  launch_template_data(data, tags), tags, region=region)
+
+
+def find_nodegroup_launch_template(cluster_name, nodegroup_name, ami_type, max_pods, tags, region='us-east-1'):
+    """
+    Read-only counterpart of nodegroup_launch_template(): look the template up without writing to it.
+
+    :return: Dictionary with the template's 'id' and the 'version' matching the settings, 'version' None
+             if a new template version is needed (both None if the template is gone), or None if no
+             template is needed.
+    """
+    data = user_data(ami_type, max_pods) if max_pods else None
+    if data is None:
+        return None
+    return (find_launch_template(launch_template_name(cluster_name, nodegroup_name), launch_template_data(data, tags),
+                                 region=region)
+            or {'id': None, 'version': None})
+
+
+def _create_nodegroup(eks_client, cluster_name, spec, region):
+    """Generate the node group's launch template if its spec sets max_pods, then request the node group."""
+    spec = dict(spec)
+    launch_template = nodegroup_launch_template(cluster_name, spec['nodegroup_name'], spec['ami_type'],
+                                                spec.pop('max_pods', None), spec['tags'], region=region)
+    return eks_client.create_nodegroup(**_nodegroup_request(cluster_name, launch_template=launch_template, **spec))
+
+
+def create_eks_nodegroup(cluster_name, nodegroup_name, scaling_config, subnets, node_role, instance_types, ami_type, capacity_type, update_config, taints, labels, tags,
+                         region='us-east-1', max_pods=None):
     """
     Create an EKS node group with the specified configuration.
 
@@ -17,37 +91,282 @@ def create_eks_nodegroup(cluster_name, nodegroup_name, scaling_config, subnets,
     :param taints: List of taints (key, value, effect).
     :param labels: Dictionary of labels.
     :param tags: Dictionary of tags.
+    :param region: The AWS region of the cluster.
+    :param max_pods: Pods per node; sets it through a generated launch template (optional).
     """
-    eks_client = boto3.client('eks',region_name='us-east-1')
+    eks_client = get_client('eks', region)
 
     try:
+        launch_template = nodegroup_launch_template(cluster_name, nodegroup_name, ami_type, max_pods, tags, region=region)
         response = eks_client.create_nodegroup(
-            clusterName=cluster_name,
-            nodegroupName=nodegroup_name,
-            scalingConfig=scaling_config,
-            subnets=subnets,
-            nodeRole=node_role,
-            instanceTypes=instance_types,
-            amiType=ami_type,
-            capacityType=capacity_type,
-            updateConfig=update_config,
-            taints=taints,
-            labels=labels,
-            tags=tags
+            **_nodegroup_request(cluster_name, nodegroup_name, scaling_config, subnets, node_role, instance_types,
+                                 ami_type, capacity_type, update_config, taints, labels, tags, launch_template)
         )
         print(f"Node group '{nodegroup_name}' creation initiated successfully.")
         print(f"Waiting for node group '{nodegroup_name}' to become active...")
-        waiter = eks_client.get_waiter('nodegroup_active')
-        waiter.wait(
-            clusterName=cluster_name,
-            nodegroupName=nodegroup_name,
-            WaiterConfig={
-                'Delay': 30,  # Wait 30 seconds between checks
-                'MaxAttempts': 40  # Maximum number of attempts (40 * 30 = 20 minutes)
-            }
-        )
+        waited = wait_for_resources([('eks_nodegroup', (cluster_name, nodegroup_name))], region=region)
+        if waited['failures']:
+            raise RuntimeError('; '.join(waited['failures'].values()))
         print(f"Node group '{nodegroup_name}' is now active.")
         return response
     except Exception as e:
         print(f"Error creating node group: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def _submit_and_wait(cluster_name, requests, region, deadline, update_type='eks_nodegroup_config_update'):
+    """
+    Make one request per node group concurrently, then wait for every node group that accepted it together.
+
+    A creation is waited for until the node group is ACTIVE. An update is followed by its
+    update ID until EKS reports it Successful (the node group can still read ACTIVE right
+    after the call, and a failed update leaves it ACTIVE), then the node group is waited
+    for so the results hold its new description.
+
+    :param requests: Dictionary of nodegroup name -> (action, callable making the request); action
+                     names the request in the log lines, e.g. 'creation'.
+    :param update_type: Waiter profile for updates, 'eks_nodegroup_config_update' or
+                        'eks_nodegroup_update' for version updates.
+    :return: Dictionary with 'results' (nodegroup name -> ACTIVE node group description)
+             and 'failures' (nodegroup name -> error message).
+    """
+    results, failures, pending = {}, {}, []
+    if not requests:
+        return {'results': results, 'failures': failures}
+
+    # Submit every request before waiting on any of them
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        futures = {nodegroup_name: (action, pool.submit(request))
+                   for nodegroup_name, (action, request) in requests.items()}
+    for nodegroup_name, (action, future) in futures.items():
+        try:
+            update = future.result().get('update')
+            print(f"Node group '{nodegroup_name}' {action} initiated successfully.")
+            pending.append((update_type, (cluster_name, nodegroup_name, update['id'])) if update
+                           else ('eks_nodegroup', (cluster_name, nodegroup_name)))
+        except Exception as e:
+            print(f"Error in node group '{nodegroup_name}' {action}: {e}")
+            failures[nodegroup_name] = str(e)
+
+    # One combined wait for everything that was submitted
+    if pending:
+        print(f"Waiting for node groups {', '.join(resource_id[1] for _, resource_id in pending)} to become active...")
+        waited = wait_for_resources(pending, region=region, deadline=deadline)
+        updated = [('eks_nodegroup', resource_id[:2]) for resource_type, resource_id in waited['results']
+                   if resource_type == update_type]
+        if updated:
+            # the updates succeeded; read the node groups they left behind
+            followed = wait_for_resources(updated, region=region, deadline=deadline)
+            waited['results'].update(followed['results'])
+            waited['failures'].update(followed['failures'])
+        for (resource_type, resource_id), nodegroup in waited['results'].items():
+            if resource_type == 'eks_nodegroup':
+                print(f"Node group '{resource_id[1]}' is now active.")
+                results[resource_id[1]] = nodegroup
+        for (_, resource_id), error in waited['failures'].items():
+            print(f"Node group '{resource_id[1]}' failed: {error}")
+            failures[resource_id[1]] = error
+
+    return {'results': results, 'failures': failures}
+
+
+def create_eks_nodegroups(cluster_name, nodegroup_specs, region='us-east-1', deadline=1200):
+    """
+    Create several EKS node groups at once and wait for all of them together.
+
+    Every create_nodegroup call is submitted up front, then one wait engine polls
+    all pending node groups, so N node groups take roughly as long as the slowest one.
+
+    :param cluster_name: Name of the EKS cluster.
+    :param nodegroup_specs: List of dictionaries holding the create_eks_nodegroup keyword
+                            arguments (nodegroup_name, scaling_config, subnets, node_role,
+                            instance_types, ami_type, capacity_type, update_config, taints,
+                            labels, tags, and optionally max_pods).
+    :param region: The AWS region of the cluster.
+    :param deadline: Maximum seconds to wait for all node groups.
+    :return: Dictionary with 'results' (nodegroup name -> ACTIVE node group description)
+             and 'failures' (nodegroup name -> error message).
+    """
+    eks_client = get_client('eks', region)
+    # Each node group's launch template is generated inside its own request
+    return _submit_and_wait(cluster_name, {
+        spec['nodegroup_name']: ('creation', partial(_create_nodegroup, eks_client, cluster_name, spec, region))
+        for spec in nodegroup_specs
+    }, region, deadline)
+
+
+def _taint_key(taint):
+    return taint['key'], taint.get('value'), taint['effect']
+
+
+def nodegroup_updates(nodegroup, spec, kubernetes_version=None, launch_template=None):
+    """
+    Diff a live node group against its spec.
+
+    :param nodegroup: The node group as describe_nodegroup returns it.
+    :param spec: create_eks_nodegroups spec dictionary; empty subnets or node_role are not compared.
+    :param kubernetes_version: Kubernetes version the nodes should run (optional).
+    :param launch_template: {'id', 'version'} the node group should use (optional); a None version
+                            means its template needs a new version.
+    :return: Dictionary with 'config' (update_nodegroup_config arguments), 'version'
+             (update_nodegroup_version arguments), both empty when nothing changes, and
+             'replace' (settings only a new node group can change).
+    """
+    config = {}
+    if nodegroup.get('scalingConfig') != spec['scaling_config']:
+        config['scalingConfig'] = spec['scaling_config']
+    if spec['update_config'] and nodegroup.get('updateConfig') != spec['update_config']:
+        config['updateConfig'] = spec['update_config']
+
+    current_labels, labels = nodegroup.get('labels') or {}, spec['labels'] or {}
+    label_changes = {}
+    if any(current_labels.get(key) != value for key, value in labels.items()):
+        label_changes['addOrUpdateLabels'] = {key: value for key, value in labels.items() if current_labels.get(key) != value}
+    if any(key not in labels for key in current_labels):
+        label_changes['removeLabels'] = [key for key in current_labels if key not in labels]
+    if label_changes:
+        config['labels'] = label_changes
+
+    # A taint is identified by key and effect; a new value replaces the old one
+    current_taints = {_taint_key(taint): taint for taint in nodegroup.get('taints') or []}
+    taints = {_taint_key(taint): taint for taint in spec['taints'] or []}
+    taint_changes = {}
+    if set(taints) - set(current_taints):
+        taint_changes['addOrUpdateTaints'] = [taints[key] for key in taints if key not in current_taints]
+    kept = {(key, effect) for key, _, effect in taints}
+    if any((key, effect) not in kept for key, _, effect in current_taints):
+        taint_changes['removeTaints'] = [taint for (key, _, effect), taint in current_taints.items()
+                                         if (key, effect) not in kept]
+    if taint_changes:
+        config['taints'] = taint_changes
+
+    version = {}
+    if kubernetes_version and nodegroup.get('version') != str(kubernetes_version):
+        version['version'] = str(kubernetes_version)
+    current_template = nodegroup.get('launchTemplate')
+    if launch_template and current_template and \
+            (current_template.get('id'), str(current_template.get('version'))) != (launch_template['id'], launch_template['version']):
+        version['launchTemplate'] = {'id': launch_template['id'], 'version': launch_template['version']}
+
+    replace = [name for name, key in (('instance_types', 'instanceTypes'), ('ami_type', 'amiType'),
+                                      ('capacity_type', 'capacityType'), ('node_role', 'nodeRole'))
+               if spec[name] and nodegroup.get(key) != spec[name]]
+    if spec['subnets'] and set(nodegroup.get('subnets') or []) != set(spec['subnets']):
+        replace.append('subnets')
+    if bool(spec.get('max_pods')) != bool(current_template):
+        replace.append('max_pods (launch template)')
+    return {'config': config, 'version': version, 'replace': replace}
+
+
+def _describe_nodegroup(eks_client, cluster_name, spec, region):
+    """Describe a node group and, if it uses a generated launch template, look the template up (read-only)."""
+    try:
+        nodegroup = eks_client.describe_nodegroup(clusterName=cluster_name, nodegroupName=spec['nodegroup_name'])['nodegroup']
+    except eks_client.exceptions.ResourceNotFoundException:
+        return None, None
+    launch_template = None
+    if nodegroup.get('launchTemplate'):
+        launch_template = find_nodegroup_launch_template(cluster_name, spec['nodegroup_name'], spec['ami_type'],
+                                                         spec.get('max_pods'), spec['tags'], region=region)
+    return nodegroup, launch_template
+
+
+def _update_nodegroup_version(eks_client, cluster_name, spec, region, **version):
+    """Bring the node group's launch template up to date if the update changes it, then request the update."""
+    if 'launchTemplate' in version:
+        version['launchTemplate'] = nodegroup_launch_template(cluster_name, spec['nodegroup_name'], spec['ami_type'],
+                                                              spec.get('max_pods'), spec['tags'], region=region)
+    return eks_client.update_nodegroup_version(clusterName=cluster_name, nodegroupName=spec['nodegroup_name'],
+                                               **version)
+
+
+def reconcile_eks_nodegroups(cluster_name, nodegroup_specs, kubernetes_version=None, region='us-east-1', deadline=1200):
+    """
+    Create missing node groups and update existing ones in place to match their specs.
+
+    Every node group is described once, concurrently. Like the cluster in reconcile_eks_cluster(),
+    one that is not ACTIVE is waited for first, so a node group still being created or updated
+    is diffed once it settles and a CREATE_FAILED, DEGRADED or DELETING one fails with its health
+    issues instead of passing as up to date. The rest are diffed (see nodegroup_updates());
+    nothing is written until an update is submitted, launch template versions included.
+    Scaling, labels, taints and updateConfig go through update_nodegroup_config, which
+    takes seconds; a Kubernetes or launch template version change goes through
+    update_nodegroup_version, a rolling replacement of the nodes. EKS runs one update
+    per node group at a time, so config updates are applied and waited for (until
+    describe_update reports them Successful) before version updates; different node
+    groups are created or updated concurrently.
+    Settings only a new node group can change are reported and left as they are.
+
+    :param cluster_name: Name of the EKS cluster.
+    :param nodegroup_specs: List of create_eks_nodegroups spec dictionaries.
+    :param kubernetes_version: Kubernetes version the nodes should run (optional; the cluster's by default).
+    :param region: The AWS region of the cluster.
+    :param deadline: Maximum seconds to wait for creations and config updates; version updates
+                     roll every node and wait as long as the 'eks_nodegroup_update' profile allows.
+    :return: Dictionary with 'results' (nodegroup name -> ACTIVE node group description),
+             'failures' (nodegroup name -> error message) and 'updates' (nodegroup name ->
+             list of the update calls made).
+    """
+    eks_client = get_client('eks', region)
+    results, failures, updates = {}, {}, {}
+    if not nodegroup_specs:
+        return {'results': results, 'failures': failures, 'updates': updates}
+
+    with ThreadPoolExecutor(max_workers=len(nodegroup_specs)) as pool:
+        futures = {spec['nodegroup_name']: (spec, pool.submit(_describe_nodegroup, eks_client, cluster_name, spec, region))
+                   for spec in nodegroup_specs}
+
+    described = {}
+    for nodegroup_name, (spec, future) in futures.items():
+        try:
+            described[nodegroup_name] = future.result()
+        except Exception as e:
+            print(f"Error describing node group '{nodegroup_name}': {e}")
+            failures[nodegroup_name] = str(e)
+
+    unsettled = []
+    for nodegroup_name, (nodegroup, _) in described.items():
+        if nodegroup and nodegroup['status'] != 'ACTIVE':
+            print(f"Waiting for node group '{nodegroup_name}' ({nodegroup['status']}) to become active...")
+            unsettled.append(('eks_nodegroup', (cluster_name, nodegroup_name)))
+    if unsettled:
+        waited = wait_for_resources(unsettled, region=region, deadline=deadline)
+        for (_, (_, nodegroup_name)), nodegroup in waited['results'].items():
+            described[nodegroup_name] = (nodegroup, described[nodegroup_name][1])
+        for (_, (_, nodegroup_name)), error in waited['failures'].items():
+            print(f"Node group '{nodegroup_name}' failed: {error}")
+            failures[nodegroup_name] = error
+            del described[nodegroup_name]
+
+    creates, config_updates, version_updates = {}, {}, {}
+    for nodegroup_name, (nodegroup, launch_template) in described.items():
+        spec = futures[nodegroup_name][0]
+        if nodegroup is None:
+            creates[nodegroup_name] = ('creation', partial(_create_nodegroup, eks_client, cluster_name, spec, region))
+            continue
+        diff = nodegroup_updates(nodegroup, spec, kubernetes_version, launch_template)
+        if diff['replace']:
+            print(f"Node group '{nodegroup_name}' differs in {', '.join(diff['replace'])}; only a new node group "
+                  f"can change that, so it is left as it is.")
+        if diff['config']:
+            config_updates[nodegroup_name] = ('config update', partial(
+                eks_client.update_nodegroup_config, clusterName=cluster_name, nodegroupName=nodegroup_name,
+                **diff['config']))
+            updates[nodegroup_name] = ['update_nodegroup_config']
+        if diff['version']:
+            version_updates[nodegroup_name] = ('version update', partial(
+                _update_nodegroup_version, eks_client, cluster_name, spec, region, **diff['version']))
+            updates.setdefault(nodegroup_name, []).append('update_nodegroup_version')
+        if not diff['config'] and not diff['version']:
+            print(f"Node group '{nodegroup_name}' is up to date.")
+            results[nodegroup_name] = nodegroup
+
+    # Creations and config updates together, then the version updates of the node groups that are still fine
+    first = _submit_and_wait(cluster_name, {**creates, **config_updates}, region, deadline)
+    failures.update(first['failures'])
+    results.update(first['results'])
+    second = _submit_and_wait(cluster_name, {name: request for name, request in version_updates.items()
+                                             if name not in failures}, region, None, 'eks_nodegroup_update')
+    failures.update(second['failures'])
+    results.update(second['results'])
+    return {'results': results, 'failures': failures, 'updates': updates}
@@ -1,41 +1,123 @@
-import boto3
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.clients import get_client
+
+
+def normalize_policy(policy_document):
+    """Policy document as canonical JSON, so key order and string/dict form do not count as a change."""
+    if isinstance(policy_document, str):
+        policy_document = json.loads(policy_document)
+    return json.dumps(policy_document, sort_keys=True)
+
+
+def describe_role(iam_client, role_name):
+    """
+    Read a role and the ARNs of its attached managed policies.
+
+    :param iam_client: IAM client.
+    :param role_name: Name of the IAM role.
+    :return: Tuple of (role description or None if the role does not exist, set of attached policy ARNs).
+    """
+    try:
+        role = iam_client.get_role(RoleName=role_name)['Role']
+    except iam_client.exceptions.NoSuchEntityException:
+        return None, set()
+    paginator = iam_client.get_paginator('list_attached_role_policies')
+    attached = {policy['PolicyArn'] for page in paginator.paginate(RoleName=role_name)
+                for policy in page['AttachedPolicies']}
+    return role, attached
 
 
 def create_iam_role(role_name, trust_policy, policies, tags=None):
     """
-    Create an IAM role and attach policies to it.
+    Create or reconcile an IAM role and the policies attached to it.
+
+    The role and its attached policies are read once; only what differs is changed:
+    a missing role is created, a changed trust policy is updated, missing tags are
+    added and missing policies are attached. A role that already matches costs two
+    read calls and no writes.
 
     :param role_name: Name of the IAM role to create.
     :param trust_policy: Trust policy document as a dictionary.
     :param policies: List of policy ARNs to attach to the role.
     :param tags: List of tags to add to the role (optional).
+    :return: ARN of the role, or None if it could not be created or a policy could not be attached.
     """
-    iam_client = boto3.client('iam')
+    iam_client = get_client('iam', None)
 
-    # Create the IAM role
     try:
-        iam_client.create_role(
-            RoleName=role_name,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
-            Tags=tags or []
-        )
-        print(f"Role '{role_name}' created successfully.")
-    except iam_client.exceptions.EntityAlreadyExistsException:
-        print(f"Role '{role_name}' already exists.")
+        role, attached = describe_role(iam_client, role_name)
     except Exception as e:
-        print(f"Error creating role: {e}")
-        return
-
-    # Attach the policies to the role
-    for policy_arn in policies:
-        try:
-            iam_client.attach_role_policy(
-                RoleName=role_name,
-                PolicyArn=policy_arn
-            )
-            print(f"Policy '{policy_arn}' attached to role '{role_name}' successfully.")
-        except Exception as EntityAlreadyExistsException:
-            print(f"Policy '{policy_arn}' already attached to role '{role_name}'.")
-        except Exception as e:
-            print(f"Error attaching policy '{policy_arn}': {e}")
\ No newline at end of file
+        print(f"[❌] Error reading role '{role_name}': {e}")
+        return None
+
+    # Create the IAM role, or bring its trust policy and tags in line
+    try:
+        if not role:
+            try:
+                role = iam_client.create_role(
+                    RoleName=role_name,
+                    AssumeRolePolicyDocument=json.dumps(trust_policy),
+                    Tags=tags or []
+                )['Role']
+                print(f"[✅] Role '{role_name}' created successfully.")
+            except iam_client.exceptions.EntityAlreadyExistsException:
+                # Another run created it between our read and our create
+                role, attached = describe_role(iam_client, role_name)
+                print(f"[⚠️] Role '{role_name}' already exists.")
+        if normalize_policy(role['AssumeRolePolicyDocument']) != normalize_policy(trust_policy):
+            iam_client.update_assume_role_policy(RoleName=role_name, PolicyDocument=json.dumps(trust_policy))
+            print(f"[✅] Trust policy of role '{role_name}' updated.")
+        current_tags = {tag['Key']: tag['Value'] for tag in role.get('Tags', [])}
+        missing_tags = [tag for tag in tags or [] if current_tags.get(tag['Key']) != tag['Value']]
+        if missing_tags:
+            iam_client.tag_role(RoleName=role_name, Tags=missing_tags)
+            print(f"[✅] Tagged role '{role_name}' with {', '.join(tag['Key'] for tag in missing_tags)}.")
+    except Exception as e:
+        print(f"[❌] Error creating role '{role_name}': {e}")
+        return None
+
+    # Attach only the policies that are not attached yet
+    wanted = list(dict.fromkeys(policies))
+    missing = [policy_arn for policy_arn in wanted if policy_arn not in attached]
+    failed = False
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            futures = {policy_arn: pool.submit(iam_client.attach_role_policy, RoleName=role_name, PolicyArn=policy_arn)
+                       for policy_arn in missing}
+        for policy_arn, future in futures.items():
+            try:
+                future.result()
+                print(f"[✅] Policy '{policy_arn}' attached to role '{role_name}' successfully.")
+            except Exception as e:
+                print(f"[❌] Error attaching policy '{policy_arn}' to role '{role_name}': {e}")
+                failed = True
+    if len(missing) < len(wanted):
+        print(f"[ℹ️] {len(wanted) - len(missing)} policy(ies) already attached to role '{role_name}'.")
+
+    return None if failed else role['Arn']
+
+
+def reconcile_iam_roles(roles, max_workers=4):
+    """
+    Create or reconcile several IAM roles at once.
+
+    :param roles: List of (role_name, trust_policy, policy_arns, tags) tuples.
+    :param max_workers: Maximum number of roles reconciled at the same time.
+    :return: Dictionary with 'results' (role name -> role ARN) and 'failures' (role name -> error message).
+    """
+    results, failures = {}, {}
+    if not roles:
+        return {'results': results, 'failures': failures}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(roles))) as pool:
+        futures = {role_name: pool.submit(create_iam_role, role_name, trust_policy, policies, tags)
+                   for role_name, trust_policy, policies, tags in roles}
+    for role_name, future in futures.items():
+        role_arn = future.result()
+        if role_arn:
+            results[role_name] = role_arn
+        else:
+            failures[role_name] = f"role '{role_name}' could not be reconciled"
+    return {'results': results, 'failures': failures}
@@ -0,0 +1,403 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.clients import get_client
+from functions.resolver import iter_resources
+from functions.throttle import throttle_stats
+
+# Fields that change without anyone touching the resource; left out of the hash
+VOLATILE_FIELDS = {'AvailableIpAddressCount', 'modifiedAt', 'health', 'ResponseMetadata'}
+
+# Lists whose order means nothing, keyed by the first of these fields an item carries, so a
+# diff names the route or attachment that changed instead of the whole list
+KEYED_LISTS = {
+    'Routes': ('DestinationCidrBlock', 'DestinationIpv6CidrBlock', 'DestinationPrefixListId'),
+    'Associations': ('RouteTableAssociationId',),
+    'Attachments': ('VpcId',),
+    'NatGatewayAddresses': ('AllocationId',),
+}
+
+# EC2 network resources of one VPC as kind -> (describe operation, ID field, ID filter).
+# One network probe lists every kind with one call each; only resources whose hash
+# changed are described again, with one ID-filtered call per kind.
+NETWORK_KINDS = {
+    'vpc': ('describe_vpcs', 'VpcId', 'vpc-id'),
+    'subnet': ('describe_subnets', 'SubnetId', 'subnet-id'),
+    'internet_gateway': ('describe_internet_gateways', 'InternetGatewayId', 'internet-gateway-id'),
+    'route_table': ('describe_route_tables', 'RouteTableId', 'route-table-id'),
+    'nat_gateway': ('describe_nat_gateways', 'NatGatewayId', 'nat-gateway-id'),
+}
+
+# NAT gateways in these states are watched; a deleted one lingers in describe results for an hour
+NAT_GATEWAY_STATES = ['pending', 'available', 'deleting', 'failed']
+
+# API calls one probe of each kind makes, used to plan a sweep within the budget
+PROBE_COSTS = {'network': len(NETWORK_KINDS), 'cluster': 2, 'nodegroup': 1, 'addon': 1}
+
+
+def _normalize(value, key=None):
+    """Canonical form of a describe result: tags as a dictionary, unordered lists sorted or keyed."""
+    if isinstance(value, dict):
+        return {name: _normalize(item, name) for name, item in value.items() if name not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        if key == 'Tags' and all(isinstance(item, dict) and 'Key' in item for item in value):
+            return {tag['Key']: tag.get('Value') for tag in value}
+        if key in KEYED_LISTS and all(isinstance(item, dict) for item in value):
+            return {f"[{next((item[field] for field in KEYED_LISTS[key] if item.get(field)), '')}]": _normalize(item)
+                    for item in value}
+        return sorted((_normalize(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True, default=str))
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def resource_hash(record):
+    """
+    Stable hash of a resource description: equal for equal configuration, whatever the
+    order of its lists or tags, and blind to VOLATILE_FIELDS.
+
+    :param record: A describe result for one resource (e.g. one route table).
+    :return: Hex digest.
+    """
+    payload = json.dumps(_normalize(record), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _diff(old, new, path=''):
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for name in sorted(set(old) | set(new)):
+            changes += _diff(old.get(name), new.get(name),
+                             f"{path}{name}" if name.startswith('[') or not path else f"{path}.{name}")
+        return changes
+    return [{'field': path, 'old': old, 'new': new}] if old != new else []
+
+
+def diff_records(old, new):
+    """
+    Field-level differences between two descriptions of the same resource.
+
+    A route, association or attachment that appeared or went away is one change
+    (e.g. 'Routes[0.0.0.0/0]' with old set and new None), not one per field.
+
+    :param old: Earlier describe result.
+    :param new: Later describe result.
+    :return: List of {'field', 'old', 'new'} dictionaries; a field missing on one side is None there.
+    """
+    return _diff(_normalize(old), _normalize(new))
+
+
+def _name_tag(resource):
+    for tag in resource.get('Tags', []):
+        if tag['Key'] == 'Name':
+            return tag['Value']
+    return None
+
+
+def watch_target(settings):
+    """
+    What the watcher checks for one cluster, taken from its settings.
+
+    :param settings: The cluster_config module or a fleet cluster's settings (see fleet.cluster_settings()).
+    :return: Dictionary with cluster_name, region, profile, vpc_name, nodegroups and addons.
+    """
+    from functions.addons import addon_specs
+    return {
+        'cluster_name': settings.cluster_name, 'region': settings.region_name,
+        'profile': getattr(settings, 'profile', None), 'vpc_name': settings.vpc_name,
+        'nodegroups': [settings.system_nodegroup_name, settings.application_nodegroup_name],
+        'addons': sorted(addon_specs(settings)),
+    }
+
+
+class DriftWatcher:
+    """
+    Periodic, budgeted drift detection for the VPC and EKS resources the build manages.
+
+    Every resource seen is kept as a hash (see resource_hash()) plus its last description.
+    Each sweep runs probes, least recently run first, while the call budget lasts:
+
+    - 'network': lists the VPC, its subnets, its Internet Gateway (by attachment to the
+      VPC), its route tables and NAT gateways, one call per kind. Resources whose hash is
+      unchanged cost nothing more; the rest, and those missing from a listing, are
+      described again by ID before an event is emitted, so a stale read does not raise a
+      false alarm. A detached gateway drops out of the listing and is caught by that
+      describe-by-ID follow-up, as a change to its attachments.
+    - 'cluster': describe_cluster plus list_nodegroups (a node group created or deleted by
+      hand shows up as a change to the cluster's node group list).
+    - 'nodegroup' / 'addon': one describe each; the managed names plus any listed node group.
+
+    The budget is a token bucket of calls_per_minute, at most one interval's worth
+    banked; the calls a sweep actually made (pages and retries included) are charged, so
+    over any stretch of time the watcher stays within calls_per_minute however many
+    clusters it watches. With more to check than the budget allows, probes take turns.
+
+    The first run of a probe records a baseline and emits nothing. After that, every
+    difference is written to the event stream as one JSON line: 'added', 'removed', or
+    'changed' with the fields that changed.
+
+    :param targets: List of watch_target() dictionaries.
+    :param events: Writable text stream for the JSON-lines events.
+    :param interval: Seconds between sweeps.
+    :param calls_per_minute: API call budget across all targets.
+    :param state_path: JSON file the hashes are kept in between runs (optional); drift that
+                       happened while the watcher was down is reported on the next sweep.
+    :param workers: Maximum probes running at once.
+    """
+
+    def __init__(self, targets, events=sys.stdout, interval=60.0, calls_per_minute=60.0, state_path=None, workers=4):
+        self.targets = {target['cluster_name']: target for target in targets}
+        self.events = events
+        self.interval = interval
+        self.rate = calls_per_minute / 60.0
+        self.burst = max(calls_per_minute * interval / 60.0, max(PROBE_COSTS.values()))
+        self.state_path = state_path
+        self.workers = workers
+        self.resources = {}
+        self.baselined = set()
+        self.last_run = {}
+        self.vpc_ids = {}
+        self.nodegroups = {name: set(target['nodegroups']) for name, target in self.targets.items()}
+        self.stats = {'sweeps': 0, 'probes': 0, 'calls': 0, 'redescribed': 0, 'events': 0}
+        self._credit = self.burst
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                state = json.load(state_file)
+            self.resources = state.get('resources', {})
+            self.baselined = {tuple(probe) for probe in state.get('baselined', [])}
+            for key, entry in self.resources.items():
+                if entry['kind'] == 'vpc':
+                    self.vpc_ids[entry['cluster']] = entry['id']
+                if entry['kind'] == 'nodegroup' and entry['cluster'] in self.nodegroups:
+                    self.nodegroups[entry['cluster']].add(entry['id'])
+
+    # Planning
+
+    def probes(self):
+        """Every probe of every target, as (kind, cluster_name, name) tuples."""
+        probes = []
+        for cluster_name, target in self.targets.items():
+            probes += [('network', cluster_name, None), ('cluster', cluster_name, None)]
+            probes += [('nodegroup', cluster_name, name) for name in sorted(self.nodegroups[cluster_name])]
+            probes += [('addon', cluster_name, name) for name in target['addons']]
+        return probes
+
+    def sweep_cost(self):
+        """API calls one full sweep makes when nothing has changed."""
+        return sum(PROBE_COSTS[probe[0]] for probe in self.probes())
+
+    def _due(self):
+        """The probes this sweep can afford, least recently run first."""
+        now = time.monotonic()
+        self._credit = min(self.burst, self._credit + (now - self._refilled) * self.rate)
+        self._refilled = now
+        due, credit = [], self._credit
+        for probe in sorted(self.probes(), key=lambda probe: self.last_run.get(probe, float('-inf'))):
+            if credit < PROBE_COSTS[probe[0]]:
+                break
+            credit -= PROBE_COSTS[probe[0]]
+            due.append(probe)
+        return due
+
+    # Probes
+
+    def _network(self, target):
+        """Observe the VPC's network resources: {key: description}, empty if the VPC does not exist."""
+        ec2 = get_client('ec2', target['region'], target['profile'])
+        cluster_name = target['cluster_name']
+        vpc_id = self.vpc_ids.get(cluster_name)
+        if vpc_id is None:
+            vpcs = list(iter_resources(ec2, 'describe_vpcs', [{'Name': 'tag:Name', 'Values': [target['vpc_name']]}]))
+            if len(vpcs) != 1:
+                return {}
+            vpc_id = self.vpc_ids[cluster_name] = vpcs[0]['VpcId']
+        scope = [{'Name': 'vpc-id', 'Values': [vpc_id]}]
+        filters = {
+            'vpc': scope, 'subnet': scope, 'route_table': scope,
+            'internet_gateway': [{'Name': 'attachment.vpc-id', 'Values': [vpc_id]}],
+            'nat_gateway': scope + [{'Name': 'state', 'Values': NAT_GATEWAY_STATES}],
+        }
+        with ThreadPoolExecutor(max_workers=len(NETWORK_KINDS)) as pool:
+            listed = {kind: pool.submit(lambda kind=kind: list(iter_resources(ec2, NETWORK_KINDS[kind][0], filters[kind])))
+                      for kind in NETWORK_KINDS}
+        observed = {}
+        for kind, future in listed.items():
+            for resource in future.result():
+                observed[self._key(cluster_name, kind, resource[NETWORK_KINDS[kind][1]])] = resource
+        if self._key(cluster_name, 'vpc', vpc_id) not in observed:
+            # the VPC is gone; look it up by name again next time
+            self.vpc_ids.pop(cluster_name, None)
+        return observed
+
+    def _redescribe(self, target, keys):
+        """Describe the given network resources again by ID, one call per kind; missing ones are left out."""
+        ec2 = get_client('ec2', target['region'], target['profile'])
+        by_kind = {}
+        for key in keys:
+            kind, resource_id = key.split('/')[1:3]
+            by_kind.setdefault(kind, []).append(resource_id)
+        described = {}
+        for kind, resource_ids in by_kind.items():
+            operation, id_field, id_filter = NETWORK_KINDS[kind]
+            for resource in iter_resources(ec2, operation, [{'Name': id_filter, 'Values': resource_ids}]):
+                if kind != 'nat_gateway' or resource.get('State') in NAT_GATEWAY_STATES:
+                    described[self._key(target['cluster_name'], kind, resource[id_field])] = resource
+        with self._lock:
+            self.stats['redescribed'] += len(keys)
+        return described
+
+    def _eks(self, probe, target):
+        """Observe one EKS resource: {key: description}, empty if it does not exist."""
+        kind, cluster_name, name = probe
+        eks_client = get_client('eks', target['region'], target['profile'])
+        try:
+            if kind == 'cluster':
+                cluster = eks_client.describe_cluster(name=cluster_name)['cluster']
+                cluster['nodegroups'] = list(eks_client.list_nodegroups(clusterName=cluster_name).get('nodegroups', []))
+                with self._lock:
+                    self.nodegroups[cluster_name].update(cluster['nodegroups'])
+                return {self._key(cluster_name, 'cluster', cluster_name): cluster}
+            if kind == 'nodegroup':
+                nodegroup = eks_client.describe_nodegroup(clusterName=cluster_name, nodegroupName=name)['nodegroup']
+                return {self._key(cluster_name, 'nodegroup', name): nodegroup}
+            addon = eks_client.describe_addon(clusterName=cluster_name, addonName=name)['addon']
+            return {self._key(cluster_name, 'addon', name): addon}
+        except eks_client.exceptions.ResourceNotFoundException:
+            return {}
+
+    # Diffing
+
+    @staticmethod
+    def _key(cluster_name, kind, resource_id):
+        return f"{cluster_name}/{kind}/{resource_id}"
+
+    def _owned(self, probe):
+        """Keys of the resources a probe observed last time."""
+        kind, cluster_name, name = probe
+        if kind == 'network':
+            return {key for key, entry in self.resources.items()
+                    if entry['cluster'] == cluster_name and entry['kind'] in NETWORK_KINDS}
+        key = self._key(cluster_name, kind, name or cluster_name)
+        return {key} if key in self.resources else set()
+
+    def _changed(self, probe, observed):
+        """Keys whose hash differs from the recorded one, including resources that appeared or disappeared."""
+        hashes = {key: resource_hash(resource) for key, resource in observed.items()}
+        changed = {key for key, digest in hashes.items() if self.resources.get(key, {}).get('hash') != digest}
+        return changed | (self._owned(probe) - set(observed)), hashes
+
+    def _record(self, probe, key, resource, digest, emit):
+        """Update one resource's entry and return its event (None if nothing is emitted)."""
+        cluster_name = probe[1]
+        kind, resource_id = key.split('/')[1:3]
+        target = self.targets[cluster_name]
+        entry = self.resources.get(key)
+        event = {'cluster': cluster_name, 'region': target['region'], 'resource': kind, 'id': resource_id}
+        if resource is None:
+            if entry is None:
+                return None
+            del self.resources[key]
+            event.update(event='removed', name=entry.get('name'))
+        else:
+            name = _name_tag(resource) if kind in NETWORK_KINDS else resource_id
+            self.resources[key] = {'cluster': cluster_name, 'kind': kind, 'id': resource_id, 'name': name,
+                                   'hash': digest, 'record': _normalize(resource)}
+            if entry is None:
+                event.update(event='added', name=name)
+            else:
+                event.update(event='changed', name=name, changes=diff_records(entry['record'], resource))
+        return event if emit else None
+
+    def run_probe(self, probe):
+        """
+        Run one probe and return its drift events.
+
+        :param probe: (kind, cluster_name, name) tuple from probes().
+        :return: List of event dictionaries (empty on the probe's baseline run).
+        """
+        target = self.targets[probe[1]]
+        if probe[0] == 'network':
+            observed = self._network(target)
+            changed, hashes = self._changed(probe, observed)
+            if changed and probe in self.baselined:
+                # only what looks different is described again; its second answer decides
+                observed = dict({key: resource for key, resource in observed.items() if key not in changed},
+                                **self._redescribe(target, changed))
+                changed, hashes = self._changed(probe, observed)
+        else:
+            observed = self._eks(probe, target)
+            changed, hashes = self._changed(probe, observed)
+
+        with self._lock:
+            emit = probe in self.baselined
+            events = [event for event in (self._record(probe, key, observed.get(key), hashes.get(key), emit)
+                                          for key in sorted(changed)) if event]
+            self.baselined.add(probe)
+            self.last_run[probe] = time.monotonic()
+        return events
+
+    def _emit(self, events):
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        for event in events:
+            self.events.write(json.dumps(dict(event, at=stamp), sort_keys=True, default=str) + '\n')
+        self.events.flush()
+        self.stats['events'] += len(events)
+
+    def _save(self):
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, 'w') as state_file:
+            json.dump({'resources': self.resources, 'baselined': sorted(self.baselined, key=str)}, state_file,
+                      sort_keys=True, default=str)
+        os.replace(temporary, self.state_path)
+
+    def sweep(self):
+        """
+        Run the probes the budget allows and emit their events.
+
+        :return: List of events emitted.
+        """
+        calls_before = sum(counters['calls'] for counters in throttle_stats().values())
+        due = self._due()
+        events = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for probe, future in [(probe, pool.submit(self.run_probe, probe)) for probe in due]:
+                try:
+                    events += future.result()
+                except Exception as e:
+                    print(f"[⚠️] Drift probe {probe[0]} {probe[2] or probe[1]} failed: {e}", file=sys.stderr)
+        calls = sum(counters['calls'] for counters in throttle_stats().values()) - calls_before
+        # the estimate was taken up front; charge what the sweep really cost
+        self._credit -= calls
+        self.stats['sweeps'] += 1
+        self.stats['probes'] += len(due)
+        self.stats['calls'] += calls
+        self._emit(events)
+        if self.state_path and (events or due):
+            self._save()
+        return events
+
+    def run(self, iterations=None):
+        """
+        Sweep every interval seconds until interrupted (or for a number of sweeps).
+
+        :param iterations: Number of sweeps, or None to run until KeyboardInterrupt.
+        :return: The stats dictionary: sweeps, probes, calls, redescribed and events.
+        """
+        sweeps = 0
+        try:
+            while iterations is None or sweeps < iterations:
+                started = time.monotonic()
+                self.sweep()
+                sweeps += 1
+                if iterations is None or sweeps < iterations:
+                    time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
+        return self.stats
@@ -0,0 +1,981 @@
+import copy
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from fnmatch import fnmatch
+from urllib.parse import quote
+
+# Default simulated server latency in seconds, by operation-name prefix
+DEFAULT_LATENCY = {
+    'Describe': 0.04,
+    'Get': 0.03,
+    'List': 0.03,
+    'Create': 0.08,
+    'default': 0.05,
+}
+
+# Seconds (before time scaling) until a created resource leaves its pending state,
+# (*_update) until an updated one is ACTIVE again, or (*_deleted) until a deleted one is gone
+READY_DELAYS = {
+    'nat_gateway': 90,
+    'eks_cluster': 600,
+    'eks_nodegroup': 180,
+    'eks_addon': 45,
+    'eks_cluster_update': 1500,
+    'eks_nodegroup_config_update': 20,
+    'eks_nodegroup_version_update': 600,
+    'nat_gateway_deleted': 60,
+    'eks_cluster_deleted': 300,
+    'eks_nodegroup_deleted': 240,
+}
+
+ACCOUNT_ID = '123456789012'
+
+# Describe filters that match one ID field, as filter name -> resource key
+ID_FILTERS = {
+    'vpc-id': 'VpcId', 'subnet-id': 'SubnetId', 'allocation-id': 'AllocationId', 'route-table-id': 'RouteTableId',
+    'internet-gateway-id': 'InternetGatewayId', 'nat-gateway-id': 'NatGatewayId',
+}
+
+
+class FakeAwsError(Exception):
+    """An AWS error response the fake sends back instead of a result."""
+
+    def __init__(self, code, message='', status=400):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message or code
+        self.status = status
+
+
+class _ServerBucket:
+    """Non-blocking token bucket: take() says whether the server accepts one more request."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def _tags(tag_specifications, resource_type):
+    for specification in tag_specifications or []:
+        if specification.get('ResourceType') == resource_type:
+            return [dict(tag) for tag in specification.get('Tags', [])]
+    return []
+
+
+def _matches(resource, filters):
+    for resource_filter in filters or []:
+        name, values = resource_filter['Name'], resource_filter['Values']
+        if name.startswith('tag:'):
+            tag_values = [tag['Value'] for tag in resource.get('Tags', []) if tag['Key'] == name[4:]]
+            if not any(fnmatch(tag_value, value) for tag_value in tag_values for value in values):
+                return False
+        elif name == 'tag-key':
+            if not any(tag['Key'] in values for tag in resource.get('Tags', [])):
+                return False
+        elif name == 'attachment.vpc-id':
+            if not any(attachment['VpcId'] in values for attachment in resource.get('Attachments', [])):
+                return False
+        elif name == 'association.subnet-id':
+            if not any(association.get('SubnetId') in values for association in resource.get('Associations', [])):
+                return False
+        elif name == 'association.main':
+            if not any(str(association.get('Main', False)).lower() in values
+                       for association in resource.get('Associations', [])):
+                return False
+        elif name in ID_FILTERS:
+            if resource.get(ID_FILTERS[name]) not in values:
+                return False
+        elif name == 'launch-template-name':
+            if not any(fnmatch(resource.get('LaunchTemplateName', ''), value) for value in values):
+                return False
+        elif name == 'state':
+            if resource.get('State') not in values:
+                return False
+        elif name == 'status-code':
+            if resource.get('Status', {}).get('Code') not in values:
+                return False
+        else:
+            raise FakeAwsError('InvalidParameterValue', f"The filter '{name}' is not supported by the fake.")
+    return True
+
+
+def _public(resource):
+    """Copy of a stored resource without the fake's bookkeeping keys."""
+    return {key: copy.deepcopy(value) for key, value in resource.items() if not key.startswith('_')}
+
+
+class FakeAws:
+    """
+    In-process stand-in for the EC2, EKS, IAM and STS calls the build and teardown scripts make.
+
+    install() hooks a boto3 session so every client created from it is answered
+    locally from a before-call handler: parameters are still validated by botocore and
+    errors still come back as the client's modeled exceptions, but nothing leaves the
+    process. Each call sleeps for a simulated latency, may be throttled by a server-side
+    rate limit, and newly created resources can stay invisible to describe calls for a
+    while (eventual consistency). NAT gateways, clusters, node groups and add-ons become ready,
+    and after a delete call are gone, after READY_DELAYS scaled by time_scale. Deletes
+    fail with DependencyViolation (or the service's equivalent) while something still
+    uses the resource, as they do on AWS. EKS update calls return an update that
+    describe_update follows from InProgress to Successful (or Failed, for the types in
+    failed_updates, with the resource's old settings back).
+
+    :param latency: Seconds per operation name or name prefix, overriding DEFAULT_LATENCY.
+    :param time_scale: Factor applied to READY_DELAYS (0.01 turns a 600 s cluster into 6 s).
+    :param rate_limits: Server-side limits as service -> (requests per second, burst); unlimited if absent.
+    :param consistency_delay: Seconds a created resource stays invisible to describe calls.
+    :param ready_delays: Overrides for READY_DELAYS (unscaled seconds).
+    :param status_lag: Seconds an updated cluster, node group or add-on still reads ACTIVE
+                       before its status turns UPDATING.
+    :param failed_updates: Update types ('VersionUpdate', 'ConfigUpdate', 'AddonUpdate') that end Failed.
+    """
+
+    def __init__(self, latency=None, time_scale=0.01, rate_limits=None, consistency_delay=0.0, ready_delays=None,
+                 status_lag=0.0, failed_updates=()):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.time_scale = time_scale
+        self.consistency_delay = consistency_delay
+        self.status_lag = status_lag
+        self.failed_updates = set(failed_updates)
+        self.ready_delays = dict(READY_DELAYS, **(ready_delays or {}))
+        self._buckets = {service: _ServerBucket(rate, burst) for service, (rate, burst) in (rate_limits or {}).items()}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.in_flight = 0
+        self.peak_concurrency = 0
+        # region -> kind -> id -> resource; IAM roles live under region None
+        self.regions = {}
+        self._handlers = {
+            'ec2': {
+                'DescribeVpcs': self._describer('vpcs', 'Vpcs', 'VpcIds', 'InvalidVpcID.NotFound'),
+                'DescribeSubnets': self._describer('subnets', 'Subnets', 'SubnetIds', 'InvalidSubnetID.NotFound'),
+                'DescribeInternetGateways': self._describer('internet_gateways', 'InternetGateways', 'InternetGatewayIds',
+                                                            'InvalidInternetGatewayID.NotFound'),
+                'DescribeRouteTables': self._describer('route_tables', 'RouteTables', 'RouteTableIds',
+                                                       'InvalidRouteTableID.NotFound'),
+                'DescribeNatGateways': self._describer('nat_gateways', 'NatGateways', 'NatGatewayIds',
+                                                       'NatGatewayNotFound'),
+                'DescribeVpcPeeringConnections': self._describer('vpc_peering_connections', 'VpcPeeringConnections',
+                                                                  'VpcPeeringConnectionIds', None),
+                'DescribeAvailabilityZones': self._describe_availability_zones,
+                'DescribeAddresses': self._describer('addresses', 'Addresses', 'AllocationIds',
+                                                     'InvalidAllocationID.NotFound'),
+                'DescribeLaunchTemplates': self._describe_launch_templates,
+                'DescribeLaunchTemplateVersions': self._describe_launch_template_versions,
+                'CreateVpc': self._create_vpc,
+                'CreateSubnet': self._create_subnet,
+                'ModifySubnetAttribute': lambda region, params: {},
+                'CreateInternetGateway': self._create_internet_gateway,
+                'AttachInternetGateway': self._attach_internet_gateway,
+                'CreateTags': self._create_tags,
+                'CreateRouteTable': self._create_route_table,
+                'AssociateRouteTable': self._associate_route_table,
+                'ReplaceRouteTableAssociation': self._replace_route_table_association,
+                'CreateRoute': self._create_route,
+                'ReplaceRoute': self._replace_route,
+                'AllocateAddress': self._allocate_address,
+                'CreateNatGateway': self._create_nat_gateway,
+                'DeleteNatGateway': self._delete_nat_gateway,
+                'ReleaseAddress': self._release_address,
+                'DeleteRoute': self._delete_route,
+                'DisassociateRouteTable': self._disassociate_route_table,
+                'DeleteRouteTable': self._delete_route_table,
+                'DetachInternetGateway': self._detach_internet_gateway,
+                'DeleteInternetGateway': self._delete_internet_gateway,
+                'DeleteSubnet': self._delete_subnet,
+                'DeleteVpc': self._delete_vpc,
+                'CreateLaunchTemplate': self._create_launch_template,
+                'CreateLaunchTemplateVersion': self._create_launch_template_version,
+                'DeleteLaunchTemplate': self._delete_launch_template,
+            },
+            'iam': {
+                'CreateRole': self._create_role,
+                'GetRole': self._get_role,
+                'AttachRolePolicy': self._attach_role_policy,
+                'ListAttachedRolePolicies': self._list_attached_role_policies,
+                'TagRole': self._tag_role,
+                'UpdateAssumeRolePolicy': self._update_assume_role_policy,
+                'DetachRolePolicy': self._detach_role_policy,
+                'ListRolePolicies': self._list_role_policies,
+                'DeleteRolePolicy': self._delete_role_policy,
+                'DeleteRole': self._delete_role,
+            },
+            'sts': {
+                'GetCallerIdentity': lambda region, params: {
+                    'Account': ACCOUNT_ID, 'Arn': f"arn:aws:iam::{ACCOUNT_ID}:user/benchmark", 'UserId': 'AIDABENCHMARK'},
+            },
+            'eks': {
+                'CreateCluster': self._create_cluster,
+                'DescribeCluster': self._describe_cluster,
+                'CreateNodegroup': self._create_nodegroup,
+                'DescribeNodegroup': self._describe_nodegroup,
+                'ListNodegroups': self._list_nodegroups,
+                'DeleteNodegroup': self._delete_nodegroup,
+                'UpdateClusterVersion': self._update_cluster_version,
+                'UpdateNodegroupConfig': self._update_nodegroup_config,
+                'UpdateNodegroupVersion': self._update_nodegroup_version,
+                'DescribeUpdate': self._describe_update,
+                'DeleteCluster': self._delete_cluster,
+                'CreateAddon': self._create_addon,
+                'DescribeAddon': self._describe_addon,
+                'UpdateAddon': self._update_addon,
+            },
+        }
+
+    # Wiring into botocore
+
+    def install(self, session):
+        """
+        Answer every API call of clients created from a boto3 session from now on.
+
+        The handler is registered last on before-call, so the rate limiter and tracer
+        hooks that get_client() adds still run first.
+
+        :param session: boto3.session.Session (see functions.clients.get_session()).
+        """
+        session.events.register('before-parameter-build', self._stash_params)
+        session.events.register_last('before-call', self._answer)
+
+    @staticmethod
+    def _stash_params(params, context, **kwargs):
+        context['fake_params'] = copy.deepcopy(params)
+
+    def _answer(self, model, context, **kwargs):
+        from botocore.awsrequest import AWSResponse
+
+        service = model.service_model.service_name
+        region = context.get('client_region') if service not in ('iam', 'sts') else None
+        params = context.get('fake_params', {})
+        with self._stats_lock:
+            self.calls[f"{service}.{model.name}"] += 1
+            self.in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.in_flight)
+        try:
+            time.sleep(self._latency(model.name))
+            bucket = self._buckets.get(service)
+            if bucket and not bucket.take():
+                with self._stats_lock:
+                    self.throttled[f"{service}.{model.name}"] += 1
+                raise FakeAwsError('RequestLimitExceeded' if service == 'ec2' else 'ThrottlingException',
+                                   'Rate exceeded', 400 if service == 'ec2' else 429)
+            handler = self._handlers.get(service, {}).get(model.name)
+            if handler is None:
+                raise FakeAwsError('UnsupportedOperation', f"{service}.{model.name} is not simulated.")
+            with self._lock:
+                result = handler(region, params)
+            status, parsed = 200, result
+        except FakeAwsError as e:
+            status, parsed = e.status, {'Error': {'Code': e.code, 'Message': e.message}}
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+        parsed['ResponseMetadata'] = {'HTTPStatusCode': status, 'RequestId': f"fake-{next(self._ids)}"}
+        return AWSResponse(f"https://{service}.fake.local/", status, {}, None), parsed
+
+    def _latency(self, operation):
+        if operation in self.latency:
+            return self.latency[operation]
+        for prefix, seconds in self.latency.items():
+            if operation.startswith(prefix):
+                return seconds
+        return self.latency['default']
+
+    def stats(self):
+        """
+        Report what the fake served.
+
+        :return: Dictionary with 'calls' ('service.Operation' -> count), 'total_calls',
+                 'mutating_calls', 'throttled' and 'peak_concurrency'.
+        """
+        with self._stats_lock:
+            calls = dict(sorted(self.calls.items()))
+            return {
+                'calls': calls,
+                'total_calls': sum(calls.values()),
+                'mutating_calls': sum(count for name, count in calls.items()
+                                      if not name.split('.', 1)[1].startswith(('Describe', 'Get', 'List'))),
+                'throttled': sum(self.throttled.values()),
+                'peak_concurrency': self.peak_concurrency,
+            }
+
+    def reset_stats(self):
+        """Zero the counters; the simulated resources stay."""
+        with self._stats_lock:
+            self.calls.clear()
+            self.throttled.clear()
+            self.peak_concurrency = self.in_flight
+
+    # State helpers
+
+    def _store(self, region, kind):
+        return self.regions.setdefault(region, {}).setdefault(kind, {})
+
+    def _new_id(self, prefix):
+        return f"{prefix}-{next(self._ids):017x}"
+
+    def _add(self, region, kind, resource_id, resource):
+        resource['_visible_at'] = time.monotonic() + self.consistency_delay
+        self._store(region, kind)[resource_id] = resource
+        return resource
+
+    def _find(self, region, kind, resource_id, error_code):
+        resource = self._store(region, kind).get(resource_id)
+        if resource is None:
+            raise FakeAwsError(error_code, f"The ID '{resource_id}' does not exist")
+        return resource
+
+    def _describer(self, kind, result_key, id_key, not_found_code):
+        def describe(region, params):
+            now = time.monotonic()
+            resources = self._store(region, kind)
+            if params.get(id_key):
+                missing = [resource_id for resource_id in params[id_key]
+                           if resource_id not in resources or resources[resource_id]['_visible_at'] > now]
+                if missing and not_found_code:
+                    raise FakeAwsError(not_found_code, f"{', '.join(missing)} not found")
+                selected = [resources[resource_id] for resource_id in params[id_key] if resource_id not in missing]
+            else:
+                selected = [resource for resource in resources.values() if resource['_visible_at'] <= now]
+            filters = params.get('Filters') or params.get('Filter')
+            matched = [resource for resource in selected if _matches(resource, filters)]
+            response = {}
+            if params.get('MaxResults'):
+                # Page like EC2: NextToken is the offset of the next page
+                start = int(params.get('NextToken') or 0)
+                end = start + params['MaxResults']
+                if end < len(matched):
+                    response['NextToken'] = str(end)
+                matched = matched[start:end]
+            response[result_key] = [_public(self._refresh(resource)) for resource in matched]
+            return response
+        return describe
+
+    def _refresh(self, resource):
+        """Move a pending resource to its ready state once its ready time has passed."""
+        now = time.monotonic()
+        if '_updating_at' in resource and now >= resource['_updating_at']:
+            resource['status'] = 'UPDATING'
+            del resource['_updating_at']
+        if '_ready_at' in resource and now >= resource['_ready_at']:
+            state_key, ready_state = resource.pop('_ready_state')
+            resource[state_key] = ready_state
+            del resource['_ready_at']
+            if '_on_ready' in resource:
+                resource.pop('_on_ready')()
+        return resource
+
+    def _pending(self, resource, kind, state_key, ready_state):
+        resource['_ready_at'] = time.monotonic() + self.ready_delays[kind] * self.time_scale
+        resource['_ready_state'] = (state_key, ready_state)
+
+    # EC2
+
+    @staticmethod
+    def _describe_availability_zones(region, params):
+        return {'AvailabilityZones': [{'ZoneName': f"{region}{letter}", 'ZoneId': f"use1-az{number}", 'State': 'available',
+                                       'RegionName': region, 'ZoneType': 'availability-zone'}
+                                      for number, letter in enumerate('abcdef', start=1)]}
+
+    def _create_vpc(self, region, params):
+        vpc_id = self._new_id('vpc')
+        vpc = self._add(region, 'vpcs', vpc_id, {
+            'VpcId': vpc_id, 'CidrBlock': params['CidrBlock'], 'State': 'available',
+            'CidrBlockAssociationSet': [{'AssociationId': self._new_id('vpc-cidr-assoc'), 'CidrBlock': params['CidrBlock'],
+                                         'CidrBlockState': {'State': 'associated'}}],
+            'Tags': _tags(params.get('TagSpecifications'), 'vpc'),
+        })
+        route_table_id = self._new_id('rtb')
+        self._add(region, 'route_tables', route_table_id, {
+            'RouteTableId': route_table_id, 'VpcId': vpc_id, 'Tags': [],
+            'Associations': [{'Main': True, 'RouteTableAssociationId': self._new_id('rtbassoc'),
+                              'RouteTableId': route_table_id}],
+            'Routes': [{'DestinationCidrBlock': params['CidrBlock'], 'GatewayId': 'local', 'State': 'active'}],
+        })
+        return {'Vpc': _public(vpc)}
+
+    def _create_subnet(self, region, params):
+        self._find(region, 'vpcs', params['VpcId'], 'InvalidVpcID.NotFound')
+        subnet_id = self._new_id('subnet')
+        subnet = self._add(region, 'subnets', subnet_id, {
+            'SubnetId': subnet_id, 'VpcId': params['VpcId'], 'CidrBlock': params['CidrBlock'],
+            'AvailabilityZone': params.get('AvailabilityZone'), 'State': 'available',
+            'Tags': _tags(params.get('TagSpecifications'), 'subnet'),
+        })
+        return {'Subnet': _public(subnet)}
+
+    def _create_internet_gateway(self, region, params):
+        internet_gateway_id = self._new_id('igw')
+        internet_gateway = self._add(region, 'internet_gateways', internet_gateway_id, {
+            'InternetGatewayId': internet_gateway_id, 'Attachments': [],
+            'Tags': _tags(params.get('TagSpecifications'), 'internet-gateway'),
+        })
+        return {'InternetGateway': _public(internet_gateway)}
+
+    def _attach_internet_gateway(self, region, params):
+        internet_gateway = self._find(region, 'internet_gateways', params['InternetGatewayId'],
+                                      'InvalidInternetGatewayID.NotFound')
+        if internet_gateway['Attachments']:
+            raise FakeAwsError('Resource.AlreadyAssociated', 'The internet gateway is already attached.')
+        internet_gateway['Attachments'].append({'VpcId': params['VpcId'], 'State': 'available'})
+        return {}
+
+    def _create_tags(self, region, params):
+        for resource_id in params['Resources']:
+            resource = next((resources[resource_id] for resources in self.regions.get(region, {}).values()
+                             if resource_id in resources), None)
+            if resource is None:
+                raise FakeAwsError('InvalidID', f"The ID '{resource_id}' is not valid")
+            tags = {tag['Key']: tag['Value'] for tag in resource.get('Tags', [])}
+            tags.update({tag['Key']: tag.get('Value', '') for tag in params['Tags']})
+            resource['Tags'] = [{'Key': key, 'Value': value} for key, value in tags.items()]
+        return {}
+
+    def _create_route_table(self, region, params):
+        route_table_id = self._new_id('rtb')
+        route_table = self._add(region, 'route_tables', route_table_id, {
+            'RouteTableId': route_table_id, 'VpcId': params['VpcId'], 'Associations': [], 'Routes': [],
+            'Tags': _tags(params.get('TagSpecifications'), 'route-table'),
+        })
+        return {'RouteTable': _public(route_table)}
+
+    def _associate_route_table(self, region, params):
+        route_table = self._find(region, 'route_tables', params['RouteTableId'], 'InvalidRouteTableID.NotFound')
+        for other in self._store(region, 'route_tables').values():
+            if any(association.get('SubnetId') == params['SubnetId'] for association in other['Associations']):
+                raise FakeAwsError('Resource.AlreadyAssociated',
+                                   f"the specified association for route table {other['RouteTableId']} conflicts")
+        association_id = self._new_id('rtbassoc')
+        route_table['Associations'].append({'RouteTableAssociationId': association_id, 'Main': False,
+                                            'RouteTableId': params['RouteTableId'], 'SubnetId': params['SubnetId']})
+        return {'AssociationId': association_id}
+
+    def _replace_route_table_association(self, region, params):
+        route_table = self._find(region, 'route_tables', params['RouteTableId'], 'InvalidRouteTableID.NotFound')
+        for other in self._store(region, 'route_tables').values():
+            for association in list(other['Associations']):
+                if association['RouteTableAssociationId'] == params['AssociationId']:
+                    other['Associations'].remove(association)
+                    association_id = self._new_id('rtbassoc')
+                    route_table['Associations'].append(dict(association, RouteTableAssociationId=association_id,
+                                                            RouteTableId=params['RouteTableId']))
+                    return {'NewAssociationId': association_id}
+        raise FakeAwsError('InvalidAssociationID.NotFound', f"{params['AssociationId']} not found")
+
+    def _create_route(self, region, params):
+        route_table = self._find(region, 'route_tables', params['RouteTableId'], 'InvalidRouteTableID.NotFound')
+        if any(route.get('DestinationCidrBlock') == params['DestinationCidrBlock'] for route in route_table['Routes']):
+            raise FakeAwsError('RouteAlreadyExists', f"The route identified by {params['DestinationCidrBlock']} already exists.")
+        route = {key: value for key, value in params.items() if key not in ('RouteTableId', 'DryRun')}
+        route_table['Routes'].append(dict(route, State='active'))
+        return {'Return': True}
+
+    def _replace_route(self, region, params):
+        route_table = self._find(region, 'route_tables', params['RouteTableId'], 'InvalidRouteTableID.NotFound')
+        kept = [route for route in route_table['Routes'] if route.get('DestinationCidrBlock') != params['DestinationCidrBlock']]
+        if len(kept) == len(route_table['Routes']):
+            raise FakeAwsError('InvalidRoute.NotFound', f"No route with destination {params['DestinationCidrBlock']}.")
+        route = {key: value for key, value in params.items() if key not in ('RouteTableId', 'DryRun')}
+        route_table['Routes'] = kept + [dict(route, State='active')]
+        return {}
+
+    def _allocate_address(self, region, params):
+        allocation_id = self._new_id('eipalloc')
+        address = self._add(region, 'addresses', allocation_id, {
+            'AllocationId': allocation_id, 'PublicIp': f"198.51.100.{len(self._store(region, 'addresses')) + 1}",
+            'Domain': 'vpc', 'Tags': _tags(params.get('TagSpecifications'), 'elastic-ip'),
+        })
+        return _public(address)
+
+    def _create_nat_gateway(self, region, params):
+        subnet = self._find(region, 'subnets', params['SubnetId'], 'InvalidSubnetID.NotFound')
+        nat_gateway_id = self._new_id('nat')
+        nat_gateway = self._add(region, 'nat_gateways', nat_gateway_id, {
+            'NatGatewayId': nat_gateway_id, 'SubnetId': subnet['SubnetId'], 'VpcId': subnet['VpcId'],
+            'State': 'pending', 'NatGatewayAddresses': [{'AllocationId': params.get('AllocationId')}],
+            'Tags': _tags(params.get('TagSpecifications'), 'natgateway'),
+        })
+        self._pending(nat_gateway, 'nat_gateway', 'State', 'available')
+        return {'NatGateway': _public(nat_gateway)}
+
+    def _in_use(self, region, subnet_ids):
+        """Describe what still holds addresses in any of the subnets, or None."""
+        for nat_gateway in self._store(region, 'nat_gateways').values():
+            if nat_gateway['SubnetId'] in subnet_ids and self._refresh(nat_gateway)['State'] != 'deleted':
+                return f"NAT gateway {nat_gateway['NatGatewayId']}"
+        for cluster in list(self._store(region, 'clusters').values()):
+            if self._live(region, 'clusters', cluster['name']) and \
+                    set(cluster['resourcesVpcConfig'].get('subnetIds', [])) & set(subnet_ids):
+                return f"cluster {cluster['name']}"
+        for key in list(self._store(region, 'nodegroups')):
+            nodegroup = self._live(region, 'nodegroups', key)
+            if nodegroup and set(nodegroup['subnets']) & set(subnet_ids):
+                return f"node group {key}"
+        return None
+
+    def _delete_nat_gateway(self, region, params):
+        nat_gateway = self._store(region, 'nat_gateways').get(params['NatGatewayId'])
+        if nat_gateway is None or self._refresh(nat_gateway)['State'] == 'deleted':
+            raise FakeAwsError('NatGatewayNotFound', f"NAT gateway {params['NatGatewayId']} was not found")
+        if nat_gateway['State'] != 'deleting':
+            nat_gateway['State'] = 'deleting'
+            self._pending(nat_gateway, 'nat_gateway_deleted', 'State', 'deleted')
+        return {'NatGatewayId': params['NatGatewayId']}
+
+    def _release_address(self, region, params):
+        self._find(region, 'addresses', params['AllocationId'], 'InvalidAllocationID.NotFound')
+        for nat_gateway in self._store(region, 'nat_gateways').values():
+            if self._refresh(nat_gateway)['State'] != 'deleted' and any(
+                    address.get('AllocationId') == params['AllocationId'] for address in nat_gateway['NatGatewayAddresses']):
+                raise FakeAwsError('InvalidIPAddress.InUse', f"Address {params['AllocationId']} is in use.")
+        del self._store(region, 'addresses')[params['AllocationId']]
+        return {}
+
+    def _delete_route(self, region, params):
+        route_table = self._find(region, 'route_tables', params['RouteTableId'], 'InvalidRouteTableID.NotFound')
+        kept = [route for route in route_table['Routes'] if route.get('DestinationCidrBlock') != params['DestinationCidrBlock']]
+        if len(kept) == len(route_table['Routes']):
+            raise FakeAwsError('InvalidRoute.NotFound', f"No route with destination {params['DestinationCidrBlock']}.")
+        route_table['Routes'] = kept
+        return {}
+
+    def _disassociate_route_table(self, region, params):
+        for route_table in self._store(region, 'route_tables').values():
+            for association in route_table['Associations']:
+                if association['RouteTableAssociationId'] == params['AssociationId'] and not association.get('Main'):
+                    route_table['Associations'].remove(association)
+                    return {}
+        raise FakeAwsError('InvalidAssociationID.NotFound', f"{params['AssociationId']} not found")
+
+    def _delete_route_table(self, region, params):
+        route_table = self._find(region, 'route_tables', params['RouteTableId'], 'InvalidRouteTableID.NotFound')
+        if route_table['Associations']:
+            raise FakeAwsError('DependencyViolation', f"The routeTable '{params['RouteTableId']}' has dependencies "
+                                                      f"and cannot be deleted.")
+        del self._store(region, 'route_tables')[params['RouteTableId']]
+        return {}
+
+    def _detach_internet_gateway(self, region, params):
+        internet_gateway = self._find(region, 'internet_gateways', params['InternetGatewayId'],
+                                      'InvalidInternetGatewayID.NotFound')
+        if not any(attachment['VpcId'] == params['VpcId'] for attachment in internet_gateway['Attachments']):
+            raise FakeAwsError('Gateway.NotAttached', f"resource {params['InternetGatewayId']} is not attached to network "
+                                                      f"{params['VpcId']}")
+        subnet_ids = [subnet['SubnetId'] for subnet in self._store(region, 'subnets').values()
+                      if subnet['VpcId'] == params['VpcId']]
+        user = self._in_use(region, subnet_ids)
+        if user:
+            raise FakeAwsError('DependencyViolation', f"Network {params['VpcId']} has some mapped public address(es) "
+                                                      f"({user}).")
+        internet_gateway['Attachments'] = []
+        return {}
+
+    def _delete_internet_gateway(self, region, params):
+        internet_gateway = self._find(region, 'internet_gateways', params['InternetGatewayId'],
+                                      'InvalidInternetGatewayID.NotFound')
+        if internet_gateway['Attachments']:
+            raise FakeAwsError('DependencyViolation', f"The internetGateway '{params['InternetGatewayId']}' has "
+                                                      f"dependencies and cannot be deleted.")
+        del self._store(region, 'internet_gateways')[params['InternetGatewayId']]
+        return {}
+
+    def _delete_subnet(self, region, params):
+        self._find(region, 'subnets', params['SubnetId'], 'InvalidSubnetID.NotFound')
+        user = self._in_use(region, [params['SubnetId']])
+        if user:
+            raise FakeAwsError('DependencyViolation', f"The subnet '{params['SubnetId']}' has dependencies ({user}) "
+                                                      f"and cannot be deleted.")
+        del self._store(region, 'subnets')[params['SubnetId']]
+        # Like EC2, deleting a subnet drops its route table association
+        for route_table in self._store(region, 'route_tables').values():
+            route_table['Associations'] = [association for association in route_table['Associations']
+                                           if association.get('SubnetId') != params['SubnetId']]
+        return {}
+
+    def _delete_vpc(self, region, params):
+        self._find(region, 'vpcs', params['VpcId'], 'InvalidVpcID.NotFound')
+        route_tables = self._store(region, 'route_tables')
+        blocking = [subnet_id for subnet_id, subnet in self._store(region, 'subnets').items()
+                    if subnet['VpcId'] == params['VpcId']]
+        blocking += [internet_gateway_id for internet_gateway_id, internet_gateway
+                     in self._store(region, 'internet_gateways').items()
+                     if any(attachment['VpcId'] == params['VpcId'] for attachment in internet_gateway['Attachments'])]
+        blocking += [route_table_id for route_table_id, route_table in route_tables.items()
+                     if route_table['VpcId'] == params['VpcId']
+                     and not any(association.get('Main') for association in route_table['Associations'])]
+        if blocking:
+            raise FakeAwsError('DependencyViolation', f"The vpc '{params['VpcId']}' has dependencies and cannot be "
+                                                      f"deleted ({', '.join(blocking)}).")
+        del self._store(region, 'vpcs')[params['VpcId']]
+        for route_table_id in [route_table_id for route_table_id, route_table in route_tables.items()
+                               if route_table['VpcId'] == params['VpcId']]:
+            del route_tables[route_table_id]
+        return {}
+
+    def _launch_template(self, region, params):
+        if params.get('LaunchTemplateId'):
+            return self._find(region, 'launch_templates', params['LaunchTemplateId'], 'InvalidLaunchTemplateId.NotFound')
+        for launch_template in self._store(region, 'launch_templates').values():
+            if launch_template['LaunchTemplateName'] == params.get('LaunchTemplateName'):
+                return launch_template
+        raise FakeAwsError('InvalidLaunchTemplateName.NotFoundException',
+                           f"The specified launch template, with template name {params.get('LaunchTemplateName')}, "
+                           "does not exist.")
+
+    def _describe_launch_templates(self, region, params):
+        if params.get('LaunchTemplateNames'):
+            params = dict(params, LaunchTemplateIds=[
+                self._launch_template(region, {'LaunchTemplateName': name})['LaunchTemplateId']
+                for name in params.pop('LaunchTemplateNames')])
+        return self._describer('launch_templates', 'LaunchTemplates', 'LaunchTemplateIds',
+                               'InvalidLaunchTemplateId.NotFound')(region, params)
+
+    def _create_launch_template(self, region, params):
+        if any(launch_template['LaunchTemplateName'] == params['LaunchTemplateName']
+               for launch_template in self._store(region, 'launch_templates').values()):
+            raise FakeAwsError('InvalidLaunchTemplateName.AlreadyExistsException',
+                               f"Launch template name already in use: {params['LaunchTemplateName']}")
+        launch_template_id = self._new_id('lt')
+        launch_template = self._add(region, 'launch_templates', launch_template_id, {
+            'LaunchTemplateId': launch_template_id, 'LaunchTemplateName': params['LaunchTemplateName'],
+            'DefaultVersionNumber': 1, 'LatestVersionNumber': 1,
+            'Tags': _tags(params.get('TagSpecifications'), 'launch-template'),
+            '_versions': [copy.deepcopy(params['LaunchTemplateData'])],
+        })
+        return {'LaunchTemplate': _public(launch_template)}
+
+    def _create_launch_template_version(self, region, params):
+        launch_template = self._launch_template(region, params)
+        launch_template['_versions'].append(copy.deepcopy(params['LaunchTemplateData']))
+        launch_template['LatestVersionNumber'] = len(launch_template['_versions'])
+        return {'LaunchTemplateVersion': {
+            'LaunchTemplateId': launch_template['LaunchTemplateId'],
+            'LaunchTemplateName': launch_template['LaunchTemplateName'],
+            'VersionNumber': launch_template['LatestVersionNumber'], 'DefaultVersion': False,
+            'LaunchTemplateData': copy.deepcopy(params['LaunchTemplateData'])}}
+
+    def _describe_launch_template_versions(self, region, params):
+        launch_template = self._launch_template(region, params)
+        numbers = {'$Latest': launch_template['LatestVersionNumber'], '$Default': launch_template['DefaultVersionNumber']}
+        versions = []
+        for version in params.get('Versions') or [str(number) for number in range(1, len(launch_template['_versions']) + 1)]:
+            number = numbers.get(version) or int(version)
+            if not 1 <= number <= len(launch_template['_versions']):
+                raise FakeAwsError('InvalidLaunchTemplateId.VersionNotFound', f"Version {version} does not exist.")
+            versions.append({
+                'LaunchTemplateId': launch_template['LaunchTemplateId'],
+                'LaunchTemplateName': launch_template['LaunchTemplateName'], 'VersionNumber': number,
+                'DefaultVersion': number == launch_template['DefaultVersionNumber'],
+                'LaunchTemplateData': copy.deepcopy(launch_template['_versions'][number - 1])})
+        return {'LaunchTemplateVersions': versions}
+
+    def _delete_launch_template(self, region, params):
+        launch_template = self._launch_template(region, params)
+        del self._store(region, 'launch_templates')[launch_template['LaunchTemplateId']]
+        return {'LaunchTemplate': _public(launch_template)}
+
+    # IAM
+
+    def _role(self, params):
+        role = self._store(None, 'roles').get(params['RoleName'])
+        if role is None:
+            raise FakeAwsError('NoSuchEntity', f"The role with name {params['RoleName']} cannot be found.", 404)
+        return role
+
+    def _create_role(self, region, params):
+        roles = self._store(None, 'roles')
+        if params['RoleName'] in roles:
+            raise FakeAwsError('EntityAlreadyExists', f"Role with name {params['RoleName']} already exists.", 409)
+        role = self._add(None, 'roles', params['RoleName'], {
+            'RoleName': params['RoleName'], 'Path': '/', 'RoleId': self._new_id('AROA').upper(),
+            'Arn': f"arn:aws:iam::{ACCOUNT_ID}:role/{params['RoleName']}",
+            'AssumeRolePolicyDocument': json.loads(params['AssumeRolePolicyDocument']),
+            'Tags': [dict(tag) for tag in params.get('Tags', [])], '_policies': [],
+        })
+        return {'Role': self._role_response(role)}
+
+    @staticmethod
+    def _role_response(role):
+        # IAM returns policy documents URL-encoded; botocore decodes them in an after-call handler
+        response = _public(role)
+        response['AssumeRolePolicyDocument'] = quote(json.dumps(response['AssumeRolePolicyDocument']))
+        return response
+
+    def _get_role(self, region, params):
+        return {'Role': self._role_response(self._role(params))}
+
+    def _attach_role_policy(self, region, params):
+        role = self._role(params)
+        if params['PolicyArn'] not in role['_policies']:
+            role['_policies'].append(params['PolicyArn'])
+        return {}
+
+    def _list_attached_role_policies(self, region, params):
+        return {'AttachedPolicies': [{'PolicyArn': arn, 'PolicyName': arn.rsplit('/', 1)[-1]}
+                                     for arn in self._role(params)['_policies']], 'IsTruncated': False}
+
+    def _tag_role(self, region, params):
+        role = self._role(params)
+        tags = {tag['Key']: tag['Value'] for tag in role['Tags']}
+        tags.update({tag['Key']: tag['Value'] for tag in params['Tags']})
+        role['Tags'] = [{'Key': key, 'Value': value} for key, value in tags.items()]
+        return {}
+
+    def _update_assume_role_policy(self, region, params):
+        self._role(params)['AssumeRolePolicyDocument'] = json.loads(params['PolicyDocument'])
+        return {}
+
+    def _detach_role_policy(self, region, params):
+        role = self._role(params)
+        if params['PolicyArn'] not in role['_policies']:
+            raise FakeAwsError('NoSuchEntity', f"Policy {params['PolicyArn']} was not found.", 404)
+        role['_policies'].remove(params['PolicyArn'])
+        return {}
+
+    def _list_role_policies(self, region, params):
+        return {'PolicyNames': sorted(self._role(params).get('_inline', {})), 'IsTruncated': False}
+
+    def _delete_role_policy(self, region, params):
+        inline = self._role(params).get('_inline', {})
+        if inline.pop(params['PolicyName'], None) is None:
+            raise FakeAwsError('NoSuchEntity', f"The role policy with name {params['PolicyName']} cannot be found.", 404)
+        return {}
+
+    def _delete_role(self, region, params):
+        role = self._role(params)
+        if role['_policies'] or role.get('_inline'):
+            raise FakeAwsError('DeleteConflict', 'Cannot delete entity, must detach all policies first.', 409)
+        del self._store(None, 'roles')[params['RoleName']]
+        return {}
+
+    # EKS
+
+    def _live(self, region, kind, key):
+        """A visible cluster or node group, or None; one whose deletion has finished is dropped."""
+        resource = self._store(region, kind).get(key)
+        if resource is None or resource['_visible_at'] > time.monotonic():
+            return None
+        if self._refresh(resource)['status'] == 'DELETED':
+            del self._store(region, kind)[key]
+            return None
+        return resource
+
+    def _cluster(self, region, name):
+        cluster = self._live(region, 'clusters', name)
+        if cluster is None:
+            raise FakeAwsError('ResourceNotFoundException', f"No cluster found for name: {name}.", 404)
+        return cluster
+
+    def _create_cluster(self, region, params):
+        if self._live(region, 'clusters', params['name']) or params['name'] in self._store(region, 'clusters'):
+            raise FakeAwsError('ResourceInUseException', f"Cluster already exists with name: {params['name']}", 409)
+        cluster = self._add(region, 'clusters', params['name'], {
+            'name': params['name'], 'arn': f"arn:aws:eks:{region}:{ACCOUNT_ID}:cluster/{params['name']}",
+            'version': params.get('version') or '1.29', 'roleArn': params['roleArn'], 'status': 'CREATING',
+            'resourcesVpcConfig': params['resourcesVpcConfig'],
+            'kubernetesNetworkConfig': params.get('kubernetesNetworkConfig', {}), 'tags': params.get('tags', {}),
+        })
+        self._pending(cluster, 'eks_cluster', 'status', 'ACTIVE')
+        return {'cluster': _public(cluster)}
+
+    def _describe_cluster(self, region, params):
+        return {'cluster': _public(self._cluster(region, params['name']))}
+
+    def _create_nodegroup(self, region, params):
+        cluster = self._cluster(region, params['clusterName'])
+        if cluster['status'] != 'ACTIVE':
+            raise FakeAwsError('ResourceInUseException', f"Cluster '{params['clusterName']}' is not ACTIVE.", 409)
+        nodegroups = self._store(region, 'nodegroups')
+        key = f"{params['clusterName']}/{params['nodegroupName']}"
+        if self._live(region, 'nodegroups', key) or key in nodegroups:
+            raise FakeAwsError('ResourceInUseException', f"NodeGroup already exists with name {params['nodegroupName']}", 409)
+        nodegroup = self._add(region, 'nodegroups', key, dict(
+            {name: value for name, value in params.items() if name != 'clientRequestToken'},
+            status='CREATING', version=cluster['version'],
+            nodegroupArn=f"arn:aws:eks:{region}:{ACCOUNT_ID}:nodegroup/{key}"))
+        self._pending(nodegroup, 'eks_nodegroup', 'status', 'ACTIVE')
+        return {'nodegroup': _public(nodegroup)}
+
+    def _nodegroup(self, region, params):
+        nodegroup = self._live(region, 'nodegroups', f"{params['clusterName']}/{params['nodegroupName']}")
+        if nodegroup is None:
+            raise FakeAwsError('ResourceNotFoundException', f"No node group found for name: {params['nodegroupName']}.", 404)
+        return nodegroup
+
+    def _describe_nodegroup(self, region, params):
+        return {'nodegroup': _public(self._nodegroup(region, params))}
+
+    def _list_nodegroups(self, region, params):
+        self._cluster(region, params['clusterName'])
+        prefix = f"{params['clusterName']}/"
+        return {'nodegroups': [key[len(prefix):] for key in list(self._store(region, 'nodegroups'))
+                               if key.startswith(prefix) and self._live(region, 'nodegroups', key)]}
+
+    def _start_update(self, region, resource, kind, update_type, changes):
+        """
+        Apply an update's changes and return the update, the way EKS reports it.
+
+        The resource turns UPDATING after status_lag seconds and ACTIVE again after the
+        READY_DELAYS of kind; meanwhile it refuses other updates. The update follows
+        with Successful, or with Failed and the old settings restored if its type is in
+        failed_updates.
+        """
+        failed = update_type in self.failed_updates
+        previous = {name: copy.deepcopy(resource.get(name)) for name in changes}
+        resource.update(changes)
+        if self.status_lag:
+            resource['_updating_at'] = time.monotonic() + self.status_lag
+        else:
+            resource['status'] = 'UPDATING'
+        self._pending(resource, kind, 'status', 'ACTIVE')
+        resource['_ready_at'] += self.status_lag
+        resource['_updating'] = True
+
+        update_id = self._new_id('update')
+        update = self._add(region, 'updates', update_id, {
+            'id': update_id, 'status': 'InProgress', 'type': update_type, 'errors': [], 'createdAt': time.time(),
+            'params': [{'type': name, 'value': json.dumps(value, sort_keys=True, default=str)}
+                       for name, value in changes.items()],
+        })
+        update['_ready_at'] = resource['_ready_at']
+        update['_ready_state'] = ('status', 'Failed' if failed else 'Successful')
+
+        def finish_resource():
+            resource.pop('_updating', None)
+            if failed:
+                resource.update(previous)
+
+        def finish_update():
+            if failed:
+                update['errors'] = [{'errorCode': 'Unknown', 'errorMessage': f"Simulated {update_type} failure.",
+                                     'resourceIds': [resource.get('nodegroupName') or resource.get('addonName')
+                                                     or resource.get('name')]}]
+            # both finish at the same time, whichever is described first
+            self._refresh(resource)
+
+        resource['_on_ready'] = finish_resource
+        update['_on_ready'] = finish_update
+        return {'update': _public(update)}
+
+    def _describe_update(self, region, params):
+        update = self._store(region, 'updates').get(params['updateId'])
+        if update is None or update['_visible_at'] > time.monotonic():
+            raise FakeAwsError('ResourceNotFoundException', f"No update found for ID: {params['updateId']}.", 404)
+        return {'update': _public(self._refresh(update))}
+
+    @staticmethod
+    def _check_updatable(resource, description):
+        if resource['status'] != 'ACTIVE' or resource.get('_updating'):
+            raise FakeAwsError('ResourceInUseException', f"{description} is {resource['status']} or has an update "
+                                                         f"in progress.", 409)
+
+    def _update_cluster_version(self, region, params):
+        cluster = self._cluster(region, params['name'])
+        self._check_updatable(cluster, f"Cluster {params['name']}")
+        major, minor = cluster['version'].split('.')
+        if params['version'] != f"{major}.{int(minor) + 1}":
+            raise FakeAwsError('InvalidParameterException', f"Unsupported Kubernetes minor version update from "
+                                                             f"{cluster['version']} to {params['version']}")
+        return self._start_update(region, cluster, 'eks_cluster_update', 'VersionUpdate', {'version': params['version']})
+
+    def _updatable_nodegroup(self, region, params):
+        nodegroup = self._nodegroup(region, params)
+        self._check_updatable(self._refresh(nodegroup), f"Nodegroup {params['nodegroupName']}")
+        return nodegroup
+
+    def _update_nodegroup_config(self, region, params):
+        nodegroup = self._updatable_nodegroup(region, params)
+        changes = {name: params[name] for name in ('scalingConfig', 'updateConfig') if name in params}
+        labels = dict(nodegroup.get('labels') or {}, **params.get('labels', {}).get('addOrUpdateLabels', {}))
+        for key in params.get('labels', {}).get('removeLabels', []):
+            labels.pop(key, None)
+        changes['labels'] = labels
+        removed = {(taint['key'], taint['effect']) for taint in params.get('taints', {}).get('removeTaints', [])}
+        added = params.get('taints', {}).get('addOrUpdateTaints', [])
+        replaced = removed | {(taint['key'], taint['effect']) for taint in added}
+        changes['taints'] = [taint for taint in nodegroup.get('taints') or []
+                             if (taint['key'], taint['effect']) not in replaced] + added
+        return self._start_update(region, nodegroup, 'eks_nodegroup_config_update', 'ConfigUpdate', changes)
+
+    def _update_nodegroup_version(self, region, params):
+        nodegroup = self._updatable_nodegroup(region, params)
+        cluster = self._cluster(region, params['clusterName'])
+        version = params.get('version') or cluster['version']
+        if tuple(map(int, version.split('.'))) > tuple(map(int, cluster['version'].split('.'))):
+            raise FakeAwsError('InvalidParameterException', f"Nodegroup version {version} is newer than the "
+                                                             f"cluster's {cluster['version']}.")
+        changes = {'version': version}
+        if 'launchTemplate' in params:
+            changes['launchTemplate'] = params['launchTemplate']
+        return self._start_update(region, nodegroup, 'eks_nodegroup_version_update', 'VersionUpdate', changes)
+
+    def _delete_nodegroup(self, region, params):
+        nodegroup = self._nodegroup(region, params)
+        if nodegroup['status'] == 'DELETING':
+            raise FakeAwsError('ResourceInUseException', f"Nodegroup {params['nodegroupName']} is already being deleted.", 409)
+        nodegroup['status'] = 'DELETING'
+        self._pending(nodegroup, 'eks_nodegroup_deleted', 'status', 'DELETED')
+        return {'nodegroup': _public(nodegroup)}
+
+    def _delete_cluster(self, region, params):
+        cluster = self._cluster(region, params['name'])
+        if self._list_nodegroups(region, {'clusterName': params['name']})['nodegroups']:
+            raise FakeAwsError('ResourceInUseException', "Cluster has nodegroups attached", 409)
+        if cluster['status'] != 'DELETING':
+            cluster['status'] = 'DELETING'
+            self._pending(cluster, 'eks_cluster_deleted', 'status', 'DELETED')
+            # Add-ons go with their cluster
+            addons = self._store(region, 'addons')
+            for key in [key for key in addons if key.startswith(f"{params['name']}/")]:
+                del addons[key]
+        return {'cluster': _public(cluster)}
+
+    def _addon(self, region, params):
+        addon = self._live(region, 'addons', f"{params['clusterName']}/{params['addonName']}")
+        if addon is None:
+            raise FakeAwsError('ResourceNotFoundException', f"No addon: {params['addonName']} found in cluster: "
+                                                            f"{params['clusterName']}", 404)
+        return addon
+
+    def _create_addon(self, region, params):
+        cluster = self._cluster(region, params['clusterName'])
+        if cluster['status'] != 'ACTIVE':
+            raise FakeAwsError('ResourceInUseException', f"Cluster '{params['clusterName']}' is not ACTIVE.", 409)
+        key = f"{params['clusterName']}/{params['addonName']}"
+        if key in self._store(region, 'addons'):
+            raise FakeAwsError('ResourceInUseException', f"Addon already exists with name {params['addonName']}", 409)
+        addon = self._add(region, 'addons', key, {
+            'addonName': params['addonName'], 'clusterName': params['clusterName'], 'status': 'CREATING',
+            'addonVersion': params.get('addonVersion') or f"v1.0.0-eksbuild.{cluster['version']}",
+            'configurationValues': params.get('configurationValues', ''), 'tags': params.get('tags', {}),
+            'addonArn': f"arn:aws:eks:{region}:{ACCOUNT_ID}:addon/{key}",
+        })
+        self._pending(addon, 'eks_addon', 'status', 'ACTIVE')
+        return {'addon': _public(addon)}
+
+    def _describe_addon(self, region, params):
+        return {'addon': _public(self._addon(region, params))}
+
+    def _update_addon(self, region, params):
+        addon = self._addon(region, params)
+        self._check_updatable(addon, f"Addon {params['addonName']}")
+        return self._start_update(region, addon, 'eks_addon', 'AddonUpdate',
+                                  {name: params[name] for name in ('addonVersion', 'configurationValues') if name in params})
@@ -1,11 +1,19 @@
-import boto3
+from functools import lru_cache
 
-def get_account_number():
+from functions.clients import get_client
+
+
+@lru_cache(maxsize=None)
+def get_account_number(profile=None):
     """
     Fetch the AWS account number dynamically using the STS client.
+
+    The answer is memoized per profile, so every caller in a run shares one
+    get_caller_identity call. Use get_account_number.cache_clear() after switching
+    credentials.
+    :param profile: AWS profile name, or None for the default credential chain.
     :return: AWS account number as a string.
     """
-    sts_client = boto3.client('sts')
+    sts_client = get_client('sts', None, profile)
     account_id = sts_client.get_caller_identity()["Account"]
     return account_id
-
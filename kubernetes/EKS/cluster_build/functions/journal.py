@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def input_hash(step, inputs):
+    """
+    Hash what a step's result depends on: its input values and its fingerprint.
+
+    :param step: The Step; its fingerprint carries the settings its func reads.
+    :param inputs: Dictionary of input name -> value the step is about to run with.
+    :return: Hex digest.
+    """
+    fingerprint = step.fingerprint() if callable(step.fingerprint) else step.fingerprint
+    payload = json.dumps({'inputs': inputs, 'fingerprint': fingerprint}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Journal:
+    """
+    Append-only JSON-lines record of build steps, so a failed build resumes where it stopped.
+
+    Every finished step appends one line with the outputs it produced (resource IDs,
+    ARNs, ...) and the hash of its inputs; a failed step appends its error. On load the
+    last line per (graph, step) wins, so a step that failed after an earlier success is
+    not skipped, and a 'reset' line (written after a teardown) forgets a whole graph. A
+    line cut short by a crash is ignored.
+
+    :param path: Journal file; created on the first write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path) as journal_file:
+                for line in journal_file:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+
+    def _apply(self, entry):
+        if entry['status'] == 'reset':
+            for key in [key for key in self._entries if key[0] == entry['graph']]:
+                del self._entries[key]
+        else:
+            self._entries[(entry['graph'], entry['step'])] = entry
+
+    def _append(self, entry):
+        entry = dict(entry, at=time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+        line = json.dumps(entry, sort_keys=True, default=str)
+        with self._lock:
+            with open(self.path, 'a') as journal_file:
+                journal_file.write(line + '\n')
+            self._apply(json.loads(line))
+
+    def completed(self, graph, step_name, inputs_hash):
+        """
+        Return the outputs a step produced when it last finished with these inputs.
+
+        :param graph: Graph label, e.g. the cluster name (None for a single build).
+        :return: Dictionary of output name -> value, or None if the step has to run.
+        """
+        with self._lock:
+            entry = self._entries.get((graph, step_name))
+        if entry and entry['status'] == 'done' and entry['inputs_hash'] == inputs_hash:
+            return entry['outputs']
+        return None
+
+    def record_done(self, graph, step_name, inputs_hash, outputs, seconds):
+        self._append({'graph': graph, 'step': step_name, 'status': 'done', 'inputs_hash': inputs_hash,
+                      'outputs': outputs, 'seconds': round(seconds, 3)})
+
+    def record_failed(self, graph, step_name, inputs_hash, error):
+        self._append({'graph': graph, 'step': step_name, 'status': 'failed', 'inputs_hash': inputs_hash,
+                      'error': error})
+
+    def reset(self, graph):
+        """Forget every step of a graph, e.g. after its resources were torn down."""
+        self._append({'graph': graph, 'status': 'reset'})
+
+    def steps(self, graph):
+        """
+        Summarize the journal for one graph.
+
+        :return: Dictionary of step name -> 'done' or 'failed: <error>'.
+        """
+        with self._lock:
+            return {step_name: 'done' if entry['status'] == 'done' else f"failed: {entry['error']}"
+                    for (entry_graph, step_name), entry in self._entries.items() if entry_graph == graph}
@@ -0,0 +1,87 @@
+from botocore.exceptions import ClientError
+
+from functions.clients import get_client
+from functions.tagging import tag_specifications
+
+
+def launch_template_name(cluster_name, nodegroup_name):
+    """Name of the launch template generated for one node group, e.g. 'my-cluster-app-workers'."""
+    return f"{cluster_name}-{nodegroup_name}"
+
+
+def launch_template_data(user_data, tags):
+    """
+    The LaunchTemplateData of a generated node group template.
+
+    It leaves out the image and instance type, so the node group's amiType and
+    instanceTypes still apply and EKS keeps adding its own bootstrap.
+
+    :param user_data: Base64-encoded user data (see functions.pod_density.user_data()).
+    :param tags: Dictionary of tags for the node instances and their volumes.
+    :return: LaunchTemplateData dictionary.
+    """
+    return {
+        'UserData': user_data,
+        'TagSpecifications': [*tag_specifications('instance', tags), *tag_specifications('volume', tags)],
+    }
+
+
+def _covers(current, desired):
+    """True if current has every key of desired with the same value; EC2 may add defaults of its own."""
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(_covers(current.get(key), value) for key, value in desired.items())
+    return current == desired
+
+
+def find_launch_template(name, data, region='us-east-1'):
+    """
+    Look a launch template up without changing it.
+
+    :param name: Launch template name.
+    :param data: LaunchTemplateData dictionary (see launch_template_data()).
+    :param region: The AWS region.
+    :return: Dictionary with the template's 'id' and the 'version' (string) of its latest version if that
+             matches data, else None; None if there is no template.
+    """
+    ec2 = get_client('ec2', region)
+    try:
+        template = ec2.describe_launch_templates(LaunchTemplateNames=[name])['LaunchTemplates'][0]
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('InvalidLaunchTemplateName.NotFoundException',
+                                               'InvalidLaunchTemplateName.NotFound'):
+            raise
+        return None
+
+    latest = ec2.describe_launch_template_versions(LaunchTemplateId=template['LaunchTemplateId'],
+                                                   Versions=['$Latest'])['LaunchTemplateVersions'][0]
+    return {'id': template['LaunchTemplateId'],
+            'version': str(latest['VersionNumber']) if _covers(latest['LaunchTemplateData'], data) else None}
+
+
+def ensure_launch_template(name, data, tags, region='us-east-1'):
+    """
+    Create a launch template, or a new version of it if its latest version differs from data.
+
+    :param name: Launch template name.
+    :param data: LaunchTemplateData dictionary (see launch_template_data()).
+    :param tags: Dictionary of tags for the launch template itself.
+    :param region: The AWS region.
+    :return: Dictionary with the template's 'id' and the 'version' (string) that matches data.
+    """
+    ec2 = get_client('ec2', region)
+    template = find_launch_template(name, data, region=region)
+
+    if template is None:
+        template = ec2.create_launch_template(LaunchTemplateName=name, LaunchTemplateData=data,
+                                              TagSpecifications=tag_specifications('launch-template', tags, name)
+                                              )['LaunchTemplate']
+        print(f"[✅] Created launch template '{name}' ({template['LaunchTemplateId']}).")
+        return {'id': template['LaunchTemplateId'], 'version': str(template['LatestVersionNumber'])}
+
+    if template['version']:
+        print(f"[ℹ️] Launch template '{name}' is up to date (version {template['version']}).")
+        return {'id': template['id'], 'version': template['version']}
+    version = ec2.create_launch_template_version(LaunchTemplateId=template['id'],
+                                                 LaunchTemplateData=data)['LaunchTemplateVersion']
+    print(f"[✅] Created version {version['VersionNumber']} of launch template '{name}'.")
+    return {'id': template['id'], 'version': str(version['VersionNumber'])}
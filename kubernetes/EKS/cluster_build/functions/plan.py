@@ -0,0 +1,348 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.addons import NODE_ADDONS, addon_configuration
+from functions.clients import get_client
+from functions.create_control_plane import upgrade_path
+from functions.create_nodegroup import nodegroup_updates
+from functions.create_role_with_policies import describe_role, normalize_policy
+from functions.resolver import AmbiguousMatchError, resolve_subnets, resolve_vpc_subnets
+from functions.snapshot import load_vpc_snapshot
+from functions.tagging import missing_tags
+
+# Rough wall-clock seconds per action, including any waiter the build runs after it
+ESTIMATED_SECONDS = {
+    'create_vpc': 2,
+    'create_subnet': 1,
+    'modify_subnet_attribute': 1,
+    'create_internet_gateway': 1,
+    'attach_internet_gateway': 1,
+    'create_tags': 1,
+    'create_route_table': 1,
+    'associate_route_table': 1,
+    'replace_route_table_association': 1,
+    'create_route': 1,
+    'replace_route': 1,
+    'allocate_address': 1,
+    'create_nat_gateway': 90,
+    'create_role': 2,
+    'update_assume_role_policy': 1,
+    'tag_role': 1,
+    'attach_role_policy': 1,
+    'create_cluster': 600,
+    'update_cluster_version': 1800,
+    'create_launch_template': 1,
+    'create_addon': 45,
+    'update_addon': 45,
+    'create_nodegroup': 180,
+    'update_nodegroup_config': 60,
+    'update_nodegroup_version': 900,
+    'delete_nodegroup': 240,
+    'delete_cluster': 300,
+    'delete_launch_template': 1,
+    'detach_role_policy': 1,
+    'delete_role_policy': 1,
+    'delete_role': 1,
+    'delete_nat_gateway': 60,
+    'release_address': 1,
+    'delete_route': 1,
+    'disassociate_route_table': 1,
+    'delete_route_table': 1,
+    'detach_internet_gateway': 1,
+    'delete_internet_gateway': 1,
+    'delete_subnet': 1,
+    'delete_vpc': 1,
+    'warning': 0,
+    'blocked': 0,
+}
+
+
+def _action(action, resource, detail=''):
+    return {
+        'action': action,
+        'resource': resource,
+        'detail': detail,
+        'estimated_seconds': ESTIMATED_SECONDS.get(action, 1),
+    }
+
+
+def plan_vpc(vpc_name, cidr_block, public_subnets, private_subnets, public_route_table_name,
+             private_route_table_name, nat_subnet_az, region='us-east-1', az_route_table_names=None, tags=None):
+    """
+    Diff the desired VPC layout against live state without changing anything.
+
+    Live state comes from one concurrent snapshot; no create_*, attach_* or
+    associate_* API is called.
+
+    :param vpc_name: The VPC's Name tag.
+    :param cidr_block: CIDR block for the VPC.
+    :param public_subnets: Dictionary of AZ -> CIDR for public subnets.
+    :param private_subnets: Dictionary of AZ -> CIDR for private subnets.
+    :param public_route_table_name: Name given to the VPC's default route table.
+    :param private_route_table_name: Name of the private route table.
+    :param nat_subnet_az: AZ of the public subnet that hosts the NAT gateway.
+    :param region: The AWS region.
+    :param az_route_table_names: Dictionary of AZ -> private route table name for per-AZ NAT
+                                 gateways (optional); private_route_table_name and
+                                 nat_subnet_az are then ignored.
+    :param tags: Common tags (see functions.tagging.common_tags()); existing resources that
+                 lack them show up as one batched create_tags (optional).
+    :return: Ordered list of action dictionaries (action, resource, detail, estimated_seconds).
+    """
+    subnets = {f"public_subnet_{az}": (az, cidr, True) for az, cidr in public_subnets.items()}
+    subnets.update({f"private_subnet_{az}": (az, cidr, False) for az, cidr in private_subnets.items()})
+    route_table_names = list(az_route_table_names.values()) if az_route_table_names else [private_route_table_name]
+    snapshot = load_vpc_snapshot(vpc_name, list(subnets), [public_route_table_name] + route_table_names, region)
+
+    actions = []
+    if not snapshot:
+        actions.append(_action('create_vpc', vpc_name, cidr_block))
+    elif snapshot.vpc.get('CidrBlock') != cidr_block:
+        actions.append(_action('warning', vpc_name, f"exists with CIDR {snapshot.vpc.get('CidrBlock')}, "
+                                                 f"not {cidr_block}; the build keeps the existing VPC"))
+
+    for subnet_name, (az, cidr, is_public) in subnets.items():
+        if not snapshot or not snapshot.subnet(subnet_name):
+            actions.append(_action('create_subnet', subnet_name, f"{cidr} in {az}"))
+            if is_public:
+                actions.append(_action('modify_subnet_attribute', subnet_name, 'MapPublicIpOnLaunch=true'))
+
+    if not snapshot or not snapshot.internet_gateway_id():
+        actions.append(_action('create_internet_gateway', vpc_name))
+        actions.append(_action('attach_internet_gateway', vpc_name))
+
+    default_route_table_id = snapshot.default_route_table_id() if snapshot else None
+    if not snapshot or snapshot.route_table_id(public_route_table_name) != default_route_table_id:
+        actions.append(_action('create_tags', public_route_table_name, 'name the default route table'))
+    untagged = [resource_id for resource_id, resource_tags in (snapshot.tagged_resources() if snapshot and tags else [])
+                if missing_tags(resource_tags, tags)]
+    if untagged:
+        actions.append(_action('create_tags', f"{len(untagged)} resource(s)", 'common tags, one batched call'))
+
+    internet_gateway_id = snapshot.internet_gateway_id() if snapshot else None
+    if not (internet_gateway_id and snapshot.has_route(default_route_table_id, '0.0.0.0/0', GatewayId=internet_gateway_id)):
+        replace = bool(snapshot and default_route_table_id and snapshot.route(default_route_table_id, '0.0.0.0/0'))
+        actions.append(_action('replace_route' if replace else 'create_route', public_route_table_name,
+                               '0.0.0.0/0 -> Internet Gateway'))
+
+    # Private egress as (route table name, AZ of its NAT gateway, private subnet names routed through it)
+    private_names = [subnet_name for subnet_name in subnets if subnet_name.startswith('private_subnet')]
+    if az_route_table_names:
+        egress = [(az_route_table_names[az], az, [f"private_subnet_{az}"]) for az in private_subnets]
+    else:
+        egress = [(private_route_table_name, nat_subnet_az, private_names)]
+
+    associations = snapshot.subnet_associations() if snapshot else {}
+    for route_table_name, nat_az, subnet_names in egress:
+        route_table_id = snapshot.route_table_id(route_table_name) if snapshot else None
+        if not route_table_id:
+            actions.append(_action('create_route_table', route_table_name))
+
+        for subnet_name in subnet_names:
+            subnet = snapshot.subnet(subnet_name) if snapshot else None
+            association = associations.get(subnet['SubnetId']) if subnet else None
+            if not association:
+                actions.append(_action('associate_route_table', subnet_name, route_table_name))
+            elif association['RouteTableId'] != route_table_id:
+                actions.append(_action('replace_route_table_association', subnet_name,
+                                       f"{association['RouteTableId']} -> {route_table_name}"))
+
+        nat_subnet = snapshot.subnet(f"public_subnet_{nat_az}") if snapshot else None
+        nat_gateway = snapshot.nat_gateway(nat_subnet['SubnetId']) if nat_subnet else None
+        if not nat_gateway:
+            actions.append(_action('allocate_address', f"public_subnet_{nat_az}", 'Elastic IP for the NAT gateway'))
+            actions.append(_action('create_nat_gateway', f"public_subnet_{nat_az}"))
+        if not (nat_gateway and route_table_id and
+                snapshot.has_route(route_table_id, '0.0.0.0/0', NatGatewayId=nat_gateway['NatGatewayId'])):
+            replace = bool(route_table_id and snapshot.route(route_table_id, '0.0.0.0/0'))
+            actions.append(_action('replace_route' if replace else 'create_route', route_table_name,
+                                   f"0.0.0.0/0 -> NAT gateway in {nat_az}"))
+
+    return [action for action in actions if action['action'] != 'warning'] + \
+           [action for action in actions if action['action'] == 'warning']
+
+
+def _describe_or_none(eks_client, operation, key, **kwargs):
+    try:
+        return getattr(eks_client, operation)(**kwargs)[key]
+    except eks_client.exceptions.ResourceNotFoundException:
+        return None
+
+
+def _plan_addon(addon_name, configuration, addon):
+    if not addon:
+        return [_action('create_addon', addon_name, json.dumps(configuration, sort_keys=True))]
+    if addon_configuration(addon) != configuration:
+        return [_action('update_addon', addon_name, 'configuration differs')]
+    return []
+
+
+def plan_eks(roles, cluster_name, cluster_subnet_names, kubernetes_version, nodegroup_specs, addons=None,
+             region='us-east-1', vpc_name=None):
+    """
+    Diff the desired IAM roles, EKS cluster, add-ons and node groups against live state without changing anything.
+
+    Every describe/get/list call runs concurrently; no create_*, attach_* or update_* API is called.
+
+    :param roles: List of (role_name, trust_policy, policy_arns, tags) tuples.
+    :param cluster_name: Name of the EKS cluster.
+    :param cluster_subnet_names: Names of the subnets the cluster uses.
+    :param kubernetes_version: Desired Kubernetes version.
+    :param nodegroup_specs: List of create_eks_nodegroups spec dictionaries.
+    :param addons: Dictionary of add-on name -> configuration values (see functions.addons.addon_specs()).
+    :param region: The AWS region.
+    :param vpc_name: Name tag of the cluster's VPC; the subnets are only looked for inside it
+                     (optional, region-wide otherwise).
+    :return: Ordered list of action dictionaries (action, resource, detail, estimated_seconds).
+    """
+    addons = addons or {}
+    iam_client = get_client('iam', None)
+    eks_client = get_client('eks', region)
+    ec2 = get_client('ec2', region)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        role_futures = {role_name: pool.submit(describe_role, iam_client, role_name) for role_name, _, _, _ in roles}
+        cluster_future = pool.submit(_describe_or_none, eks_client, 'describe_cluster', 'cluster', name=cluster_name)
+        nodegroup_futures = {
+            spec['nodegroup_name']: pool.submit(_describe_or_none, eks_client, 'describe_nodegroup', 'nodegroup',
+                                                clusterName=cluster_name, nodegroupName=spec['nodegroup_name'])
+            for spec in nodegroup_specs
+        }
+        addon_futures = {
+            addon_name: pool.submit(_describe_or_none, eks_client, 'describe_addon', 'addon',
+                                    clusterName=cluster_name, addonName=addon_name)
+            for addon_name in addons
+        }
+        if vpc_name:
+            subnets_future = pool.submit(resolve_vpc_subnets, ec2, vpc_name, cluster_subnet_names)
+        else:
+            subnets_future = pool.submit(lambda: (None, resolve_subnets(ec2, cluster_subnet_names)))
+
+    actions = []
+    for role_name, trust_policy, policy_arns, tags in roles:
+        role, attached = role_futures[role_name].result()
+        if not role:
+            actions.append(_action('create_role', role_name))
+        else:
+            if normalize_policy(role['AssumeRolePolicyDocument']) != normalize_policy(trust_policy):
+                actions.append(_action('update_assume_role_policy', role_name, 'trust policy differs'))
+            current_tags = {tag['Key']: tag['Value'] for tag in role.get('Tags', [])}
+            missing_tags = [tag['Key'] for tag in tags or [] if current_tags.get(tag['Key']) != tag['Value']]
+            if missing_tags:
+                actions.append(_action('tag_role', role_name, ', '.join(missing_tags)))
+        for policy_arn in dict.fromkeys(policy_arns):
+            if policy_arn not in attached:
+                actions.append(_action('attach_role_policy', role_name, policy_arn))
+
+    try:
+        vpc, subnets = subnets_future.result()
+    except AmbiguousMatchError as e:
+        actions.append(_action('blocked', cluster_name, str(e)))
+    else:
+        missing_subnets = [name for name in cluster_subnet_names if not subnets[name]]
+        if vpc_name and not vpc:
+            actions.append(_action('blocked', cluster_name, f"VPC {vpc_name} not found"))
+        elif missing_subnets:
+            actions.append(_action('blocked', cluster_name, f"subnets not found: {', '.join(missing_subnets)}"))
+
+    cluster = cluster_future.result()
+    if not cluster:
+        actions.append(_action('create_cluster', cluster_name, f"Kubernetes {kubernetes_version}"))
+    else:
+        try:
+            current = cluster.get('version')
+            for version in upgrade_path(current, kubernetes_version):
+                actions.append(_action('update_cluster_version', cluster_name, f"{current} -> {version}"))
+                current = version
+        except ValueError as e:
+            actions.append(_action('blocked', cluster_name, str(e)))
+
+    # Same order as the build: add-ons the nodes need first, the ones that run on them last
+    for addon_name, configuration in addons.items():
+        if addon_name not in NODE_ADDONS:
+            actions += _plan_addon(addon_name, configuration, addon_futures[addon_name].result())
+
+    for spec in nodegroup_specs:
+        nodegroup = nodegroup_futures[spec['nodegroup_name']].result()
+        if not nodegroup:
+            if spec.get('max_pods'):
+                actions.append(_action('create_launch_template', spec['nodegroup_name'], f"max-pods {spec['max_pods']}"))
+            actions.append(_action('create_nodegroup', spec['nodegroup_name'],
+                                   f"{', '.join(spec['instance_types'])} x {spec['scaling_config']['desiredSize']}"))
+        else:
+            updates = nodegroup_updates(nodegroup, spec, kubernetes_version)
+            if updates['config']:
+                changes = [f"scaling {nodegroup.get('scalingConfig')} -> {spec['scaling_config']}" if field == 'scalingConfig'
+                           else field for field in updates['config']]
+                actions.append(_action('update_nodegroup_config', spec['nodegroup_name'], ', '.join(changes)))
+            if updates['version']:
+                actions.append(_action('update_nodegroup_version', spec['nodegroup_name'],
+                                       f"{nodegroup.get('version')} -> {updates['version']['version']}"))
+            if updates['replace']:
+                actions.append(_action('warning', spec['nodegroup_name'],
+                                       f"{', '.join(updates['replace'])} differ; only a new node group can change them"))
+    for addon_name, configuration in addons.items():
+        if addon_name in NODE_ADDONS:
+            actions += _plan_addon(addon_name, configuration, addon_futures[addon_name].result())
+    return actions
+
+
+def plan_teardown(inventory):
+    """
+    List what a teardown would delete, in the order it deletes it.
+
+    :param inventory: Dictionary returned by functions.teardown.discover().
+    :return: Ordered list of action dictionaries (action, resource, detail, estimated_seconds);
+             resources found by name but not owned come last as warnings.
+    """
+    actions = []
+    cluster = inventory['cluster']
+    for nodegroup_name, status in inventory['nodegroups'].items():
+        actions.append(_action('delete_nodegroup', nodegroup_name, f"{status} in {cluster['name']}"))
+    for launch_template_id, name in inventory['launch_templates'].items():
+        actions.append(_action('delete_launch_template', name, launch_template_id))
+    if cluster:
+        actions.append(_action('delete_cluster', cluster['name'], cluster['status']))
+    for role_name, role in inventory['roles'].items():
+        actions += [_action('detach_role_policy', role_name, policy_arn) for policy_arn in role['policies']]
+        actions += [_action('delete_role_policy', role_name, policy_name) for policy_name in role['inline_policies']]
+        actions.append(_action('delete_role', role_name))
+    for nat_gateway_id, state in inventory['nat_gateways'].items():
+        actions.append(_action('delete_nat_gateway', nat_gateway_id, state))
+    actions += [_action('release_address', allocation_id) for allocation_id in inventory['addresses']]
+    actions += [_action('delete_route', route_table_id, destination) for route_table_id, destination in inventory['routes']]
+    for route_table_id, route_table in inventory['route_tables'].items():
+        actions += [_action('disassociate_route_table', route_table['name'], association_id)
+                    for association_id in route_table['associations']]
+        actions.append(_action('delete_route_table', route_table['name'], route_table_id))
+    for internet_gateway_id in inventory['internet_gateways']:
+        actions.append(_action('detach_internet_gateway', internet_gateway_id, inventory['vpc_id']))
+        actions.append(_action('delete_internet_gateway', internet_gateway_id))
+    actions += [_action('delete_subnet', subnet_name, subnet_id) for subnet_id, subnet_name in inventory['subnets'].items()]
+    if inventory['vpc_id']:
+        actions.append(_action('delete_vpc', inventory['vpc_id']))
+    actions += [_action('warning', skipped, 'found by name but not owned; left alone') for skipped in inventory['skipped']]
+    return actions
+
+
+def print_plan(actions, as_json=False):
+    """
+    Print a plan as a numbered action list with estimated times, or as JSON.
+
+    :param actions: List of action dictionaries from plan_vpc() / plan_eks() / plan_teardown().
+    :param as_json: Print machine-readable JSON instead of text.
+    """
+    if as_json:
+        print(json.dumps({'actions': actions,
+                          'estimated_seconds': sum(action['estimated_seconds'] for action in actions
+                                                   if action['action'] not in ('warning', 'blocked'))}, indent=2))
+        return
+    changes = [action for action in actions if action['action'] not in ('warning', 'blocked')]
+    if not changes:
+        print("[✅] No changes. Live state matches the desired configuration.")
+    for number, action in enumerate(actions, start=1):
+        marker = '⚠️' if action['action'] in ('warning', 'blocked') else '+'
+        detail = f" ({action['detail']})" if action['detail'] else ''
+        print(f"[{marker}] {number:>2}. {action['action']} {action['resource']}{detail}  ~{action['estimated_seconds']}s")
+    if changes:
+        print(f"[ℹ️] {len(changes)} change(s), about {sum(action['estimated_seconds'] for action in changes)}s if run one after another.")
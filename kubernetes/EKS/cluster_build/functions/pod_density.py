@@ -0,0 +1,115 @@
+import base64
+
+# Per instance type: (vCPUs, maximum network interfaces, IPv4 addresses per interface, Nitro).
+# Prefix delegation needs a Nitro instance; the others keep one address per pod.
+ENI_LIMITS = {
+    't2.medium': (2, 3, 6, False), 't2.large': (2, 3, 12, False), 't2.xlarge': (4, 3, 15, False),
+    't3.small': (2, 3, 4, True), 't3.medium': (2, 3, 6, True), 't3.large': (2, 3, 12, True),
+    't3.xlarge': (4, 4, 15, True), 't3.2xlarge': (8, 4, 15, True),
+    't3a.small': (2, 2, 4, True), 't3a.medium': (2, 3, 6, True), 't3a.large': (2, 3, 12, True),
+    't3a.xlarge': (4, 4, 15, True), 't3a.2xlarge': (8, 4, 15, True),
+    'm5.large': (2, 3, 10, True), 'm5.xlarge': (4, 4, 15, True), 'm5.2xlarge': (8, 4, 15, True),
+    'm5.4xlarge': (16, 8, 30, True), 'm5.8xlarge': (32, 8, 30, True), 'm5.12xlarge': (48, 8, 30, True),
+    'm5.16xlarge': (64, 15, 50, True), 'm5.24xlarge': (96, 15, 50, True),
+    'm6i.large': (2, 3, 10, True), 'm6i.xlarge': (4, 4, 15, True), 'm6i.2xlarge': (8, 4, 15, True),
+    'm6i.4xlarge': (16, 8, 30, True), 'm6i.8xlarge': (32, 8, 30, True), 'm6i.12xlarge': (48, 8, 30, True),
+    'm6i.16xlarge': (64, 15, 50, True), 'm6i.24xlarge': (96, 15, 50, True), 'm6i.32xlarge': (128, 15, 50, True),
+    'm5a.large': (2, 3, 10, True), 'm5a.xlarge': (4, 4, 15, True), 'm5a.2xlarge': (8, 4, 15, True),
+    'm5a.4xlarge': (16, 8, 30, True),
+    'm6g.medium': (1, 2, 4, True), 'm6g.large': (2, 3, 10, True), 'm6g.xlarge': (4, 4, 15, True),
+    'm6g.2xlarge': (8, 4, 15, True), 'm6g.4xlarge': (16, 8, 30, True),
+    'c5.large': (2, 3, 10, True), 'c5.xlarge': (4, 4, 15, True), 'c5.2xlarge': (8, 4, 15, True),
+    'c5.4xlarge': (16, 8, 30, True), 'c5.9xlarge': (36, 8, 30, True), 'c5.12xlarge': (48, 8, 30, True),
+    'c5.18xlarge': (72, 15, 50, True), 'c5.24xlarge': (96, 15, 50, True),
+    'c5a.large': (2, 3, 10, True), 'c5a.xlarge': (4, 4, 15, True), 'c5a.2xlarge': (8, 4, 15, True),
+    'c5a.4xlarge': (16, 8, 30, True),
+    'c6i.large': (2, 3, 10, True), 'c6i.xlarge': (4, 4, 15, True), 'c6i.2xlarge': (8, 4, 15, True),
+    'c6i.4xlarge': (16, 8, 30, True),
+    'r5.large': (2, 3, 10, True), 'r5.xlarge': (4, 4, 15, True), 'r5.2xlarge': (8, 4, 15, True),
+    'r5.4xlarge': (16, 8, 30, True), 'r5.8xlarge': (32, 8, 30, True), 'r5.12xlarge': (48, 8, 30, True),
+    'r5.16xlarge': (64, 15, 50, True), 'r5.24xlarge': (96, 15, 50, True),
+    'r5a.large': (2, 3, 10, True), 'r5a.xlarge': (4, 4, 15, True), 'r5a.2xlarge': (8, 4, 15, True),
+    'r5a.4xlarge': (16, 8, 30, True),
+    'r6i.large': (2, 3, 10, True), 'r6i.xlarge': (4, 4, 15, True), 'r6i.2xlarge': (8, 4, 15, True),
+    'r6i.4xlarge': (16, 8, 30, True),
+}
+
+# Addresses in the /28 prefix the VPC CNI assigns per interface slot with prefix delegation
+PREFIX_SIZE = 16
+
+# Kubelet limits EKS recommends with prefix delegation: 110 pods below 30 vCPUs, 250 from 30 up
+MAX_PODS_SMALL = 110
+MAX_PODS_LARGE = 250
+
+# VPC CNI settings that turn on prefix delegation, with one spare prefix per node
+PREFIX_DELEGATION_CNI = {'env': {'ENABLE_PREFIX_DELEGATION': 'true', 'WARM_PREFIX_TARGET': '1'}}
+
+_BOUNDARY = '==MAXPODS=='
+
+
+def max_pods(instance_type, prefix_delegation=False):
+    """
+    Compute the kubelet max-pods for one instance type.
+
+    Without prefix delegation every pod takes one secondary address of an interface:
+    interfaces * (addresses per interface - 1) + 2 host-network pods. With it, each
+    secondary address slot holds a /28 prefix of 16 addresses, capped at the kubelet
+    limit for the instance size.
+
+    :param instance_type: EC2 instance type, e.g. 't3.medium'.
+    :param prefix_delegation: Whether the VPC CNI hands out prefixes instead of single addresses.
+    :return: Maximum number of pods.
+    :raises ValueError: If the instance type is not in ENI_LIMITS.
+    """
+    if instance_type not in ENI_LIMITS:
+        raise ValueError(f"instance type {instance_type} is not in the ENI table; set max_pods in cluster_config.py")
+    vcpus, interfaces, addresses, nitro = ENI_LIMITS[instance_type]
+    if prefix_delegation and nitro:
+        return min(interfaces * (addresses - 1) * PREFIX_SIZE + 2, MAX_PODS_SMALL if vcpus < 30 else MAX_PODS_LARGE)
+    return interfaces * (addresses - 1) + 2
+
+
+def nodegroup_max_pods(instance_types, prefix_delegation=False):
+    """
+    Compute the max-pods of a node group: the lowest of its instance types, so every node can hold it.
+
+    :param instance_types: List of EC2 instance types.
+    :param prefix_delegation: Whether the VPC CNI hands out prefixes.
+    :return: Maximum number of pods per node.
+    :raises ValueError: If an instance type is not in ENI_LIMITS.
+    """
+    return min(max_pods(instance_type, prefix_delegation) for instance_type in instance_types)
+
+
+def user_data(ami_type, pods):
+    """
+    Render launch template user data that sets the kubelet's max-pods.
+
+    EKS merges it with its own bootstrap for managed node groups without a custom AMI:
+    AL2 and AL2023 take a MIME multipart document, Bottlerocket a TOML settings block.
+
+    :param ami_type: The node group's amiType, e.g. 'AL2_x86_64' or 'AL2023_x86_64_STANDARD'.
+    :param pods: The max-pods value.
+    :return: Base64-encoded user data, or None for AMI types that cannot take it (Windows).
+    """
+    if ami_type.startswith('BOTTLEROCKET'):
+        document = f"[settings.kubernetes]\nmax-pods = {pods}\n"
+    elif ami_type.startswith('AL2023'):
+        document = _mime('application/node.eks.aws',
+                         "---\napiVersion: node.eks.aws/v1alpha1\nkind: NodeConfig\nspec:\n"
+                         f"  kubelet:\n    config:\n      maxPods: {pods}\n")
+    elif ami_type.startswith('AL2'):
+        # EKS runs bootstrap.sh after this part; stop it from recomputing max-pods from the ENI limit
+        document = _mime('text/x-shellscript; charset="us-ascii"',
+                         "#!/bin/bash\nset -e\n"
+                         "sed -i 's/^USE_MAX_PODS=.*/USE_MAX_PODS=false/' /etc/eks/bootstrap.sh\n"
+                         "KUBELET_CONFIG=/etc/kubernetes/kubelet/kubelet-config.json\n"
+                         f"echo \"$(jq '.maxPods={pods}' $KUBELET_CONFIG)\" > $KUBELET_CONFIG\n")
+    else:
+        return None
+    return base64.b64encode(document.encode()).decode()
+
+
+def _mime(content_type, body):
+    return (f'MIME-Version: 1.0\nContent-Type: multipart/mixed; boundary="{_BOUNDARY}"\n\n'
+            f"--{_BOUNDARY}\nContent-Type: {content_type}\n\n{body}\n--{_BOUNDARY}--\n")
@@ -0,0 +1,234 @@
+import threading
+from itertools import islice
+
+# EC2 accepts at most 200 values per filter
+MAX_FILTER_VALUES = 200
+
+# Results per describe page; describe_route_tables accepts at most 100
+PAGE_SIZE = 100
+
+_lock = threading.Lock()
+_cache = {}
+# (region, VPC ID) of the VPCs created in this run: they hold no subnets but those remember() records
+_new_vpcs = set()
+
+
+def _key(ec2, kind, name, vpc_id):
+    return (kind, ec2.meta.region_name, vpc_id, name)
+
+
+def _name_tag(resource):
+    for tag in resource.get('Tags', []):
+        if tag['Key'] == 'Name':
+            return tag['Value']
+    return None
+
+
+class AmbiguousMatchError(Exception):
+    """A lookup that must find at most one resource found several."""
+
+    def __init__(self, kind, matches):
+        """
+        :param kind: Kind of resource looked up, e.g. 'vpc' or 'subnet'.
+        :param matches: Dictionary of looked-up name (or other key) -> list of matching resource IDs.
+        """
+        self.kind = kind
+        self.matches = matches
+        super().__init__('; '.join(f"{len(ids)} {kind}s match '{name}': {', '.join(ids)}"
+                                   for name, ids in matches.items()))
+
+
+def iter_resources(ec2, operation, filters=None, page_size=PAGE_SIZE):
+    """
+    Yield the resources of a paginated EC2 describe call one at a time.
+
+    Pages are requested only as the caller consumes them, so breaking out of the loop
+    skips the remaining pages and at most one page is held in memory. Filter on the
+    server as much as possible: EC2 only returns (and pages over) what matches.
+
+    :param ec2: EC2 client.
+    :param operation: Paginated describe operation, e.g. 'describe_subnets'.
+    :param filters: EC2 filters to send with every page request (optional).
+    :param page_size: Results per page.
+    """
+    paginator = ec2.get_paginator(operation)
+    result_key = paginator.result_keys[0].expression
+    for page in paginator.paginate(Filters=filters or [], PaginationConfig={'PageSize': page_size}):
+        yield from page.get(result_key, [])
+
+
+def find_unique(ec2, operation, filters, kind, id_key):
+    """
+    Return the one resource a filtered describe call matches, or None if there is none.
+
+    Reading stops at the second match, so an ambiguous lookup costs no more than one
+    page no matter how many resources match.
+
+    :param ec2: EC2 client.
+    :param operation: Paginated describe operation, e.g. 'describe_internet_gateways'.
+    :param filters: EC2 filters that should match at most one resource.
+    :param kind: Kind of resource, for the error message.
+    :param id_key: The resource's ID field, e.g. 'InternetGatewayId'.
+    :return: The matching resource, or None.
+    :raises AmbiguousMatchError: If more than one resource matches.
+    """
+    matches = list(islice(iter_resources(ec2, operation, filters), 2))
+    if len(matches) > 1:
+        values = [value for resource_filter in filters for value in resource_filter['Values']]
+        raise AmbiguousMatchError(kind, {', '.join(values): [resource[id_key] for resource in matches]})
+    return matches[0] if matches else None
+
+
+def _resolve(ec2, kind, names, vpc_id, operation, id_key, record):
+    """
+    Resolve Name tags to records, describing only the names not already cached.
+
+    Every page of the tag-filtered describe call is read, but only one record per
+    name is kept, so memory grows with the names asked for, not with the account.
+    Misses are cached as None too, so a create path that checks a name right after
+    a batch lookup does not pay another round trip; remember() replaces the entry
+    once the resource is created. Names that match several resources are not cached.
+    Subnets of a VPC created in this run (see remember_new_vpc()) are never described.
+
+    :raises AmbiguousMatchError: If a name matches more than one resource; the
+                                 other names are resolved and cached first.
+    """
+    names = list(dict.fromkeys(names))
+    with _lock:
+        found = {name: _cache[_key(ec2, kind, name, vpc_id)]
+                 for name in names if _key(ec2, kind, name, vpc_id) in _cache}
+        if kind == 'subnet' and (ec2.meta.region_name, vpc_id) in _new_vpcs:
+            found = {name: found.get(name) for name in names}
+    missing = [name for name in names if name not in found]
+    ambiguous = {}
+
+    for start in range(0, len(missing), MAX_FILTER_VALUES):
+        chunk = missing[start:start + MAX_FILTER_VALUES]
+        filters = [{'Name': 'tag:Name', 'Values': chunk}]
+        if vpc_id:
+            filters.append({'Name': 'vpc-id', 'Values': [vpc_id]})
+        resolved = dict.fromkeys(chunk)
+        for resource in iter_resources(ec2, operation, filters):
+            name = _name_tag(resource)
+            if name not in resolved:
+                continue
+            if resolved[name] is None:
+                resolved[name] = record(resource)
+            elif resource[id_key] != resolved[name][id_key]:
+                ambiguous.setdefault(name, [resolved[name][id_key]]).append(resource[id_key])
+        for name in ambiguous:
+            resolved.pop(name, None)
+        with _lock:
+            for name, value in resolved.items():
+                _cache[_key(ec2, kind, name, vpc_id)] = value
+        found.update(resolved)
+
+    if ambiguous:
+        raise AmbiguousMatchError(kind, ambiguous)
+    return {name: found[name] for name in names}
+
+
+def resolve_subnets(ec2, names, vpc_id=None):
+    """
+    Resolve subnet Name tags with one paginated describe_subnets call per 200 uncached names.
+
+    :param ec2: EC2 client.
+    :param names: List of subnet names.
+    :param vpc_id: Restrict the lookup to one VPC (optional).
+    :return: Dictionary of name -> {'SubnetId', 'AvailabilityZone', 'CidrBlock', 'VpcId'}, or None if not found.
+    :raises AmbiguousMatchError: If a name belongs to more than one subnet.
+    """
+    return _resolve(ec2, 'subnet', names, vpc_id, 'describe_subnets', 'SubnetId', lambda subnet: {
+        'SubnetId': subnet['SubnetId'],
+        'AvailabilityZone': subnet.get('AvailabilityZone'),
+        'CidrBlock': subnet.get('CidrBlock'),
+        'VpcId': subnet.get('VpcId'),
+    })
+
+
+def resolve_vpcs(ec2, names):
+    """
+    Resolve VPC Name tags with one paginated describe_vpcs call per 200 uncached names.
+
+    :param ec2: EC2 client.
+    :param names: List of VPC names.
+    :return: Dictionary of name -> {'VpcId', 'CidrBlock'}, or None if not found.
+    :raises AmbiguousMatchError: If a name belongs to more than one VPC.
+    """
+    return _resolve(ec2, 'vpc', names, None, 'describe_vpcs', 'VpcId', lambda vpc: {
+        'VpcId': vpc['VpcId'],
+        'CidrBlock': vpc.get('CidrBlock'),
+    })
+
+
+def resolve_vpc_subnets(ec2, vpc_name, names):
+    """
+    Resolve a VPC's Name tag, then subnet Name tags inside that VPC only.
+
+    :param ec2: EC2 client.
+    :param vpc_name: The VPC's Name tag.
+    :param names: List of subnet names.
+    :return: Tuple of the VPC record (see resolve_vpcs(), None if not found) and a dictionary of
+             name -> subnet record (see resolve_subnets()), or None if not found.
+    :raises AmbiguousMatchError: If the VPC name, or a subnet name inside the VPC, belongs to more than one resource.
+    """
+    vpc = resolve_vpcs(ec2, [vpc_name])[vpc_name]
+    if not vpc:
+        return None, {name: None for name in names}
+    return vpc, resolve_subnets(ec2, names, vpc['VpcId'])
+
+
+def resolve_route_tables(ec2, names, vpc_id):
+    """
+    Resolve route table Name tags inside a VPC with one paginated describe_route_tables call per 200 uncached names.
+
+    :param ec2: EC2 client.
+    :param names: List of route table names.
+    :param vpc_id: The ID of the VPC.
+    :return: Dictionary of name -> {'RouteTableId', 'VpcId'}, or None if not found.
+    :raises AmbiguousMatchError: If a name belongs to more than one route table in the VPC.
+    """
+    return _resolve(ec2, 'route-table', names, vpc_id, 'describe_route_tables', 'RouteTableId', lambda route_table: {
+        'RouteTableId': route_table['RouteTableId'],
+        'VpcId': route_table.get('VpcId'),
+    })
+
+
+def remember(ec2, kind, name, record, vpc_id=None):
+    """
+    Cache a resource the caller just created so later lookups skip the describe call.
+
+    :param ec2: EC2 client the resource was created with.
+    :param kind: 'subnet', 'vpc' or 'route-table'.
+    :param name: The resource's Name tag.
+    :param record: The record a resolve_* call would have returned.
+    :param vpc_id: The VPC the lookup is scoped to, if any.
+    """
+    with _lock:
+        _cache[_key(ec2, kind, name, vpc_id)] = record
+
+
+def remember_new_vpc(ec2, vpc_id):
+    """
+    Note a VPC the caller just created, so subnet lookups scoped to it skip the describe call.
+
+    :param ec2: EC2 client the VPC was created with.
+    :param vpc_id: The ID of the new VPC.
+    """
+    with _lock:
+        _new_vpcs.add((ec2.meta.region_name, vpc_id))
+
+
+def invalidate(kind=None, names=None):
+    """
+    Drop cached lookups, e.g. after a resource is created or deleted elsewhere.
+
+    :param kind: Only drop entries of this kind (optional).
+    :param names: Only drop entries with these names (optional).
+    """
+    with _lock:
+        for key in list(_cache):
+            if (kind is None or key[0] == kind) and (names is None or key[3] in names):
+                del _cache[key]
+        if kind is None and names is None:
+            _new_vpcs.clear()
@@ -0,0 +1,310 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.clients import get_client
+from functions.resolver import AmbiguousMatchError, iter_resources, remember
+
+_lock = threading.Lock()
+_snapshots = {}
+
+
+def _name_tag(resource):
+    for tag in resource.get('Tags', []):
+        if tag['Key'] == 'Name':
+            return tag['Value']
+    return None
+
+
+class VpcSnapshot:
+    """
+    In-memory index of one VPC's subnets, Internet Gateway, route tables, NAT gateways
+    and Elastic IPs.
+
+    Loaded once per run by load_vpc_snapshot(); the create paths check it instead of
+    describing each resource again and record what they create, so it stays current
+    for the rest of the run.
+    """
+
+    def __init__(self, region, vpc):
+        self.region = region
+        self.vpc = vpc
+        self.vpc_id = vpc['VpcId']
+        self.subnets = {}
+        self.internet_gateway = None
+        self.route_tables = {}
+        self.nat_gateways = {}
+        self.addresses = {}
+        self._lock = threading.Lock()
+
+    # Lookups
+
+    def subnet(self, name):
+        return self.subnets.get(name)
+
+    def internet_gateway_id(self):
+        return self.internet_gateway['InternetGatewayId'] if self.internet_gateway else None
+
+    def route_table_id(self, name):
+        for route_table in self.route_tables.values():
+            if _name_tag(route_table) == name:
+                return route_table['RouteTableId']
+        return None
+
+    def default_route_table_id(self):
+        for route_table in self.route_tables.values():
+            if any(association.get('Main') for association in route_table.get('Associations', [])):
+                return route_table['RouteTableId']
+        return None
+
+    def subnet_associations(self):
+        """Map subnet ID -> explicit route table association."""
+        associations = {}
+        for route_table in self.route_tables.values():
+            for association in route_table.get('Associations', []):
+                if association.get('SubnetId'):
+                    associations[association['SubnetId']] = association
+        return associations
+
+    def nat_gateway(self, subnet_id=None):
+        """Return an available or pending NAT gateway in the VPC (optionally in one subnet)."""
+        for nat_gateway in self.nat_gateways.values():
+            if nat_gateway['State'] in ('available', 'pending') and subnet_id in (None, nat_gateway['SubnetId']):
+                return nat_gateway
+        return None
+
+    def route(self, route_table_id, destination_cidr):
+        """Return the route to destination_cidr in a route table, whatever its state (e.g. 'blackhole')."""
+        route_table = self.route_tables.get(route_table_id) or {}
+        for route in route_table.get('Routes', []):
+            if route.get('DestinationCidrBlock') == destination_cidr:
+                return route
+        return None
+
+    def has_route(self, route_table_id, destination_cidr, **target):
+        """
+        Check whether a route table already routes destination_cidr to the given target.
+
+        :param target: One route target, e.g. GatewayId='igw-...' or NatGatewayId='nat-...'.
+        """
+        route_table = self.route_tables.get(route_table_id)
+        if not route_table:
+            return False
+        for route in route_table.get('Routes', []):
+            if route.get('DestinationCidrBlock') == destination_cidr and route.get('State', 'active') == 'active':
+                return all(route.get(key) == value for key, value in target.items())
+        return False
+
+    def tagged_resources(self):
+        """
+        List the VPC and everything indexed in it that carries tags.
+
+        :return: List of (resource ID, 'Tags' list) tuples: the VPC, subnets, Internet
+                 Gateway, route tables and available or pending NAT gateways.
+        """
+        with self._lock:
+            return [(resource_id, list(resource.get('Tags', []))) for resource_id, resource in self._taggable()
+                    if resource.get('State') in (None, 'available', 'pending')]
+
+    def _taggable(self):
+        resources = [(self.vpc_id, self.vpc)]
+        resources += [(subnet['SubnetId'], subnet) for subnet in self.subnets.values()]
+        if self.internet_gateway:
+            resources.append((self.internet_gateway['InternetGatewayId'], self.internet_gateway))
+        resources += list(self.route_tables.items())
+        resources += list(self.nat_gateways.items())
+        return resources
+
+    # Updates from the create paths
+
+    def record_subnet(self, name, subnet):
+        with self._lock:
+            self.subnets[name] = subnet
+
+    def record_internet_gateway(self, internet_gateway_id, tags=None):
+        with self._lock:
+            self.internet_gateway = {
+                'InternetGatewayId': internet_gateway_id,
+                'Attachments': [{'VpcId': self.vpc_id, 'State': 'available'}],
+                'Tags': tags or []
+            }
+
+    def record_route_table(self, route_table):
+        with self._lock:
+            route_table.setdefault('Associations', [])
+            route_table.setdefault('Routes', [])
+            self.route_tables[route_table['RouteTableId']] = route_table
+
+    def record_association(self, route_table_id, subnet_id, association_id):
+        with self._lock:
+            for route_table in self.route_tables.values():
+                route_table['Associations'] = [association for association in route_table.get('Associations', [])
+                                               if association.get('SubnetId') != subnet_id]
+            if route_table_id in self.route_tables:
+                self.route_tables[route_table_id]['Associations'].append({
+                    'RouteTableAssociationId': association_id,
+                    'RouteTableId': route_table_id,
+                    'SubnetId': subnet_id,
+                    'Main': False
+                })
+
+    def record_route(self, route_table_id, route):
+        with self._lock:
+            if route_table_id in self.route_tables:
+                routes = self.route_tables[route_table_id].setdefault('Routes', [])
+                routes[:] = [existing for existing in routes
+                             if existing.get('DestinationCidrBlock') != route['DestinationCidrBlock']]
+                routes.append(dict(route, State='active'))
+
+    def record_nat_gateway(self, nat_gateway):
+        with self._lock:
+            self.nat_gateways[nat_gateway['NatGatewayId']] = nat_gateway
+
+    def record_tags(self, resource_ids, tags):
+        """Merge a tag dictionary into the indexed resources with these IDs."""
+        resource_ids = set(resource_ids)
+        with self._lock:
+            for resource_id, resource in self._taggable():
+                if resource_id in resource_ids:
+                    merged = {tag['Key']: tag.get('Value') for tag in resource.get('Tags', [])}
+                    merged.update(tags)
+                    resource['Tags'] = [{'Key': key, 'Value': value} for key, value in merged.items()]
+
+
+def _index_by_name(kind, resources, id_key):
+    """Index resources by Name tag, refusing names that belong to more than one resource."""
+    indexed, ambiguous = {}, {}
+    for resource in resources:
+        name = _name_tag(resource)
+        if name in indexed:
+            ambiguous.setdefault(name, [indexed[name][id_key]]).append(resource[id_key])
+        indexed[name] = resource
+    if ambiguous:
+        raise AmbiguousMatchError(kind, ambiguous)
+    return indexed
+
+
+def load_vpc_snapshot(vpc_name, subnet_names, route_table_names, region='us-east-1'):
+    """
+    Fetch the VPC, subnets, Internet Gateways, route tables, NAT gateways and Elastic IPs
+    concurrently and index everything that belongs to the VPC.
+
+    The Name-filtered describe calls go out at once and are read page by page; the Internet
+    Gateway and NAT gateway calls wait for the VPC ID so EC2 filters them to this VPC, and
+    the Elastic IPs come from the NAT gateways' own address lists. A no-op re-run costs about two round
+    trips. Only if the VPC's main route table is not tagged yet does another,
+    VPC-scoped route table call follow. The resolver cache is primed with every name
+    looked up, hits and misses alike (subnets scoped to the VPC).
+
+    :param vpc_name: The VPC's Name tag.
+    :param subnet_names: Names of the subnets the build manages.
+    :param route_table_names: Names of the route tables the build manages.
+    :param region: The AWS region.
+    :return: VpcSnapshot, or None if the VPC does not exist yet.
+    :raises AmbiguousMatchError: If the VPC name, or a subnet or route table name inside
+                                 the VPC, belongs to more than one resource.
+    """
+    ec2 = get_client('ec2', region)
+
+    def by_name(operation, names):
+        return lambda: list(iter_resources(ec2, operation, [{'Name': 'tag:Name', 'Values': list(names)}]))
+
+    def in_vpc(operation, vpc_filter, filters=()):
+        def request():
+            vpcs = futures['vpcs'].result()
+            if len(vpcs) != 1:
+                return []
+            return list(iter_resources(ec2, operation, [{'Name': vpc_filter, 'Values': [vpcs[0]['VpcId']]}, *filters]))
+        return request
+
+    requests = {
+        'vpcs': by_name('describe_vpcs', [vpc_name]),
+        'subnets': by_name('describe_subnets', subnet_names),
+        # By attachment, not by name: an untagged or renamed gateway on the VPC must not get a twin
+        'internet_gateways': in_vpc('describe_internet_gateways', 'attachment.vpc-id'),
+        'route_tables': by_name('describe_route_tables', route_table_names),
+        'nat_gateways': in_vpc('describe_nat_gateways', 'vpc-id',
+                               [{'Name': 'state', 'Values': ['available', 'pending']}]),
+    }
+    # One worker per request: the Internet Gateway and NAT gateway calls block on the VPC lookup
+    futures = {}
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        for name, request in requests.items():
+            futures[name] = pool.submit(request)
+    results = {name: future.result() for name, future in futures.items()}
+
+    if len(results['vpcs']) > 1:
+        raise AmbiguousMatchError('vpc', {vpc_name: [vpc['VpcId'] for vpc in results['vpcs']]})
+    vpc = results['vpcs'][0] if results['vpcs'] else None
+    remember(ec2, 'vpc', vpc_name, {'VpcId': vpc['VpcId'], 'CidrBlock': vpc.get('CidrBlock')} if vpc else None)
+    subnets = _index_by_name('subnet', [subnet for subnet in results['subnets']
+                                        if vpc and subnet.get('VpcId') == vpc['VpcId']], 'SubnetId')
+    if not vpc:
+        return None
+    for subnet_name in subnet_names:
+        subnet = subnets.get(subnet_name)
+        remember(ec2, 'subnet', subnet_name, {
+            'SubnetId': subnet['SubnetId'],
+            'AvailabilityZone': subnet.get('AvailabilityZone'),
+            'CidrBlock': subnet.get('CidrBlock'),
+            'VpcId': subnet.get('VpcId'),
+        } if subnet else None, vpc_id=vpc['VpcId'])
+
+    snapshot = VpcSnapshot(region, vpc)
+    snapshot.subnets = subnets
+    for internet_gateway in results['internet_gateways']:
+        if any(attachment.get('VpcId') == snapshot.vpc_id for attachment in internet_gateway.get('Attachments', [])):
+            snapshot.internet_gateway = internet_gateway
+    route_tables = [route_table for route_table in results['route_tables'] if route_table.get('VpcId') == snapshot.vpc_id]
+    _index_by_name('route-table', route_tables, 'RouteTableId')
+    snapshot.route_tables = {route_table['RouteTableId']: route_table for route_table in route_tables}
+    if not snapshot.default_route_table_id():
+        for route_table in iter_resources(ec2, 'describe_route_tables', [{'Name': 'vpc-id', 'Values': [snapshot.vpc_id]}]):
+            snapshot.route_tables[route_table['RouteTableId']] = route_table
+    snapshot.nat_gateways = {nat_gateway['NatGatewayId']: nat_gateway for nat_gateway in results['nat_gateways']}
+    # The NAT gateways already carry their Elastic IPs; describe_addresses cannot be paged or filtered by VPC
+    snapshot.addresses = {address['AllocationId']: dict(address, Domain='vpc')
+                          for nat_gateway in snapshot.nat_gateways.values()
+                          for address in nat_gateway.get('NatGatewayAddresses', []) if address.get('AllocationId')}
+
+    for route_table_name in route_table_names:
+        route_table_id = snapshot.route_table_id(route_table_name)
+        remember(ec2, 'route-table', route_table_name,
+                 {'RouteTableId': route_table_id, 'VpcId': snapshot.vpc_id} if route_table_id else None,
+                 vpc_id=snapshot.vpc_id)
+
+    with _lock:
+        _snapshots[(region, snapshot.vpc_id)] = snapshot
+    return snapshot
+
+
+def get_snapshot(vpc_id, region='us-east-1'):
+    """
+    Return the snapshot loaded for a VPC in this run, or None if there is none.
+
+    :param vpc_id: The ID of the VPC.
+    :param region: The AWS region.
+    """
+    with _lock:
+        return _snapshots.get((region, vpc_id))
+
+
+def find_route_table_snapshot(route_table_id, region='us-east-1'):
+    """
+    Return the loaded snapshot whose VPC contains a route table, or None.
+
+    :param route_table_id: The ID of the route table.
+    :param region: The AWS region.
+    """
+    with _lock:
+        for (snapshot_region, _), snapshot in _snapshots.items():
+            if snapshot_region == region and route_table_id in snapshot.route_tables:
+                return snapshot
+    return None
+
+
+def drop_snapshot(vpc_id=None, region=None):
+    """Forget loaded snapshots (all of them, or those matching vpc_id/region)."""
+    with _lock:
+        for key in list(_snapshots):
+            if (region is None or key[0] == region) and (vpc_id is None or key[1] == vpc_id):
+                del _snapshots[key]
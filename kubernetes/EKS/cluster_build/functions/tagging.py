@@ -0,0 +1,64 @@
+# EC2 accepts at most 1000 resource IDs per create_tags call
+TAG_BATCH_SIZE = 1000
+
+
+def common_tags(settings):
+    """
+    The tag set every EC2 resource the build creates carries: cluster_config.common_tags plus owner.
+
+    :param settings: The cluster_config module or a per-cluster copy of it.
+    :return: Dictionary of tag key -> value.
+    """
+    return dict(getattr(settings, 'common_tags', None) or {}, owner=settings.owner)
+
+
+def tag_list(tags, name=None):
+    """
+    Turn a tag dictionary into the EC2 [{'Key': ..., 'Value': ...}] form.
+
+    :param tags: Dictionary of tag key -> value.
+    :param name: Value of the resource's own Name tag (optional).
+    :return: List of tag dictionaries.
+    """
+    tags = dict(tags, Name=name) if name else tags
+    return [{'Key': key, 'Value': value} for key, value in tags.items()]
+
+
+def tag_specifications(resource_type, tags, name=None):
+    """
+    TagSpecifications for a create_* call, so the resource exists tagged from the start.
+
+    :param resource_type: EC2 resource type, e.g. 'vpc', 'natgateway', 'elastic-ip'.
+    :param tags: Dictionary of tag key -> value.
+    :param name: Value of the resource's own Name tag (optional).
+    :return: List with one tag specification.
+    """
+    return [{'ResourceType': resource_type, 'Tags': tag_list(tags, name)}]
+
+
+def missing_tags(resource_tags, tags):
+    """
+    Return the tags a resource lacks or carries with another value.
+
+    :param resource_tags: The resource's 'Tags' list as EC2 describes it.
+    :param tags: Dictionary of tag key -> desired value.
+    :return: Dictionary of tag key -> desired value; empty if the resource is tagged.
+    """
+    current = {tag['Key']: tag.get('Value') for tag in resource_tags or []}
+    return {key: value for key, value in tags.items() if current.get(key) != value}
+
+
+def tag_resources(ec2, resource_ids, tags, batch_size=TAG_BATCH_SIZE):
+    """
+    Apply one tag set to many resources with as few create_tags calls as possible.
+
+    :param ec2: EC2 client.
+    :param resource_ids: IDs of the resources (any EC2 resource type, mixed).
+    :param tags: Dictionary of tag key -> value.
+    :param batch_size: Resource IDs per call.
+    :return: Number of create_tags calls made.
+    """
+    resource_ids = list(resource_ids)
+    for start in range(0, len(resource_ids), batch_size):
+        ec2.create_tags(Resources=resource_ids[start:start + batch_size], Tags=tag_list(tags))
+    return (len(resource_ids) + batch_size - 1) // batch_size
@@ -0,0 +1,365 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from functions.clients import get_client
+from functions.create_role_with_policies import describe_role
+from functions.launch_template import launch_template_name
+from functions.resolver import find_unique, invalidate, iter_resources
+from functions.snapshot import drop_snapshot
+from functions.waiters import wait_for_resources
+
+# Error codes that mean the resource is already gone, so a re-run of a half-finished teardown carries on
+GONE_CODES = {
+    'InvalidVpcID.NotFound', 'InvalidSubnetID.NotFound', 'InvalidInternetGatewayID.NotFound', 'Gateway.NotAttached',
+    'InvalidRouteTableID.NotFound', 'InvalidRoute.NotFound', 'InvalidAssociationID.NotFound', 'NatGatewayNotFound',
+    'InvalidAllocationID.NotFound', 'NoSuchEntity', 'ResourceNotFoundException',
+    'InvalidLaunchTemplateId.NotFound', 'InvalidLaunchTemplateName.NotFoundException',
+}
+
+# ENIs and public IPs of a deleted cluster, node group or NAT gateway linger for a few
+# minutes; deletes that fail on them are retried every DEPENDENCY_DELAY seconds until
+# DEPENDENCY_TIMEOUT has passed.
+DEPENDENCY_CODES = {'DependencyViolation'}
+DEPENDENCY_DELAY = 10
+DEPENDENCY_TIMEOUT = 600
+
+
+def _tag(resource, key):
+    return next((tag['Value'] for tag in resource.get('Tags', []) if tag['Key'] == key), None)
+
+
+def _delete(operation, **kwargs):
+    """
+    Call a delete/detach/release API, retrying while dependencies are still being cleaned up.
+
+    :param operation: Bound client method, e.g. ec2.delete_subnet.
+    :return: True if the resource was deleted now, False if it was already gone.
+    """
+    deadline = time.monotonic() + DEPENDENCY_TIMEOUT
+    while True:
+        try:
+            operation(**kwargs)
+            return True
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in GONE_CODES:
+                return False
+            if code not in DEPENDENCY_CODES or time.monotonic() + DEPENDENCY_DELAY > deadline:
+                raise
+        time.sleep(DEPENDENCY_DELAY)
+
+
+def _delete_all(func, items, max_workers=8):
+    """
+    Run func(item) for every item concurrently.
+
+    :return: Dictionary of item -> error message for the items that failed.
+    """
+    if not items:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = {item: pool.submit(func, item) for item in items}
+    failures = {}
+    for item, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            failures[item] = str(e)
+    return failures
+
+
+def _discover_role(iam_client, role_name):
+    role, attached = describe_role(iam_client, role_name)
+    if not role:
+        return None
+    paginator = iam_client.get_paginator('list_role_policies')
+    inline = [name for page in paginator.paginate(RoleName=role_name) for name in page['PolicyNames']]
+    return {'owner': _tag(role, 'owner'), 'policies': sorted(attached), 'inline_policies': inline}
+
+
+def _discover_cluster(eks_client, cluster_name):
+    try:
+        cluster = eks_client.describe_cluster(name=cluster_name)['cluster']
+    except eks_client.exceptions.ResourceNotFoundException:
+        return None, {}
+    paginator = eks_client.get_paginator('list_nodegroups')
+    names = [name for page in paginator.paginate(clusterName=cluster_name) for name in page['nodegroups']]
+    nodegroups = {}
+    for name in names:
+        try:
+            nodegroups[name] = eks_client.describe_nodegroup(clusterName=cluster_name, nodegroupName=name)['nodegroup']['status']
+        except eks_client.exceptions.ResourceNotFoundException:
+            continue
+    return cluster, nodegroups
+
+
+def discover(settings, max_workers=8):
+    """
+    Find everything the build scripts created for one cluster, by the names and owner tags they use.
+
+    The EKS cluster (with every node group in it), the node groups' launch templates,
+    the two IAM roles and the VPC are looked up by name; each must carry settings.owner
+    in its owner tag, anything else
+    is listed under 'skipped' and left alone. A VPC name that matches several VPCs
+    raises AmbiguousMatchError instead of picking one. Inside an owned VPC everything that blocks
+    deleting it is collected: subnets, NAT gateways and their Elastic IPs, attached
+    Internet Gateways, non-main route tables and the gateway routes of the main one.
+    Every lookup runs concurrently; the VPC-scoped ones start as soon as the VPC ID is known.
+
+    :param settings: The cluster_config module or a per-cluster copy of it.
+    :param max_workers: Maximum number of lookups running at once.
+    :return: Inventory dictionary for plan_teardown() and the delete_* functions.
+    """
+    region = settings.region_name
+    ec2 = get_client('ec2', region)
+    eks_client = get_client('eks', region)
+    iam_client = get_client('iam', None)
+    role_names = list(dict.fromkeys([settings.worker_nodes_role_name, settings.control_plane_role_name]))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Read the VPC itself rather than the resolver cache: the owner check needs its tags
+        vpc_future = pool.submit(find_unique, ec2, 'describe_vpcs', [{'Name': 'tag:Name', 'Values': [settings.vpc_name]}],
+                                 'vpc', 'VpcId')
+
+        def in_vpc(operation, filter_name='vpc-id', extra=()):
+            def lookup():
+                vpc = vpc_future.result()
+                if not vpc or _tag(vpc, 'owner') != settings.owner:
+                    return []
+                return list(iter_resources(ec2, operation, [{'Name': filter_name, 'Values': [vpc['VpcId']]}, *extra]))
+            return pool.submit(lookup)
+
+        subnets_future = in_vpc('describe_subnets')
+        nat_future = in_vpc('describe_nat_gateways', extra=[{'Name': 'state', 'Values': ['pending', 'available', 'deleting']}])
+        igw_future = in_vpc('describe_internet_gateways', 'attachment.vpc-id')
+        route_tables_future = in_vpc('describe_route_tables')
+        cluster_future = pool.submit(_discover_cluster, eks_client, settings.cluster_name)
+        launch_templates_future = pool.submit(lambda: list(iter_resources(ec2, 'describe_launch_templates', [
+            {'Name': 'launch-template-name', 'Values': [
+                launch_template_name(settings.cluster_name, nodegroup_name)
+                for nodegroup_name in (settings.system_nodegroup_name, settings.application_nodegroup_name)]}])))
+        role_futures = {role_name: pool.submit(_discover_role, iam_client, role_name)
+                        for role_name in role_names}
+
+    inventory = {
+        'region': region, 'cluster': None, 'nodegroups': {}, 'launch_templates': {}, 'roles': {}, 'vpc_id': None,
+        'subnets': {},
+        'nat_gateways': {}, 'addresses': [], 'internet_gateways': [], 'route_tables': {}, 'routes': [], 'skipped': [],
+    }
+
+    cluster, nodegroups = cluster_future.result()
+    if cluster and cluster.get('tags', {}).get('owner') != settings.owner:
+        inventory['skipped'].append(f"cluster {settings.cluster_name} (owner {cluster.get('tags', {}).get('owner')!r})")
+    elif cluster:
+        inventory['cluster'] = {'name': cluster['name'], 'status': cluster['status']}
+        inventory['nodegroups'] = nodegroups
+
+    for launch_template in launch_templates_future.result():
+        name = launch_template['LaunchTemplateName']
+        if _tag(launch_template, 'owner') != settings.owner:
+            inventory['skipped'].append(f"launch template {name} (owner {_tag(launch_template, 'owner')!r})")
+        else:
+            inventory['launch_templates'][launch_template['LaunchTemplateId']] = name
+
+    for role_name, future in role_futures.items():
+        role = future.result()
+        if role and role.pop('owner') != settings.owner:
+            inventory['skipped'].append(f"role {role_name} (not tagged owner={settings.owner})")
+        elif role:
+            inventory['roles'][role_name] = role
+
+    vpc = vpc_future.result()
+    if vpc and _tag(vpc, 'owner') != settings.owner:
+        inventory['skipped'].append(f"VPC {settings.vpc_name} {vpc['VpcId']} (owner {_tag(vpc, 'owner')!r})")
+    elif vpc:
+        inventory['vpc_id'] = vpc['VpcId']
+        inventory['subnets'] = {subnet['SubnetId']: _tag(subnet, 'Name') or subnet['SubnetId']
+                                for subnet in subnets_future.result()}
+        for nat_gateway in nat_future.result():
+            inventory['nat_gateways'][nat_gateway['NatGatewayId']] = nat_gateway['State']
+            inventory['addresses'] += [address['AllocationId'] for address in nat_gateway.get('NatGatewayAddresses', [])
+                                       if address.get('AllocationId')]
+        inventory['internet_gateways'] = [igw['InternetGatewayId'] for igw in igw_future.result()]
+        for route_table in route_tables_future.result():
+            if any(association.get('Main') for association in route_table.get('Associations', [])):
+                # The main route table goes with the VPC; only its routes to gateways are removed
+                inventory['routes'] += [(route_table['RouteTableId'], route['DestinationCidrBlock'])
+                                        for route in route_table.get('Routes', [])
+                                        if route.get('DestinationCidrBlock') and route.get('GatewayId') != 'local']
+                continue
+            inventory['route_tables'][route_table['RouteTableId']] = {
+                'name': _tag(route_table, 'Name') or route_table['RouteTableId'],
+                'associations': [association['RouteTableAssociationId']
+                                 for association in route_table.get('Associations', [])],
+            }
+    return inventory
+
+
+def delete_eks_nodegroups(cluster_name, nodegroups, region='us-east-1', deadline=1800):
+    """
+    Delete node groups concurrently and wait for all of them to be gone together.
+
+    :param cluster_name: Name of the EKS cluster.
+    :param nodegroups: Dictionary of node group name -> current status; DELETING ones are only waited on.
+    :param region: The AWS region of the cluster.
+    :param deadline: Maximum seconds to wait for all node groups.
+    :return: Dictionary of node group name -> error message for the ones that failed.
+    """
+    eks_client = get_client('eks', region)
+    failures = _delete_all(
+        lambda name: _delete(eks_client.delete_nodegroup, clusterName=cluster_name, nodegroupName=name),
+        [name for name, status in nodegroups.items() if status != 'DELETING'])
+    pending = [name for name in nodegroups if name not in failures]
+    if pending:
+        print(f"[ℹ️] Waiting for node groups {', '.join(pending)} to be deleted...")
+        waited = wait_for_resources([('eks_nodegroup_deleted', (cluster_name, name)) for name in pending],
+                                    region=region, deadline=deadline)
+        failures.update({nodegroup_name: error for (_, (_, nodegroup_name)), error in waited['failures'].items()})
+    for name in pending:
+        if name not in failures:
+            print(f"[✅] Node group '{name}' deleted.")
+    return failures
+
+
+def delete_eks_cluster(cluster_name, status, region='us-east-1'):
+    """
+    Delete an EKS cluster (its node groups must be gone) and wait until it is.
+
+    :param status: The cluster's current status; a DELETING cluster is only waited on.
+    :raises RuntimeError: If the cluster could not be deleted.
+    """
+    eks_client = get_client('eks', region)
+    if status != 'DELETING':
+        _delete(eks_client.delete_cluster, name=cluster_name)
+    print(f"[ℹ️] Waiting for cluster '{cluster_name}' to be deleted...")
+    waited = wait_for_resources([('eks_cluster_deleted', cluster_name)], region=region)
+    if waited['failures']:
+        raise RuntimeError('; '.join(waited['failures'].values()))
+    print(f"[✅] Cluster '{cluster_name}' deleted.")
+
+
+def delete_launch_templates(launch_template_ids, region='us-east-1'):
+    """
+    Delete launch templates concurrently (with all their versions); their node groups must be gone.
+
+    :return: Dictionary of launch template ID -> error message for the ones that failed.
+    """
+    ec2 = get_client('ec2', region)
+    return _delete_all(lambda launch_template_id: _delete(ec2.delete_launch_template,
+                                                          LaunchTemplateId=launch_template_id), launch_template_ids)
+
+
+def delete_iam_role(role_name, policies, inline_policies):
+    """
+    Detach every managed policy and delete every inline policy concurrently, then delete the role.
+
+    :raises RuntimeError: If a policy could not be removed or the role could not be deleted.
+    """
+    iam_client = get_client('iam', None)
+    failures = _delete_all(lambda policy_arn: _delete(iam_client.detach_role_policy, RoleName=role_name,
+                                                      PolicyArn=policy_arn), policies)
+    failures.update(_delete_all(lambda policy_name: _delete(iam_client.delete_role_policy, RoleName=role_name,
+                                                            PolicyName=policy_name), inline_policies))
+    if failures:
+        raise RuntimeError(', '.join(f"{policy}: {error}" for policy, error in failures.items()))
+    _delete(iam_client.delete_role, RoleName=role_name)
+    print(f"[✅] Role '{role_name}' deleted ({len(policies) + len(inline_policies)} policy(ies) removed).")
+
+
+def delete_nat_gateways(nat_gateways, region='us-east-1'):
+    """
+    Delete NAT gateways concurrently and wait for all of them in one batched waiter.
+
+    :param nat_gateways: Dictionary of NAT gateway ID -> current state; deleting ones are only waited on.
+    :return: Dictionary of NAT gateway ID -> error message for the ones that failed.
+    """
+    ec2 = get_client('ec2', region)
+    failures = _delete_all(lambda nat_gateway_id: _delete(ec2.delete_nat_gateway, NatGatewayId=nat_gateway_id),
+                           [nat_gateway_id for nat_gateway_id, state in nat_gateways.items() if state != 'deleting'])
+    pending = [nat_gateway_id for nat_gateway_id in nat_gateways if nat_gateway_id not in failures]
+    if pending:
+        print(f"[ℹ️] Waiting for NAT Gateways {', '.join(pending)} to be deleted...")
+        waited = wait_for_resources([('nat_gateway_deleted', nat_gateway_id) for nat_gateway_id in pending], region=region)
+        failures.update({nat_gateway_id: error for (_, nat_gateway_id), error in waited['failures'].items()})
+    for nat_gateway_id in pending:
+        if nat_gateway_id not in failures:
+            print(f"[✅] NAT Gateway {nat_gateway_id} deleted.")
+    return failures
+
+
+def release_addresses(allocation_ids, region='us-east-1'):
+    """Release Elastic IPs concurrently; return allocation ID -> error message for the ones that failed."""
+    ec2 = get_client('ec2', region)
+    failures = _delete_all(lambda allocation_id: _delete(ec2.release_address, AllocationId=allocation_id), allocation_ids)
+    for allocation_id in allocation_ids:
+        if allocation_id not in failures:
+            print(f"[✅] Released Elastic IP {allocation_id}.")
+    return failures
+
+
+def delete_route_tables(route_tables, routes, region='us-east-1'):
+    """
+    Remove the main route table's gateway routes, and disassociate and delete every other route table.
+
+    Each route table is handled in its own thread: its associations are removed
+    concurrently, then the table itself.
+
+    :param route_tables: Dictionary of route table ID -> {'name', 'associations'}.
+    :param routes: List of (route table ID, destination CIDR) on the main route table.
+    :return: Dictionary of route table ID or route -> error message for the ones that failed.
+    """
+    ec2 = get_client('ec2', region)
+
+    def delete_route_table(route_table_id):
+        failures = _delete_all(lambda association_id: _delete(ec2.disassociate_route_table, AssociationId=association_id),
+                               route_tables[route_table_id]['associations'])
+        if failures:
+            raise RuntimeError(', '.join(f"{association_id}: {error}" for association_id, error in failures.items()))
+        _delete(ec2.delete_route_table, RouteTableId=route_table_id)
+        print(f"[✅] Route Table '{route_tables[route_table_id]['name']}' {route_table_id} deleted.")
+
+    def delete_route(route):
+        _delete(ec2.delete_route, RouteTableId=route[0], DestinationCidrBlock=route[1])
+        print(f"[✅] Removed route {route[1]} from the main Route Table {route[0]}.")
+
+    failures = _delete_all(delete_route, routes)
+    failures.update(_delete_all(delete_route_table, list(route_tables)))
+    return failures
+
+
+def delete_internet_gateways(internet_gateway_ids, vpc_id, region='us-east-1'):
+    """Detach and delete Internet Gateways concurrently; return ID -> error message for the ones that failed."""
+    ec2 = get_client('ec2', region)
+
+    def delete_internet_gateway(internet_gateway_id):
+        _delete(ec2.detach_internet_gateway, InternetGatewayId=internet_gateway_id, VpcId=vpc_id)
+        _delete(ec2.delete_internet_gateway, InternetGatewayId=internet_gateway_id)
+        print(f"[✅] Internet Gateway {internet_gateway_id} detached and deleted.")
+
+    return _delete_all(delete_internet_gateway, internet_gateway_ids)
+
+
+def delete_subnets(subnets, region='us-east-1'):
+    """
+    Delete subnets concurrently.
+
+    :param subnets: Dictionary of subnet ID -> Name.
+    :return: Dictionary of subnet ID -> error message for the ones that failed.
+    """
+    ec2 = get_client('ec2', region)
+
+    def delete_subnet(subnet_id):
+        _delete(ec2.delete_subnet, SubnetId=subnet_id)
+        print(f"[✅] Subnet '{subnets[subnet_id]}' {subnet_id} deleted.")
+
+    return _delete_all(delete_subnet, list(subnets))
+
+
+def delete_vpc(vpc_id, region='us-east-1'):
+    """Delete the VPC (with its main route table) and forget every cached lookup that pointed into it."""
+    _delete(get_client('ec2', region).delete_vpc, VpcId=vpc_id)
+    invalidate()
+    drop_snapshot(vpc_id, region)
+    print(f"[✅] VPC {vpc_id} deleted.")
@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import (
+    ClientError, ConnectionClosedError, ConnectionError as BotocoreConnectionError, ReadTimeoutError,
+)
+
+from functions.trace import set_attempt
+
+# Error codes AWS uses when a caller exceeds its request rate
+THROTTLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled', 'RequestThrottledException',
+    'RequestLimitExceeded', 'TooManyRequestsException', 'SlowDown', 'PriorRequestNotComplete',
+}
+
+# Error codes worth retrying that are not throttles
+TRANSIENT_CODES = {
+    'InternalError', 'InternalFailure', 'ServiceUnavailable', 'ServiceUnavailableException',
+    'ServerException', 'RequestTimeout', 'RequestTimeoutException',
+}
+
+# Method name prefixes of read-only operations. A read timeout or dropped connection may
+# come after AWS ran the request, so only these are sent again after one.
+READ_ONLY_PREFIXES = ('describe_', 'list_', 'get_')
+
+# Client-side request budget per service as (requests per second, burst). Every region
+# gets its own bucket with these settings; change them with configure_rate().
+RATES = {
+    'ec2': (20.0, 50),
+    'eks': (10.0, 20),
+    'iam': (10.0, 20),
+    'sts': (20.0, 50),
+    'default': (10.0, 20),
+}
+
+# Decorrelated-jitter retry policy for throttled and transient errors
+RETRY_POLICY = {
+    'max_attempts': 8,
+    'base_delay': 0.5,
+    'max_delay': 20.0,
+}
+
+_lock = threading.Lock()
+_buckets = {}
+_stats = {}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() reserves a token and sleeps until it is due,
+    so concurrent callers queue fairly instead of spinning.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping if the bucket is empty. Returns the seconds slept."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def _counters(service, region):
+    key = (service, region)
+    counters = _stats.get(key)
+    if counters is None:
+        counters = _stats[key] = {
+            'calls': 0, 'throttles': 0, 'retries': 0, 'gave_up': 0,
+            'token_wait_seconds': 0.0, 'retry_wait_seconds': 0.0,
+        }
+    return counters
+
+
+def _bucket(service, region):
+    key = (service, region)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate, burst = RATES.get(service, RATES['default'])
+            bucket = _buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+
+def configure_rate(service, rate, burst):
+    """
+    Set the request budget for a service. Buckets already handed out keep their old
+    settings until reset_throttle() is called.
+
+    :param service: AWS service name, or 'default' for services without their own entry.
+    :param rate: Requests per second.
+    :param burst: Maximum requests allowed back to back.
+    """
+    with _lock:
+        RATES[service] = (float(rate), burst)
+
+
+def acquire(service, region):
+    """Wait for a token in the (service, region) budget and record the time spent waiting."""
+    waited = _bucket(service, region).acquire()
+    with _lock:
+        counters = _counters(service, region)
+        counters['calls'] += 1
+        counters['token_wait_seconds'] += waited
+
+
+def _error_code(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+
+def _retryable_error(error, operation):
+    """True if the error is a throttle, a transient error, or a lost response to a read-only operation."""
+    code = _error_code(error)
+    if code in THROTTLE_CODES or code in TRANSIENT_CODES or isinstance(error, BotocoreConnectionError):
+        return True
+    return (isinstance(error, (ReadTimeoutError, ConnectionClosedError)) and
+            getattr(operation, '__name__', '').startswith(READ_ONLY_PREFIXES))
+
+
+def call_with_retry(service, region, operation, *args, **kwargs):
+    """
+    Call an AWS operation, retrying throttling and transient errors with decorrelated jitter.
+    Read timeouts and closed connections are retried for Describe*/List*/Get* operations only.
+
+    :param service: AWS service name the operation belongs to (for counters).
+    :param region: AWS region of the client (for counters).
+    :param operation: Bound client method to call.
+    :return: The operation's response.
+    """
+    delay = RETRY_POLICY['base_delay']
+    attempt = 1
+    while True:
+        set_attempt(attempt)
+        try:
+            return operation(*args, **kwargs)
+        except (ClientError, BotocoreConnectionError, ReadTimeoutError, ConnectionClosedError) as e:
+            throttled = _error_code(e) in THROTTLE_CODES
+            retryable = _retryable_error(e, operation)
+            with _lock:
+                counters = _counters(service, region)
+                if throttled:
+                    counters['throttles'] += 1
+                if not retryable or attempt >= RETRY_POLICY['max_attempts']:
+                    if retryable:
+                        counters['gave_up'] += 1
+                    raise
+                delay = min(RETRY_POLICY['max_delay'], random.uniform(RETRY_POLICY['base_delay'], delay * 3))
+                counters['retries'] += 1
+                counters['retry_wait_seconds'] += delay
+            time.sleep(delay)
+            attempt += 1
+
+
+class ThrottledClient:
+    """
+    Wraps a boto3 client so every API method goes through call_with_retry().
+
+    The token budget itself is charged from a before-call hook on the wrapped client,
+    so calls made internally by paginators and waiters are rate limited as well.
+    Paginators also fetch each page through call_with_retry(), so a throttled page
+    is retried instead of ending the iteration. Everything else that is not an API
+    method (meta, exceptions, get_waiter, ...) is passed through untouched.
+    """
+
+    def __init__(self, client, service, region):
+        self._client = client
+        self._service = service
+        self._region = region
+        client.meta.events.register('before-call', lambda **kwargs: acquire(service, region))
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name in self._client.meta.method_to_api_mapping:
+            def call(*args, **kwargs):
+                return call_with_retry(self._service, self._region, attribute, *args, **kwargs)
+            call.__name__ = name
+            call.__doc__ = attribute.__doc__
+            return call
+        return attribute
+
+    def get_paginator(self, operation_name):
+        paginator = self._client.get_paginator(operation_name)
+        # botocore builds the page iterator around the paginator's method; point it at the retrying wrapper
+        paginator._method = getattr(self, operation_name)
+        return paginator
+
+    def __repr__(self):
+        return f"ThrottledClient({self._client!r})"
+
+
+def throttle_stats():
+    """
+    Report per (service, region) counters: calls, throttles, retries, gave_up,
+    token_wait_seconds and retry_wait_seconds.
+
+    :return: Dictionary keyed by 'service/region'.
+    """
+    with _lock:
+        return {f"{service}/{region or 'global'}": dict(counters)
+                for (service, region), counters in sorted(_stats.items(), key=lambda item: (item[0][0], str(item[0][1])))}
+
+
+def reset_throttle():
+    """Drop every bucket and zero the counters."""
+    with _lock:
+        _buckets.clear()
+        _stats.clear()
@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_enabled = False
+_lock = threading.Lock()
+_events = []
+_started = time.perf_counter()
+_attempt = threading.local()
+_NO_SPAN = nullcontext()
+
+
+def enable():
+    """Start recording API calls and spans. Anything recorded earlier is dropped."""
+    global _enabled, _started
+    with _lock:
+        _events.clear()
+        _started = time.perf_counter()
+        _enabled = True
+
+
+def disable():
+    """Stop recording; what was recorded stays available for export."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset_trace():
+    """Drop every recorded event."""
+    with _lock:
+        _events.clear()
+
+
+def _record(event):
+    with _lock:
+        _events.append(event)
+
+
+def set_attempt(attempt):
+    """Tell the tracer which attempt of a retried call the current thread is making (see call_with_retry)."""
+    _attempt.value = attempt
+
+
+# botocore event hooks
+
+def _before_call(model, context, **kwargs):
+    if _enabled:
+        context['trace_started'] = time.perf_counter()
+        context['trace_attempt'] = getattr(_attempt, 'value', 1)
+        # Calls that bypass call_with_retry (paginators, botocore waiters) count as first attempts
+        _attempt.value = 1
+
+
+def _after_call(http_response, parsed, model, context, service, region, **kwargs):
+    started = context.get('trace_started')
+    if started is None:
+        return
+    from functions.throttle import THROTTLE_CODES
+    code = (parsed or {}).get('Error', {}).get('Code')
+    _record({
+        'kind': 'api', 'name': f"{service}.{model.name}", 'service': service, 'region': region or 'global',
+        'operation': model.name, 'start': started - _started, 'end': time.perf_counter() - _started,
+        'thread': threading.current_thread().name, 'status': getattr(http_response, 'status_code', None),
+        'error': code, 'throttled': code in THROTTLE_CODES, 'attempt': context.get('trace_attempt', 1),
+    })
+
+
+def _after_call_error(exception, model, context, service, region, **kwargs):
+    started = context.get('trace_started')
+    if started is None:
+        return
+    _record({
+        'kind': 'api', 'name': f"{service}.{model.name}", 'service': service, 'region': region or 'global',
+        'operation': model.name, 'start': started - _started, 'end': time.perf_counter() - _started,
+        'thread': threading.current_thread().name, 'status': None, 'error': type(exception).__name__,
+        'throttled': False, 'attempt': context.get('trace_attempt', 1),
+    })
+
+
+def instrument(client, service, region):
+    """
+    Hook a botocore client's before-call / after-call events into the tracer.
+
+    The hooks return immediately while tracing is disabled, so instrumented clients cost
+    one flag check per call when nobody is looking.
+
+    :param client: botocore client (not the ThrottledClient wrapper).
+    :param service: AWS service name.
+    :param region: AWS region, or None for global services.
+    """
+    events = client.meta.events
+    events.register('before-call', _before_call)
+    events.register('after-call', lambda **kwargs: _after_call(service=service, region=region, **kwargs))
+    events.register('after-call-error', lambda **kwargs: _after_call_error(service=service, region=region, **kwargs))
+
+
+@contextmanager
+def _span(name, category, track, args):
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = str(e)
+        raise
+    finally:
+        _record({
+            'kind': category, 'name': name, 'start': started - _started, 'end': time.perf_counter() - _started,
+            'thread': track or threading.current_thread().name, 'error': error, 'args': args,
+        })
+
+
+def span(name, category='step', track=None, **args):
+    """
+    Time a block of work (a build step, a waiter, ...) as one span in the trace.
+
+    :param name: Span name shown in the trace viewer.
+    :param category: 'step', 'waiter' or any other grouping.
+    :param track: Row to draw the span on; defaults to the current thread. Give overlapping
+                  async work (waiters) its own track so spans nest correctly.
+    :param args: Extra values stored with the span.
+    :return: Context manager; a shared no-op one while tracing is disabled.
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return _span(name, category, track, args)
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def trace_summary():
+    """
+    Summarize the recorded events.
+
+    :return: Dictionary with 'operations' ('service.Operation' -> calls, attempts, retries,
+             throttles, errors, status counts and p50/p99/max/total milliseconds), 'spans'
+             (category -> name -> seconds) and 'wall_seconds'.
+    """
+    with _lock:
+        events = list(_events)
+
+    operations, latencies, spans = {}, {}, {}
+    for event in events:
+        seconds = event['end'] - event['start']
+        if event['kind'] != 'api':
+            category = spans.setdefault(event['kind'], {})
+            category[event['name']] = round(category.get(event['name'], 0.0) + seconds, 3)
+            continue
+        counters = operations.setdefault(event['name'], {
+            'calls': 0, 'attempts': 0, 'retries': 0, 'throttles': 0, 'errors': 0, 'status': {},
+        })
+        counters['attempts'] += 1
+        counters['calls' if event['attempt'] == 1 else 'retries'] += 1
+        counters['throttles'] += event['throttled']
+        counters['errors'] += bool(event['error'])
+        status = str(event['status'])
+        counters['status'][status] = counters['status'].get(status, 0) + 1
+        latencies.setdefault(event['name'], []).append(seconds * 1000)
+
+    for name, values in latencies.items():
+        values.sort()
+        operations[name].update({
+            'p50_ms': round(_percentile(values, 50), 2),
+            'p99_ms': round(_percentile(values, 99), 2),
+            'max_ms': round(values[-1], 2),
+            'total_ms': round(sum(values), 2),
+        })
+    return {
+        'operations': dict(sorted(operations.items(), key=lambda item: -item[1]['total_ms'])),
+        'spans': spans,
+        'wall_seconds': round(max((event['end'] for event in events), default=0.0), 3),
+    }
+
+
+def write_chrome_trace(path):
+    """
+    Write the recorded events as a Chrome trace-event file (chrome://tracing, Perfetto).
+
+    :param path: Output file path.
+    :return: Number of events written.
+    """
+    with _lock:
+        events = list(_events)
+
+    pid = os.getpid()
+    tracks = {}
+    trace_events = []
+    for event in sorted(events, key=lambda event: event['start']):
+        tid = tracks.setdefault(event['thread'], len(tracks) + 1)
+        args = dict(event.get('args') or {})
+        if event['kind'] == 'api':
+            args.update({key: event[key] for key in ('region', 'status', 'error', 'attempt', 'throttled')})
+        elif event['error']:
+            args['error'] = event['error']
+        trace_events.append({
+            'name': event['name'], 'cat': event['kind'], 'ph': 'X', 'pid': pid, 'tid': tid,
+            'ts': round(event['start'] * 1e6), 'dur': round((event['end'] - event['start']) * 1e6),
+            'args': {key: value for key, value in args.items() if value is not None},
+        })
+    trace_events += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': track}}
+                     for track, tid in tracks.items()]
+
+    with open(path, 'w') as trace_file:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, trace_file)
+    return len(events)
+
+
+def write_summary(path):
+    """
+    Write trace_summary() as JSON.
+
+    :param path: Output file path.
+    :return: The summary dictionary.
+    """
+    summary = trace_summary()
+    with open(path, 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+
+def print_trace_summary(summary, top=10):
+    """
+    Print the slowest operations by total time.
+
+    :param summary: Dictionary returned by trace_summary().
+    :param top: Number of operations to print.
+    """
+    for name, counters in list(summary['operations'].items())[:top]:
+        print(f"[ℹ️] {name}: {counters['calls']} call(s), {counters['retries']} retr(ies), "
+              f"{counters['throttles']} throttle(s), p50 {counters['p50_ms']:.0f}ms, p99 {counters['p99_ms']:.0f}ms, "
+              f"total {counters['total_ms'] / 1000:.1f}s")
+
+
+def export(trace_path=None, summary_path=None):
+    """
+    If tracing is on, print the slowest operations and write the requested files.
+
+    :param trace_path: Where to write the Chrome trace-event file (optional).
+    :param summary_path: Where to write the JSON summary (optional).
+    """
+    if not _enabled:
+        return
+    print_trace_summary(trace_summary())
+    if trace_path:
+        print(f"[ℹ️] Wrote {write_chrome_trace(trace_path)} trace event(s) to {trace_path}.")
+    if summary_path:
+        write_summary(summary_path)
+        print(f"[ℹ️] Wrote the trace summary to {summary_path}.")
@@ -0,0 +1,188 @@
+import ipaddress
+import json
+import re
+
+TAINT_EFFECTS = {'NO_SCHEDULE', 'NO_EXECUTE', 'PREFER_NO_SCHEDULE'}
+CAPACITY_TYPES = {'ON_DEMAND', 'SPOT'}
+NAT_GATEWAY_MODES = {'single', 'per_az'}
+KUBE_PROXY_MODES = {'iptables', 'ipvs'}
+# EC2 allows 50 tags per resource; owner, Name and a subnet's Type are added to common_tags
+MAX_COMMON_TAGS = 47
+
+
+def _network(value, label, errors):
+    try:
+        return ipaddress.ip_network(value)
+    except (TypeError, ValueError) as e:
+        errors.append(f"{label}: {e}")
+        return None
+
+
+def _validate_cidr_plan(cidr_plan):
+    """Check the cidr_plan setting: known keys, AWS prefix limits, and that the subnets fit the VPC."""
+    if not cidr_plan:
+        return []
+    from functions.cidr_plan import PLAN_DEFAULTS
+    errors = []
+    unknown = set(cidr_plan) - set(PLAN_DEFAULTS) - {'regions', 'profiles'}
+    if unknown:
+        errors.append(f"cidr_plan: unknown key(s) {', '.join(sorted(unknown))}")
+    plan = dict(PLAN_DEFAULTS, **cidr_plan)
+    checked = len(errors)
+    supernet = _network(plan['supernet'], 'cidr_plan.supernet', errors)
+    if not 16 <= plan['vpc_prefix'] <= 28:
+        errors.append(f"cidr_plan.vpc_prefix: AWS allows /16 to /28, got /{plan['vpc_prefix']}")
+    if supernet and plan['vpc_prefix'] < supernet.prefixlen:
+        errors.append(f"cidr_plan.vpc_prefix: a /{plan['vpc_prefix']} does not fit in {supernet}")
+    for key in ('public_prefix', 'private_prefix'):
+        if not plan['vpc_prefix'] <= plan[key] <= 28:
+            errors.append(f"cidr_plan.{key}: must be between the VPC's /{plan['vpc_prefix']} and /28, got /{plan[key]}")
+    if plan['az_count'] < 1:
+        errors.append(f"cidr_plan.az_count: must be at least 1, got {plan['az_count']}")
+    elif len(errors) == checked:
+        needed = plan['az_count'] * (2 ** (32 - plan['public_prefix']) + 2 ** (32 - plan['private_prefix']))
+        if needed > 2 ** (32 - plan['vpc_prefix']):
+            errors.append(f"cidr_plan: {plan['az_count']} public /{plan['public_prefix']} and private "
+                          f"/{plan['private_prefix']} subnets need {needed} addresses, a /{plan['vpc_prefix']} has "
+                          f"{2 ** (32 - plan['vpc_prefix'])}")
+    return errors
+
+
+def _validate_common_tags(common_tags):
+    """Check the common_tags setting against EC2's tag limits and the tags the build sets itself."""
+    errors = []
+    if len(common_tags) > MAX_COMMON_TAGS:
+        errors.append(f"common_tags: at most {MAX_COMMON_TAGS} tags, got {len(common_tags)}")
+    for key, value in common_tags.items():
+        if key in ('owner', 'Name', 'Type'):
+            errors.append(f"common_tags: '{key}' is set per resource by the build")
+        elif not isinstance(key, str) or not 1 <= len(key) <= 128 or key.lower().startswith('aws:'):
+            errors.append(f"common_tags: key {key!r} must be 1-128 characters and not start with 'aws:'")
+        if not isinstance(value, str) or len(value) > 256:
+            errors.append(f"common_tags.{key}: value must be a string of at most 256 characters")
+    return errors
+
+
+def _validate_pod_density(config):
+    """Check max_pods against the managed node group limit and prefix_delegation against the instance types."""
+    from functions.pod_density import ENI_LIMITS, MAX_PODS_LARGE
+    errors = []
+    max_pods = getattr(config, 'max_pods', None)
+    if max_pods is not None and not 1 <= max_pods <= MAX_PODS_LARGE:
+        errors.append(f"max_pods: managed node groups allow 1 to {MAX_PODS_LARGE}, got {max_pods}")
+    if getattr(config, 'prefix_delegation', False):
+        for instance_type in config.instance_types:
+            if instance_type in ENI_LIMITS and not ENI_LIMITS[instance_type][3]:
+                errors.append(f"instance_types: {instance_type} is not a Nitro instance; prefix delegation needs one")
+    return errors
+
+
+def _validate_addons(addons):
+    """Check the addons setting: JSON-serializable configuration per add-on, and the kube-proxy/CoreDNS values."""
+    errors = []
+    for addon_name, configuration in addons.items():
+        if not isinstance(configuration, dict):
+            errors.append(f"addons.{addon_name}: configuration must be a dictionary, got {type(configuration).__name__}")
+            continue
+        try:
+            json.dumps(configuration)
+        except (TypeError, ValueError) as e:
+            errors.append(f"addons.{addon_name}: configuration is not JSON-serializable: {e}")
+    kube_proxy = addons.get('kube-proxy')
+    if isinstance(kube_proxy, dict) and kube_proxy.get('mode', 'iptables') not in KUBE_PROXY_MODES:
+        errors.append(f"addons.kube-proxy.mode: must be one of {sorted(KUBE_PROXY_MODES)}, got {kube_proxy['mode']!r}")
+    autoscaling = addons.get('coredns', {}).get('autoScaling', {}) if isinstance(addons.get('coredns'), dict) else {}
+    if autoscaling.get('enabled') and not 1 <= autoscaling.get('minReplicas', 2) <= autoscaling.get('maxReplicas', 10):
+        errors.append(f"addons.coredns.autoScaling: needs 1 <= minReplicas <= maxReplicas, got {autoscaling}")
+    return errors
+
+
+def validate_config(config):
+    """
+    Check the cluster configuration for mistakes without calling AWS.
+
+    Only the standard library is used, so this runs in a few milliseconds and can
+    gate every apply/plan before boto3 is even imported.
+
+    :param config: The cluster_config module (or any object with the same attributes).
+    :return: List of error messages; empty when the configuration is valid.
+    """
+    errors = []
+
+    vpc_network = _network(config.cidr_block, 'cidr_block', errors)
+    subnets = [(f"public_subnet_{az}", az, cidr) for az, cidr in config.public_subnets.items()]
+    subnets += [(f"private_subnet_{az}", az, cidr) for az, cidr in config.private_subnets.items()]
+    networks = []
+    for subnet_name, az, cidr in subnets:
+        if not az.startswith(config.region_name):
+            errors.append(f"{subnet_name}: availability zone {az} is not in region {config.region_name}")
+        network = _network(cidr, subnet_name, errors)
+        if not network:
+            continue
+        if vpc_network and not network.subnet_of(vpc_network):
+            errors.append(f"{subnet_name}: {cidr} is outside the VPC CIDR {config.cidr_block}")
+        for other_name, other in networks:
+            if network.overlaps(other):
+                errors.append(f"{subnet_name}: {cidr} overlaps {other_name} ({other})")
+        networks.append((subnet_name, network))
+
+    if config.nat_gateway_mode not in NAT_GATEWAY_MODES:
+        errors.append(f"nat_gateway_mode: must be one of {sorted(NAT_GATEWAY_MODES)}, got {config.nat_gateway_mode!r}")
+    elif config.nat_gateway_mode == 'per_az':
+        for az in config.private_subnets:
+            if az not in config.public_subnets:
+                errors.append(f"private_subnet_{az}: per_az NAT gateways need a public subnet in {az}")
+    elif config.nat_subnet_az not in config.public_subnets:
+        errors.append(f"nat_subnet_az: {config.nat_subnet_az} has no public subnet")
+    known_subnets = {subnet_name for subnet_name, _, _ in subnets}
+    for subnet_name in config.cluster_subnet_names:
+        if subnet_name not in known_subnets:
+            errors.append(f"cluster_subnet_names: {subnet_name} is not one of the configured subnets")
+
+    service_network = _network(config.service_ipv4_cidr, 'service_ipv4_cidr', errors)
+    if service_network and vpc_network and service_network.overlaps(vpc_network):
+        errors.append(f"service_ipv4_cidr: {config.service_ipv4_cidr} overlaps the VPC CIDR {config.cidr_block}")
+    for cidr in config.public_access_cidrs:
+        _network(cidr, 'public_access_cidrs', errors)
+
+    errors += _validate_cidr_plan(getattr(config, 'cidr_plan', None))
+    errors += _validate_common_tags(getattr(config, 'common_tags', None) or {})
+
+    if not re.fullmatch(r"\d+\.\d+", str(config.kubernetes_version)):
+        errors.append(f"kubernetes_version: expected MAJOR.MINOR, got {config.kubernetes_version!r}")
+
+    errors += _validate_pod_density(config)
+    errors += _validate_addons(getattr(config, 'addons', None) or {})
+    try:
+        specs = config.nodegroup_specs([], None)
+    except ValueError as e:
+        return errors + [f"instance_types: {e}"]
+    for spec in specs:
+        name = spec['nodegroup_name']
+        scaling = spec['scaling_config']
+        if not 0 <= scaling.get('minSize', 0) <= scaling.get('desiredSize', 0) <= scaling.get('maxSize', 0) \
+                or scaling.get('maxSize', 0) < 1:
+            errors.append(f"{name}: scaling_config needs 0 <= minSize <= desiredSize <= maxSize and maxSize >= 1, "
+                          f"got {scaling}")
+        if not spec['instance_types']:
+            errors.append(f"{name}: instance_types is empty")
+        if spec['capacity_type'] not in CAPACITY_TYPES:
+            errors.append(f"{name}: capacity_type must be one of {sorted(CAPACITY_TYPES)}")
+        for taint in spec['taints'] or []:
+            if taint.get('effect') not in TAINT_EFFECTS:
+                errors.append(f"{name}: taint {taint.get('key')} has unknown effect {taint.get('effect')!r}")
+    return errors
+
+
+def print_validation(errors):
+    """
+    Print validation results.
+
+    :param errors: List returned by validate_config().
+    :return: True if there were no errors.
+    """
+    for error in errors:
+        print(f"[❌] {error}")
+    if not errors:
+        print("[✅] Configuration is valid.")
+    return not errors
@@ -0,0 +1,355 @@
+import asyncio
+
+from botocore.exceptions import ClientError
+
+from functions.clients import get_client
+from functions.trace import span
+
+
+class WaitError(Exception):
+    """Raised when a resource reaches a failure state or its deadline passes."""
+
+    def __init__(self, resource_type, resource_id, message):
+        super().__init__(f"{resource_type} {resource_id}: {message}")
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+
+
+def _health_message(resource, default):
+    # health issues of a cluster, node group or add-on, the errors of a failed update, or why a NAT gateway failed
+    issues = resource.get('health', {}).get('issues', []) + resource.get('errors', [])
+    if resource.get('FailureCode') or resource.get('FailureMessage'):
+        issues.append({'code': resource.get('FailureCode'), 'message': ': '.join(
+            part for part in (resource.get('FailureCode'), resource.get('FailureMessage')) if part)})
+    return '; '.join(issue.get('message') or issue.get('errorMessage') or issue.get('code') or issue.get('errorCode', '')
+                     for issue in issues) or default
+
+
+def _describe_nat_gateways(ec2, nat_gateway_ids):
+    nat_gateway_ids = list(nat_gateway_ids)
+    try:
+        response = ec2.describe_nat_gateways(NatGatewayIds=nat_gateway_ids)
+    except ClientError as e:
+        # NAT gateways are eventually consistent: an ID that is not visible yet fails the whole
+        # call with NatGatewayNotFound, so ask for each ID on its own to keep the others' states
+        if e.response.get('Error', {}).get('Code') != 'NatGatewayNotFound':
+            raise
+        if len(nat_gateway_ids) == 1:
+            return {nat_gateway_ids[0]: (None, None)}
+        results = {}
+        for nat_gateway_id in nat_gateway_ids:
+            results.update(_describe_nat_gateways(ec2, [nat_gateway_id]))
+        return results
+    found = {nat['NatGatewayId']: (nat['State'], nat) for nat in response.get('NatGateways', [])}
+    # an ID that is not visible yet is still pending
+    return {nat_gateway_id: found.get(nat_gateway_id, (None, None)) for nat_gateway_id in nat_gateway_ids}
+
+
+def _describe_cluster(eks, cluster_names):
+    results = {}
+    for cluster_name in cluster_names:
+        try:
+            cluster = eks.describe_cluster(name=cluster_name)['cluster']
+            results[cluster_name] = (cluster['status'], cluster)
+        except eks.exceptions.ResourceNotFoundException:
+            results[cluster_name] = (None, None)
+    return results
+
+
+def _describe_nodegroup(eks, nodegroup_keys):
+    results = {}
+    for cluster_name, nodegroup_name in nodegroup_keys:
+        try:
+            nodegroup = eks.describe_nodegroup(clusterName=cluster_name, nodegroupName=nodegroup_name)['nodegroup']
+            results[(cluster_name, nodegroup_name)] = (nodegroup['status'], nodegroup)
+        except eks.exceptions.ResourceNotFoundException:
+            results[(cluster_name, nodegroup_name)] = (None, None)
+    return results
+
+
+def _describe_addon(eks, addon_keys):
+    results = {}
+    for cluster_name, addon_name in addon_keys:
+        try:
+            addon = eks.describe_addon(clusterName=cluster_name, addonName=addon_name)['addon']
+            results[(cluster_name, addon_name)] = (addon['status'], addon)
+        except eks.exceptions.ResourceNotFoundException:
+            results[(cluster_name, addon_name)] = (None, None)
+    return results
+
+
+def _update_describer(target_parameter=None):
+    """
+    describe_update for cluster updates, keyed (cluster_name, update_id), or for node group /
+    add-on updates, keyed (cluster_name, name, update_id) with target_parameter
+    'nodegroupName' / 'addonName'.
+    """
+    def describe(eks, update_keys):
+        results = {}
+        for key in update_keys:
+            params = {'name': key[0], 'updateId': key[-1]}
+            if target_parameter:
+                params[target_parameter] = key[1]
+            try:
+                update = eks.describe_update(**params)['update']
+                results[key] = (update['status'], update)
+            except eks.exceptions.ResourceNotFoundException:
+                results[key] = (None, None)
+        return results
+    return describe
+
+
+# Polling profile per resource type.
+#   expected:  typical seconds until the resource is ready; polls get denser as it approaches
+#   min_delay / max_delay: bounds on the gap between two polls
+#   backoff:   growth factor once the resource is slower than expected
+#   batch:     describe calls for many IDs of this type can be grouped into one request
+#   timeout:   seconds before a single wait gives up
+# The *_update profiles follow an EKS update by its ID: right after an update call the resource
+# itself can still read ACTIVE, and a failed update leaves it ACTIVE too.
+# The *_deleted profiles wait for a teardown: they succeed once the resource is gone (no longer
+# visible, or in the 'deleted' state NAT gateways keep for a while).
+PROFILES = {
+    'nat_gateway': {
+        'service': 'ec2', 'describe': _describe_nat_gateways, 'batch': True,
+        'success': {'available'}, 'failure': {'failed', 'deleting', 'deleted'},
+        'expected': 60, 'min_delay': 2, 'max_delay': 15, 'backoff': 1.5, 'timeout': 600,
+    },
+    'eks_cluster': {
+        'service': 'eks', 'describe': _describe_cluster, 'batch': False,
+        'success': {'ACTIVE'}, 'failure': {'FAILED', 'DELETING'},
+        'expected': 540, 'min_delay': 5, 'max_delay': 60, 'backoff': 1.5, 'timeout': 1200,
+    },
+    'eks_nodegroup': {
+        'service': 'eks', 'describe': _describe_nodegroup, 'batch': False,
+        'success': {'ACTIVE'}, 'failure': {'CREATE_FAILED', 'DELETING', 'DELETE_FAILED', 'DEGRADED'},
+        'expected': 150, 'min_delay': 5, 'max_delay': 30, 'backoff': 1.5, 'timeout': 1200,
+    },
+    # In-place upgrades: a control plane upgrade or a rolling node replacement often takes over 20 minutes
+    'eks_cluster_update': {
+        'service': 'eks', 'describe': _update_describer(), 'batch': False,
+        'success': {'Successful'}, 'failure': {'Failed', 'Cancelled'},
+        'expected': 1200, 'min_delay': 10, 'max_delay': 60, 'backoff': 1.5, 'timeout': 3600,
+    },
+    'eks_nodegroup_update': {
+        'service': 'eks', 'describe': _update_describer('nodegroupName'), 'batch': False,
+        'success': {'Successful'}, 'failure': {'Failed', 'Cancelled'},
+        'expected': 600, 'min_delay': 10, 'max_delay': 60, 'backoff': 1.5, 'timeout': 3600,
+    },
+    # Scaling, labels and taints only: no node is replaced
+    'eks_nodegroup_config_update': {
+        'service': 'eks', 'describe': _update_describer('nodegroupName'), 'batch': False,
+        'success': {'Successful'}, 'failure': {'Failed', 'Cancelled'},
+        'expected': 30, 'min_delay': 3, 'max_delay': 15, 'backoff': 1.5, 'timeout': 1200,
+    },
+    'eks_addon': {
+        'service': 'eks', 'describe': _describe_addon, 'batch': False,
+        'success': {'ACTIVE'}, 'failure': {'CREATE_FAILED', 'UPDATE_FAILED', 'DEGRADED', 'DELETING'},
+        'expected': 45, 'min_delay': 3, 'max_delay': 15, 'backoff': 1.5, 'timeout': 900,
+    },
+    'eks_addon_update': {
+        'service': 'eks', 'describe': _update_describer('addonName'), 'batch': False,
+        'success': {'Successful'}, 'failure': {'Failed', 'Cancelled'},
+        'expected': 45, 'min_delay': 3, 'max_delay': 15, 'backoff': 1.5, 'timeout': 900,
+    },
+    'nat_gateway_deleted': {
+        'service': 'ec2', 'describe': _describe_nat_gateways, 'batch': True,
+        'success': {'deleted', None}, 'failure': set(),
+        'expected': 60, 'min_delay': 2, 'max_delay': 15, 'backoff': 1.5, 'timeout': 600,
+    },
+    'eks_cluster_deleted': {
+        'service': 'eks', 'describe': _describe_cluster, 'batch': False,
+        'success': {None}, 'failure': {'FAILED'},
+        'expected': 300, 'min_delay': 5, 'max_delay': 60, 'backoff': 1.5, 'timeout': 1200,
+    },
+    'eks_nodegroup_deleted': {
+        'service': 'eks', 'describe': _describe_nodegroup, 'batch': False,
+        'success': {None}, 'failure': {'DELETE_FAILED'},
+        'expected': 240, 'min_delay': 5, 'max_delay': 30, 'backoff': 1.5, 'timeout': 1800,
+    },
+}
+
+
+def next_delay(profile, elapsed, previous_delay):
+    """
+    Pick the gap before the next poll.
+
+    Until the expected ready time the gap halves the remaining distance to it, so a
+    slow resource is not polled needlessly early and a fast one is caught soon after
+    it is ready. Past the expected time the gap grows by the back-off factor.
+    """
+    if elapsed < profile['expected']:
+        delay = (profile['expected'] - elapsed) / 2
+    else:
+        delay = previous_delay * profile['backoff']
+    return max(profile['min_delay'], min(profile['max_delay'], delay))
+
+
+class WaitHandle:
+    """Awaitable handle for one resource being waited on by a WaitEngine."""
+
+    def __init__(self, resource_type, resource_id, region):
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+        self.region = region
+        self.state = None
+        self.polls = 0
+        self.task = None
+
+    def __await__(self):
+        return self.task.__await__()
+
+    def done(self):
+        return self.task.done()
+
+    def __repr__(self):
+        return f"WaitHandle({self.resource_type!r}, {self.resource_id!r}, state={self.state!r})"
+
+
+class WaitEngine:
+    """
+    Poll many resources from one event loop until each reaches a terminal state.
+
+    boto3 calls run in the loop's default executor, so a thread is only held for the
+    duration of a describe call, never while sleeping between polls.
+
+    :param deadline: Overall seconds from now after which every unfinished wait fails (optional).
+    :param on_transition: Callback(handle, old_state, new_state) invoked whenever a state changes.
+    :param batch_window: Seconds to collect describe requests for batchable types before sending one call.
+    :param profiles: Per-type polling profiles (defaults to PROFILES).
+    """
+
+    def __init__(self, deadline=None, on_transition=None, batch_window=0.2, profiles=None):
+        self.profiles = profiles or PROFILES
+        self.on_transition = on_transition
+        self.batch_window = batch_window
+        self._deadline = deadline
+        self._deadline_at = None
+        self._batches = {}
+        self.handles = []
+
+    def _loop(self):
+        loop = asyncio.get_running_loop()
+        if self._deadline is not None and self._deadline_at is None:
+            self._deadline_at = loop.time() + self._deadline
+        return loop
+
+    def wait_for(self, resource_type, resource_id, region='us-east-1'):
+        """
+        Start waiting on a resource. Must be called from inside a running event loop.
+
+        :param resource_type: Key of PROFILES, e.g. 'nat_gateway' or 'eks_nodegroup'.
+        :param resource_id: Resource ID; (cluster_name, name) for node groups and add-ons,
+                            (cluster_name, [name,] update_id) for the *_update types.
+        :param region: The AWS region.
+        :return: WaitHandle that resolves to the final describe record.
+        """
+        if resource_type not in self.profiles:
+            raise ValueError(f"Unknown resource type '{resource_type}'.")
+        self._loop()
+        handle = WaitHandle(resource_type, resource_id, region)
+        handle.task = asyncio.ensure_future(self._watch(handle))
+        self.handles.append(handle)
+        return handle
+
+    async def _describe(self, handle, profile):
+        client = get_client(profile['service'], handle.region)
+        if not profile['batch']:
+            results = await asyncio.to_thread(profile['describe'], client, [handle.resource_id])
+            return results[handle.resource_id]
+
+        loop = asyncio.get_running_loop()
+        key = (handle.resource_type, handle.region)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = {}
+            loop.call_later(self.batch_window, lambda: asyncio.ensure_future(self._flush(key, profile, client)))
+        future = batch.get(handle.resource_id)
+        if future is None:
+            future = batch[handle.resource_id] = loop.create_future()
+        return await future
+
+    async def _flush(self, key, profile, client):
+        batch = self._batches.pop(key, {})
+        try:
+            results = await asyncio.to_thread(profile['describe'], client, list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for resource_id, future in batch.items():
+            if not future.done():
+                future.set_result(results[resource_id])
+
+    async def _watch(self, handle):
+        profile = self.profiles[handle.resource_type]
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + profile['timeout']
+        if self._deadline_at is not None:
+            deadline = min(deadline, self._deadline_at)
+        delay = profile['min_delay']
+
+        # Own trace track per wait: many waits overlap on the event loop's thread
+        with span(f"wait {handle.resource_type}", 'waiter', track=f"wait {handle.resource_type} {handle.resource_id}",
+                  resource_id=str(handle.resource_id)):
+            while True:
+                state, record = await self._describe(handle, profile)
+                handle.polls += 1
+                if state != handle.state:
+                    previous, handle.state = handle.state, state
+                    if self.on_transition:
+                        self.on_transition(handle, previous, state)
+                if state in profile['success']:
+                    return record
+                if state in profile['failure']:
+                    raise WaitError(handle.resource_type, handle.resource_id, _health_message(record or {}, state))
+
+                delay = next_delay(profile, loop.time() - started, delay)
+                if loop.time() + delay > deadline:
+                    raise WaitError(handle.resource_type, handle.resource_id,
+                                    f"still {state or 'not visible'} after {loop.time() - started:.0f} seconds")
+                await asyncio.sleep(delay)
+
+    async def gather(self):
+        """
+        Wait for every handle started so far.
+
+        :return: Dictionary with 'results' ((type, id) -> record) and 'failures' ((type, id) -> error message).
+        """
+        outcomes = await asyncio.gather(*(handle.task for handle in self.handles), return_exceptions=True)
+        results, failures = {}, {}
+        for handle, outcome in zip(self.handles, outcomes):
+            key = (handle.resource_type, handle.resource_id)
+            if isinstance(outcome, BaseException):
+                failures[key] = str(outcome)
+            else:
+                results[key] = outcome
+        return {'results': results, 'failures': failures}
+
+
+def print_transition(handle, previous, state):
+    """Default on_transition callback: one progress line per state change."""
+    print(f"[ℹ️] {handle.resource_type} {handle.resource_id}: {previous or 'unknown'} -> {state or 'not visible'}")
+
+
+def wait_for_resources(resources, region='us-east-1', deadline=None, on_transition=print_transition):
+    """
+    Block until every resource is ready, polling all of them from one event loop.
+
+    Safe to call from worker threads: each call runs its own event loop.
+
+    :param resources: List of (resource_type, resource_id) tuples.
+    :param region: The AWS region.
+    :param deadline: Overall seconds before every unfinished wait fails (optional).
+    :param on_transition: Callback(handle, old_state, new_state), or None.
+    :return: Dictionary with 'results' and 'failures' keyed by (resource_type, resource_id).
+    """
+    async def run():
+        engine = WaitEngine(deadline=deadline, on_transition=on_transition)
+        for resource_type, resource_id in resources:
+            engine.wait_for(resource_type, resource_id, region)
+        return await engine.gather()
+
+    return asyncio.run(run())
@@ -1,90 +1,133 @@
-import boto3
-from create_vpc_private_public_subnets import get_subnet_by_name
-from functions.helper import get_account_number
-from functions.create_control_plane import create_eks_cluster
-from functions.create_role_with_policies import create_iam_role
-from create_vpc_private_public_subnets import get_subnet_by_name
-from functions.create_nodegroup import create_eks_nodegroup
-
-control_plane_trust_policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Action": "sts:AssumeRole",
-                "Effect": "Allow",
-                "Principal": {
-                    "Service": "eks.amazonaws.com"
-                }
-            }
-        ]
-    }
-
-worker_nodes_trust_policy = {
-    "Version": "2012-10-17",
-    "Statement": [
-        {
-            "Action": "sts:AssumeRole",
-            "Effect": "Allow",
-            "Principal": {
-                "Service": "ec2.amazonaws.com"
-            }
-        }
+import argparse
+
+import cluster_config as config
+from functions import trace
+from functions.validate import print_validation, validate_config
+
+# boto3 and the AWS helpers are imported inside apply()/plan(): importing this module,
+# --help and validate never load botocore or touch the network.
+
+
+def roles():
+    """The IAM roles the cluster needs as (role_name, trust_policy, policies, tags) tuples."""
+    return [
+        (config.control_plane_role_name, config.control_plane_trust_policy, config.control_plane_policies, config.control_plane_tags),
+        (config.worker_nodes_role_name, config.worker_nodes_trust_policy, config.worker_nodes_policies, config.worker_node_role_tags),
     ]
-}
-
-
-control_plane_role_name = "ikallam-cluster-role"
-control_plane_policies = ["arn:aws:iam::aws:policy/AmazonEKSClusterPolicy"]
-control_plane_tags = [{"Key": "owner", "Value": "ikallam"}]
-
-worker_nodes_role_name = "ikallam-worker-role"
-worker_nodes_policies = ["arn:aws:iam::aws:policy/AmazonEKSWorkerNodePolicy","arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly","arn:aws:iam::aws:policy/AmazonEKS_CNI_Policy"]
-worker_node_role_tags = [{"Key": "owner", "Value": "ikallam"}]
-
-# clients
-eks_client = boto3.client('eks',region_name='us-east-1')
-ec2 = boto3.client('ec2',region_name='us-east-1')
-
-# EKS cluster configuration
-cluster_name = "ikallam-public-cluster"
-role_arn = f"arn:aws:iam::{get_account_number()}:role/ikallam-cluster-role"
-node_role = f"arn:aws:iam::{get_account_number()}:role/ikallam-worker-role"
-
-subnet_ids = [
-    get_subnet_by_name(ec2, "public_subnet_us-east-1a"),
-    get_subnet_by_name(ec2, "public_subnet_us-east-1b"),
-    get_subnet_by_name(ec2, "public_subnet_us-east-1c")
-]
-public_access_cidrs = ["0.0.0.0/0"]
-service_ipv4_cidr = "172.20.0.0/16"
-kubernetes_version = "1.28"
-tags = {"owner": "ikallam", "environment": "development", "Name": f"{cluster_name}"}
-
-    
-system_nodegroup_name = "system-managed-workers-001"
-application_nodegroup_name = "application-managed-workers-001"
-scaling_config = { "minSize": 2, "maxSize": 5, "desiredSize": 2}
-instance_types = ["t3.medium"]
-ami_type = "AL2_x86_64"
-capacity_type = "ON_DEMAND"
-update_config = {"maxUnavailable": 1}
-
-system_taints = [
-    {"key": "CriticalAddonsOnly", "value": "true", "effect": "NO_SCHEDULE"},
-    {"key": "CriticalAddonsOnly", "value": "true", "effect": "NO_EXECUTE"}
-]
-
-application_taints = []
-system_labels = {
-    "node.kubernetes.io/scope": "system"
-}
-application_labels = {
-    "node.kubernetes.io/scope": "application"
-}
-
-# create roles and attach policies
-create_iam_role(control_plane_role_name, control_plane_trust_policy, control_plane_policies, control_plane_tags)
-create_iam_role(worker_nodes_role_name, worker_nodes_trust_policy, worker_nodes_policies, worker_node_role_tags)
-create_eks_cluster(cluster_name, role_arn, subnet_ids, public_access_cidrs, service_ipv4_cidr, kubernetes_version, tags)
-create_eks_nodegroup(cluster_name, system_nodegroup_name, scaling_config, subnet_ids, node_role, instance_types, ami_type, capacity_type, update_config, system_taints, system_labels, tags)
-create_eks_nodegroup(cluster_name, application_nodegroup_name, scaling_config, subnet_ids, node_role, instance_types, ami_type, capacity_type, update_config, application_taints, application_labels, tags)
\ No newline at end of file
+
+
+def apply():
+    """
+    Create the IAM roles, the EKS cluster, its add-ons and its node groups.
+
+    :return: True if everything converged, False if a step failed (later steps are not attempted).
+    """
+    from functions.addons import NODE_ADDONS, addon_specs, configure_addons
+    from functions.clients import get_client, client_stats
+    from functions.create_control_plane import reconcile_eks_cluster
+    from functions.create_nodegroup import reconcile_eks_nodegroups
+    from functions.create_role_with_policies import reconcile_iam_roles
+    from functions.cidr_plan import apply_cidr_plan
+    from functions.resolver import AmbiguousMatchError, resolve_vpc_subnets
+
+    ec2 = get_client('ec2', config.region_name)
+    # a planned layout decides the AZs, and with them cluster_subnet_names
+    apply_cidr_plan(config)
+
+    # one describe_subnets call for every cluster subnet, inside the cluster's own VPC
+    try:
+        vpc, subnets = resolve_vpc_subnets(ec2, config.vpc_name, config.cluster_subnet_names)
+    except AmbiguousMatchError as e:
+        print(f"[❌] {e}")
+        return False
+    if not vpc:
+        print(f"[❌] VPC '{config.vpc_name}' not found; create it first with create_vpc_private_public_subnets.py.")
+        return False
+    missing_subnets = [subnet_name for subnet_name in config.cluster_subnet_names if not subnets[subnet_name]]
+    if missing_subnets:
+        print(f"[❌] Subnets not found in VPC '{config.vpc_name}': {', '.join(missing_subnets)}.")
+        return False
+    subnet_ids = [subnets[subnet_name]['SubnetId'] for subnet_name in config.cluster_subnet_names]
+
+    # reconcile both roles concurrently; their ARNs come back from IAM, no STS lookup needed
+    iam_roles = reconcile_iam_roles(roles())
+    for role_name, error in iam_roles["failures"].items():
+        print(f"[❌] {error}")
+    if iam_roles["failures"]:
+        return False
+    role_arn = iam_roles["results"][config.control_plane_role_name]
+    node_role = iam_roles["results"][config.worker_nodes_role_name]
+
+    # an existing cluster is upgraded in place instead of failing with ResourceInUseException
+    if not reconcile_eks_cluster(config.cluster_name, role_arn, subnet_ids, config.public_access_cidrs,
+                                 config.service_ipv4_cidr, config.kubernetes_version, config.tags,
+                                 region=config.region_name):
+        return False
+
+    # vpc-cni (prefix delegation) and kube-proxy (IPVS) are configured concurrently before the nodes
+    # launch; CoreDNS needs nodes to run on and follows the node groups
+    addons = addon_specs(config)
+    cluster_addons = configure_addons(config.cluster_name, {name: values for name, values in addons.items()
+                                                            if name not in NODE_ADDONS},
+                                      tags=config.tags, region=config.region_name)
+    if cluster_addons["failures"]:
+        return False
+
+    # create or update both nodegroups concurrently and wait for them together
+    nodegroups = reconcile_eks_nodegroups(config.cluster_name, config.nodegroup_specs(subnet_ids, node_role),
+                                          kubernetes_version=config.kubernetes_version, region=config.region_name)
+    for nodegroup_name, error in nodegroups["failures"].items():
+        print(f"[❌] Node group '{nodegroup_name}' failed: {error}")
+    succeeded = not nodegroups["failures"]
+    if succeeded:
+        node_addons = configure_addons(config.cluster_name, {name: values for name, values in addons.items()
+                                                             if name in NODE_ADDONS},
+                                       tags=config.tags, region=config.region_name)
+        succeeded = not node_addons["failures"]
+
+    stats = client_stats()
+    print(f"[ℹ️] Client registry built {stats['clients_created']} client(s), reused {stats['cache_hits']} time(s).")
+    return succeeded
+
+
+def plan(as_json=False):
+    """Print the actions apply() would take, without changing anything."""
+    from functions.addons import addon_specs
+    from functions.cidr_plan import apply_cidr_plan
+    from functions.plan import plan_eks, print_plan
+    apply_cidr_plan(config)
+    print_plan(plan_eks(roles(), config.cluster_name, config.cluster_subnet_names, config.kubernetes_version,
+                        config.nodegroup_specs([], None), addons=addon_specs(config), region=config.region_name,
+                        vpc_name=config.vpc_name),
+               as_json=as_json)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the IAM roles, EKS cluster, add-ons and node groups.")
+    parser.add_argument('command', nargs='?', choices=['apply', 'plan', 'validate'], default='apply',
+                        help="'plan' prints the actions without changing anything, 'validate' only checks "
+                             "cluster_config.py (default: apply).")
+    parser.add_argument('--json', action='store_true', help="Print the plan as JSON.")
+    parser.add_argument('--trace', metavar='PATH', help="Record every API call and waiter and write a "
+                                                        "Chrome trace-event file (chrome://tracing, Perfetto).")
+    parser.add_argument('--trace-summary', metavar='PATH',
+                        help="Write per-operation call counts and p50/p99 latency as JSON.")
+    args = parser.parse_args()
+
+    # validate prints its verdict; apply/plan only speak up when something is wrong
+    errors = validate_config(config)
+    if errors or args.command == 'validate':
+        return 0 if print_validation(errors) else 1
+    if args.trace or args.trace_summary:
+        trace.enable()
+    succeeded = True
+    if args.command == 'plan':
+        plan(as_json=args.json)
+    elif args.command == 'apply':
+        succeeded = apply()
+    trace.export(args.trace, args.trace_summary)
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+import cluster_config as config
+
+# boto3 is imported with functions.drift inside main(), after the arguments are checked.
+# Status lines go to stderr, so that with --events - stdout carries nothing but events.
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch the VPC and EKS resources the build manages and report drift as JSON lines.")
+    parser.add_argument('--spec', help="Fleet spec JSON file (see fleet.py); default: the cluster in cluster_config.py.")
+    parser.add_argument('--interval', type=float, default=60.0, help="Seconds between sweeps (default: 60).")
+    parser.add_argument('--budget', type=float, default=60.0,
+                        help="API calls per minute across every cluster watched (default: 60).")
+    parser.add_argument('--events', default='-', metavar='PATH',
+                        help="Append drift events to this file; '-' for stdout (default).")
+    parser.add_argument('--state', metavar='PATH',
+                        help="Keep resource hashes in this JSON file, so a restart reports drift from before it.")
+    parser.add_argument('--iterations', type=int, help="Stop after this many sweeps (default: run until Ctrl-C).")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum probes running at once.")
+    args = parser.parse_args()
+    if args.interval <= 0 or args.budget <= 0:
+        parser.error("--interval and --budget must be positive")
+
+    from functions.drift import DriftWatcher, watch_target
+    if args.spec:
+        from fleet import load_fleet
+        clusters = load_fleet(args.spec)
+    else:
+        clusters = [config]
+
+    events = sys.stdout if args.events == '-' else open(args.events, 'a')
+    try:
+        watcher = DriftWatcher([watch_target(settings) for settings in clusters], events=events, interval=args.interval,
+                               calls_per_minute=args.budget, state_path=args.state, workers=args.workers)
+        cost = watcher.sweep_cost()
+        print(f"[ℹ️] Watching {len(clusters)} cluster(s): a full sweep costs about {cost} call(s); at {args.budget:g} "
+              f"call(s)/min every resource is checked about every {max(args.interval, cost * 60 / args.budget):.0f}s.",
+              file=sys.stderr)
+        stats = watcher.run(iterations=args.iterations)
+    finally:
+        if events is not sys.stdout:
+            events.close()
+    print(f"[ℹ️] {stats['sweeps']} sweep(s), {stats['calls']} call(s), {stats['redescribed']} resource(s) described "
+          f"again, {stats['events']} drift event(s).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())